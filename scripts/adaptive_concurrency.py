@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Adaptive concurrency control (AIMD) for DNS validation runs
+The number of lookups in flight starts at a configured value and doubles
+every healthy round (slow start), then grows by a fixed step per round once
+the first backoff has happened. A round is as many completed lookups as the
+current limit; it is healthy when none of them failed and their median
+latency stayed close to the lowest latency seen. A failed lookup (timeout,
+SERVFAIL) halves the limit at once. Only lookups started after the last
+backoff can trigger the next one, so one burst of timeouts costs one cut,
+not dozens. Every change of the limit is kept in a trace for the report.
+"""
+
+import asyncio
+import statistics
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional
+
+DEFAULT_MAXIMUM = 1000
+DEFAULT_INCREASE = 8  # Lookups added per healthy round after slow start
+DEFAULT_DECREASE = 0.5  # Factor applied to the limit on a failed lookup
+# A round is healthy while its median latency stays below
+# max(baseline * LATENCY_TOLERANCE, baseline + LATENCY_SLACK_MS)
+LATENCY_TOLERANCE = 3.0
+LATENCY_SLACK_MS = 50.0
+
+
+class AIMDController:
+    """
+    Thread-safe limit on lookups in flight. try_enter() hands out a token
+    when there is room; exit() returns it with the lookup's outcome.
+    ThreadGate and AsyncGate add waiting on top.
+    """
+
+    def __init__(self, initial: int = 16, minimum: int = 1, maximum: int = DEFAULT_MAXIMUM,
+                 increase: int = DEFAULT_INCREASE, decrease: float = DEFAULT_DECREASE,
+                 clock: Callable[[], float] = time.perf_counter):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = min(max(initial, self.minimum), self.maximum)
+        self.initial = self.limit
+        self.increase = increase
+        self.decrease = decrease
+        self.in_flight = 0
+        self.peak = self.limit
+        self.backoffs = 0
+        self.slow_start = True
+        self.trace: List[Dict] = []
+        self._epoch = 0  # Bumped on every backoff
+        self._baseline_ms: Optional[float] = None
+        self._round: List[float] = []
+        self._clock = clock
+        self._started = clock()
+        self._lock = threading.Lock()
+        self._note('start')
+
+    def _note(self, event: str) -> None:
+        self.trace.append({'t': round(self._clock() - self._started, 3), 'limit': self.limit, 'event': event})
+
+    def try_enter(self) -> Optional[int]:
+        """A token if another lookup may start now, else None"""
+        with self._lock:
+            if self.in_flight >= self.limit:
+                return None
+            self.in_flight += 1
+            return self._epoch
+
+    def has_room(self) -> int:
+        with self._lock:
+            return max(0, self.limit - self.in_flight)
+
+    def exit(self, token: int, ok: Optional[bool], latency_ms: float) -> None:
+        """Record the outcome of a lookup started with token; ok=None for abandoned lookups"""
+        with self._lock:
+            self.in_flight -= 1
+            if ok is None or token != self._epoch:
+                return  # Abandoned, or started before the last backoff (already priced in)
+            if not ok:
+                self.limit = max(self.minimum, int(self.limit * self.decrease))
+                self.slow_start = False
+                self.backoffs += 1
+                self._epoch += 1
+                self._round = []
+                self._note('backoff')
+                return
+
+            self._baseline_ms = latency_ms if self._baseline_ms is None else min(self._baseline_ms, latency_ms)
+            self._round.append(latency_ms)
+            if len(self._round) < self.limit:
+                return
+            median = statistics.median(self._round)
+            self._round = []
+            threshold = max(self._baseline_ms * LATENCY_TOLERANCE, self._baseline_ms + LATENCY_SLACK_MS)
+            if median > threshold:
+                self.slow_start = False  # Queueing somewhere: hold the limit
+                return
+            grown = self.limit * 2 if self.slow_start else self.limit + self.increase
+            if min(grown, self.maximum) != self.limit:
+                self.limit = min(grown, self.maximum)
+                self.peak = max(self.peak, self.limit)
+                self._note('increase')
+
+    def report(self) -> Dict:
+        with self._lock:
+            return {
+                'initial': self.initial,
+                'final': self.limit,
+                'peak': self.peak,
+                'minimum': self.minimum,
+                'maximum': self.maximum,
+                'backoffs': self.backoffs,
+                'trace': list(self.trace),
+            }
+
+
+class ThreadGate:
+    """Blocking acquire/release around an AIMDController, for thread pools"""
+
+    def __init__(self, controller: AIMDController):
+        self.controller = controller
+        self._condition = threading.Condition()
+
+    def acquire(self) -> int:
+        with self._condition:
+            while True:
+                token = self.controller.try_enter()
+                if token is not None:
+                    return token
+                self._condition.wait(0.1)
+
+    def release(self, token: int, ok: Optional[bool], latency_ms: float) -> None:
+        self.controller.exit(token, ok, latency_ms)
+        with self._condition:
+            self._condition.notify_all()
+
+
+class AsyncGate:
+    """asyncio acquire/release around an AIMDController; use from one event loop"""
+
+    def __init__(self, controller: AIMDController):
+        self.controller = controller
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    async def acquire(self) -> int:
+        while True:
+            token = self.controller.try_enter()
+            if token is not None:
+                return token
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                raise
+
+    def release(self, token: int, ok: Optional[bool], latency_ms: float) -> None:
+        self.controller.exit(token, ok, latency_ms)
+        for _ in range(self.controller.has_room()):
+            if not self._waiters:
+                break
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
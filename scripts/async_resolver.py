@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+asyncio DNS resolution engine for the Kakao/Daum domain collector
+Sends A/AAAA queries directly over UDP (TCP on truncation) with hundreds of
+queries in flight, a deadline per query, and a clear split between
+NXDOMAIN, NODATA, timeout and other failures.
+"""
+
+import asyncio
+import itertools
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import dns.asyncquery
+import dns.exception
+import dns.message
+import dns.rcode
+import dns.rdatatype
+import dns.resolver
+
+from scripts import dns_cache
+from scripts.dns_cache import DNSAnswerCache, answer_ttl, negative_ttl
+
+# Lookup statuses
+ACTIVE = 'active'        # At least one A/AAAA address
+NXDOMAIN = 'nxdomain'    # The name does not exist
+NODATA = 'nodata'        # The name exists but has no A/AAAA records
+TIMEOUT = 'timeout'      # No answer before the deadline on any attempt
+ERROR = 'error'          # SERVFAIL, REFUSED, network errors, ...
+
+DEFINITIVE_STATUSES = (ACTIVE, NXDOMAIN, NODATA)
+
+FALLBACK_NAMESERVERS = ['8.8.8.8', '1.1.1.1']
+
+
+@dataclass
+class LookupResult:
+    """Outcome of resolving one domain"""
+    domain: str
+    status: str
+    addresses: List[str] = field(default_factory=list)
+    nameserver: Optional[str] = None
+    attempts: int = 0
+    elapsed_ms: float = 0.0
+    error: Optional[str] = None
+
+    @property
+    def exists(self) -> bool:
+        return self.status == ACTIVE
+
+    @property
+    def definitive(self) -> bool:
+        """True if the status is a real answer rather than a transient failure"""
+        return self.status in DEFINITIVE_STATUSES
+
+
+def system_nameservers() -> List[str]:
+    """Nameservers from the system resolver configuration, with public fallbacks"""
+    try:
+        nameservers = dns.resolver.Resolver(configure=True).nameservers
+    except Exception:
+        nameservers = []
+    return [str(ns) for ns in nameservers] or list(FALLBACK_NAMESERVERS)
+
+
+class AsyncDNSResolver:
+    """Concurrent A/AAAA resolver built on asyncio and raw DNS messages"""
+
+    def __init__(self, nameservers: Optional[Sequence[str]] = None, port: int = 53,
+                 concurrency: int = 256, timeout: float = 2.0, attempts: int = 2,
+                 rdtypes: Sequence[str] = ('A', 'AAAA'), cache: Optional[DNSAnswerCache] = None):
+        self.nameservers = list(nameservers) if nameservers else system_nameservers()
+        self.port = port
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.attempts = max(1, attempts)
+        self.rdtypes = [dns.rdatatype.from_text(t) for t in rdtypes]
+        self._ns_cycle = itertools.cycle(self.nameservers)
+        self.queries_sent = 0
+        # Answers still within their TTL are taken from cache instead of the network
+        self.cache = cache
+
+    async def _query(self, domain: str, rdtype: int, nameserver: str,
+                     semaphore: asyncio.Semaphore) -> Tuple[str, List[str], Optional[str]]:
+        """Send one query; returns (status, addresses, error)"""
+        type_name = dns.rdatatype.to_text(rdtype)
+        cached = self.cache.get(domain, type_name) if self.cache else None
+        if cached is not None:
+            kind, addresses = cached
+            return {dns_cache.POSITIVE: ACTIVE, dns_cache.NEGATIVE: NODATA}.get(kind, NXDOMAIN), addresses, None
+
+        query = dns.message.make_query(domain, rdtype)
+        async with semaphore:
+            self.queries_sent += 1
+            try:
+                response, _ = await dns.asyncquery.udp_with_fallback(
+                    query, nameserver, timeout=self.timeout, port=self.port)
+            except dns.exception.Timeout:
+                return TIMEOUT, [], f'No answer from {nameserver} within {self.timeout}s'
+            except Exception as e:
+                return ERROR, [], str(e)
+
+        rcode = response.rcode()
+        if rcode == dns.rcode.NXDOMAIN:
+            self._remember(domain, type_name, dns_cache.NXDOMAIN, [], negative_ttl(response))
+            return NXDOMAIN, [], None
+        if rcode != dns.rcode.NOERROR:
+            return ERROR, [], dns.rcode.to_text(rcode)
+
+        addresses = [
+            rdata.to_text()
+            for rrset in response.answer if rrset.rdtype == rdtype
+            for rdata in rrset
+        ]
+        if addresses:
+            self._remember(domain, type_name, dns_cache.POSITIVE, addresses, answer_ttl(response))
+        else:
+            self._remember(domain, type_name, dns_cache.NEGATIVE, [], negative_ttl(response))
+        return (ACTIVE if addresses else NODATA), addresses, None
+
+    def _remember(self, domain: str, type_name: str, kind: str, addresses: List[str],
+                  ttl: Optional[int]) -> None:
+        if self.cache and ttl is not None:
+            self.cache.put(domain, type_name, kind, addresses, ttl)
+
+    async def lookup(self, domain: str, semaphore: asyncio.Semaphore) -> LookupResult:
+        """
+        Resolve all configured record types for domain in parallel.
+        Inconclusive attempts (timeouts/errors) are retried on the next nameserver.
+        """
+        result = LookupResult(domain=domain, status=ERROR)
+        start = time.perf_counter()
+
+        for attempt in range(1, self.attempts + 1):
+            nameserver = next(self._ns_cycle)
+            answers = await asyncio.gather(*(
+                self._query(domain, rdtype, nameserver, semaphore) for rdtype in self.rdtypes
+            ))
+            statuses = [status for status, _, _ in answers]
+            result.attempts = attempt
+            result.nameserver = nameserver
+
+            if ACTIVE in statuses:
+                result.status = ACTIVE
+                result.addresses = [a for _, addresses, _ in answers for a in addresses]
+            elif NXDOMAIN in statuses:
+                result.status = NXDOMAIN
+            elif all(status == NODATA for status in statuses):
+                result.status = NODATA
+            else:
+                result.status = TIMEOUT if TIMEOUT in statuses else ERROR
+                result.error = next((error for _, _, error in answers if error), 'lookup failed')
+                continue
+
+            result.error = None
+            break
+
+        result.elapsed_ms = round((time.perf_counter() - start) * 1000, 2)
+        return result
+
+    async def lookup_many(self, domains: Iterable[str]) -> Dict[str, LookupResult]:
+        """Resolve domains with at most self.concurrency queries in flight"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results = await asyncio.gather(*(self.lookup(d, semaphore) for d in domains))
+        return {result.domain: result for result in results}
+
+    def resolve_all(self, domains: Iterable[str]) -> Dict[str, LookupResult]:
+        """Blocking entry point: resolve domains on a fresh event loop"""
+        return asyncio.run(self.lookup_many(list(domains)))
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Atomic file replacement shared by every script that publishes or caches files
+Data is written to a temporary sibling of the target and moved into place
+with os.replace(), so readers see either the old or the new file, never a
+half-written one. tempfile.mkstemp() creates its files with mode 0600; before
+the move the temporary file gets the mode of the file it replaces, or the
+mode open() would have given a new file (0666 minus the umask), so published
+files stay readable from a web root.
+"""
+
+import os
+import stat
+import tempfile
+from contextlib import contextmanager
+from typing import IO, Iterator, Optional, Tuple, Union
+
+
+def _default_mode() -> int:
+    # The umask can only be read by setting it; restore it at once
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+_DEFAULT_MODE = _default_mode()
+
+
+def open_temp(path: str, binary: bool = False, encoding: Optional[str] = 'utf-8',
+              newline: Optional[str] = '') -> Tuple[IO, str]:
+    """
+    Open a temporary file next to path (creating the directory if needed).
+    Returns (file, tmp_path); finish with commit_temp() or discard_temp().
+    Text files keep their line endings as written (newline='').
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        if binary:
+            return os.fdopen(fd, 'wb'), tmp_path
+        return os.fdopen(fd, 'w', encoding=encoding, newline=newline), tmp_path
+    except BaseException:
+        os.close(fd)
+        discard_temp(tmp_path)
+        raise
+
+
+def commit_temp(tmp_path: str, path: str) -> None:
+    """Give tmp_path the mode path has (or a new file would get) and move it over path"""
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except OSError:
+        mode = _DEFAULT_MODE
+    os.chmod(tmp_path, mode)
+    os.replace(tmp_path, path)
+
+
+def discard_temp(tmp_path: str) -> None:
+    if os.path.exists(tmp_path):
+        os.unlink(tmp_path)
+
+
+@contextmanager
+def atomic_open(path: str, binary: bool = False, encoding: Optional[str] = 'utf-8',
+                newline: Optional[str] = '') -> Iterator[IO]:
+    """Write path through a temporary file; it only replaces path if the block succeeds"""
+    f, tmp_path = open_temp(path, binary, encoding, newline)
+    try:
+        with f:
+            yield f
+        commit_temp(tmp_path, path)
+    except BaseException:
+        discard_temp(tmp_path)
+        raise
+
+
+def write_atomic(path: str, data: Union[str, bytes]) -> None:
+    """Atomically replace path with data (bytes as is, text as UTF-8)"""
+    with atomic_open(path, binary=isinstance(data, bytes)) as f:
+        f.write(data)
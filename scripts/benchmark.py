@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark for the Kakao/Daum domain collector
+Generates deterministic synthetic corpora and measures the throughput of the
+legacy and current implementations of the extraction (lines/sec) and
+classification (domains/sec) hot paths. No network access is needed.
+"""
+
+import argparse
+import contextlib
+import io
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, Set
+
+_REPO_ROOT = str(Path(__file__).resolve().parent.parent)
+if _REPO_ROOT not in sys.path:
+    sys.path.insert(0, _REPO_ROOT)
+
+from scripts.benchmark_corpus import generate_adblock_corpus, generate_candidate_domains  # noqa: E402
+from scripts.collect_kakao_domains import KakaoDomainCollector  # noqa: E402
+from scripts.domain_classifier import DomainClassifier  # noqa: E402
+
+
+def legacy_is_kakao_related(config: Dict, whitelist: Set[str], domain: str) -> bool:
+    """The original per-call regex loop classifier, kept as the benchmark baseline"""
+    if not domain:
+        return False
+    domain_lower = domain.lower().strip()
+    if not re.match(r'^[a-zA-Z0-9.-]+$', domain) or domain.startswith('.') or domain.endswith('.'):
+        return False
+    if domain_lower in whitelist:
+        print(f"  WHITELIST: Skipping legitimate service domain: {domain_lower}")
+        return False
+    if not any(x in domain_lower for x in ['kakao', 'daum']):
+        return False
+    if not any(re.search(p, domain_lower) for p in config.get("kakao_patterns", [])):
+        return False
+    matched_keywords = [k for k in config.get("ad_keywords", []) if re.search(k, domain_lower)]
+    if matched_keywords:
+        print(f"  AD DOMAIN: {domain_lower} matched keywords: {matched_keywords}")
+        return True
+    for pattern in ['ad.', 'ads.', 'adm.', 'adapi.', 'adserver.', 'track.',
+                    'pixel.', 'beacon.', 'collector.', 'bizboard.', 'dmp.']:
+        if pattern in domain_lower:
+            print(f"  AD DOMAIN: {domain_lower} matched simple pattern: {pattern}")
+            return True
+    print(f"  LEGITIMATE: Skipping Kakao domain without ad indicators: {domain_lower}")
+    return False
+
+
+def legacy_extract_domains(collector: KakaoDomainCollector, content: str) -> Set[str]:
+    """The original four-regex extractor and classifier, kept as the benchmark baseline"""
+    config, whitelist = collector.sources, collector.whitelist_domains
+    domains = set()
+    patterns = [
+        r'\|\|([a-zA-Z0-9.-]+)\^',
+        r'\|\|([a-zA-Z0-9.-]+)\^[^$]*$',
+        r'@@\|\|([a-zA-Z0-9.-]+)\^',
+        r'[|]{1,2}([a-zA-Z0-9.-]*(?:kakao|daum)[a-zA-Z0-9.-]*)\^',
+    ]
+    for line in content.split('\n'):
+        line = line.strip()
+        if not line or line.startswith('!') or line.startswith('#'):
+            continue
+        for pattern in patterns:
+            for domain in re.findall(pattern, line):
+                if domain and legacy_is_kakao_related(config, whitelist, domain):
+                    domains.add(domain)
+    return domains
+
+
+def time_call(func: Callable[[], object], repeat: int = 3) -> float:
+    """Best-of-repeat wall time in seconds, with stdout silenced"""
+    best = float('inf')
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+    return best
+
+
+def benchmark_extraction(lines: int, seed: int = 42, repeat: int = 3) -> Dict:
+    """Compare legacy and single-pass extraction on the same synthetic corpus"""
+    collector = KakaoDomainCollector('scripts/sources.json')
+    corpus = generate_adblock_corpus(lines, seed)
+    line_count = corpus.count('\n')
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        legacy = legacy_extract_domains(collector, corpus)
+        current = collector.extract_domains_from_adblock(corpus)
+
+    def run_current():
+        # Start every run with a cold classifier memo
+        collector.classifier = DomainClassifier.from_config(collector.sources, collector.whitelist_domains)
+        return collector.extract_domains_from_adblock(corpus)
+
+    legacy_time = time_call(lambda: legacy_extract_domains(collector, corpus), repeat)
+    current_time = time_call(run_current, repeat)
+
+    return {
+        'lines': line_count,
+        'domains_found': len(current),
+        'results_match': legacy == current,
+        'legacy_seconds': round(legacy_time, 4),
+        'current_seconds': round(current_time, 4),
+        'legacy_lines_per_sec': round(line_count / legacy_time),
+        'current_lines_per_sec': round(line_count / current_time),
+        'speedup': round(legacy_time / current_time, 1),
+    }
+
+
+def benchmark_classification(count: int, seed: int = 42, repeat: int = 3) -> Dict:
+    """Compare the legacy regex loop and DomainClassifier on a candidate stream"""
+    collector = KakaoDomainCollector('scripts/sources.json')
+    config, whitelist = collector.sources, collector.whitelist_domains
+    candidates = generate_candidate_domains(count, seed)
+
+    def run_legacy():
+        return [legacy_is_kakao_related(config, whitelist, d) for d in candidates]
+
+    def run_current():
+        # A fresh classifier per run, so memo hits only come from repeats in the stream
+        classifier = DomainClassifier.from_config(config, whitelist)
+        return [classifier.is_ad_domain(d) for d in candidates]
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        results_match = run_legacy() == run_current()
+
+    legacy_time = time_call(run_legacy, repeat)
+    current_time = time_call(run_current, repeat)
+
+    return {
+        'candidates': count,
+        'results_match': results_match,
+        'legacy_seconds': round(legacy_time, 4),
+        'current_seconds': round(current_time, 4),
+        'legacy_domains_per_sec': round(count / legacy_time),
+        'current_domains_per_sec': round(count / current_time),
+        'speedup': round(legacy_time / current_time, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark domain extraction and classification on synthetic corpora')
+    parser.add_argument('--lines', type=int, default=200_000,
+                        help='Number of lines in the synthetic corpus (default: 200000)')
+    parser.add_argument('--candidates', type=int, default=200_000,
+                        help='Number of candidate domains to classify (default: 200000)')
+    parser.add_argument('--seed', type=int, default=42, help='Corpus random seed (default: 42)')
+    parser.add_argument('--repeat', type=int, default=3, help='Timing repetitions, best is kept (default: 3)')
+    args = parser.parse_args()
+
+    print(f"Benchmarking extraction on {args.lines:,} synthetic lines (seed {args.seed})...")
+    result = benchmark_extraction(args.lines, args.seed, args.repeat)
+
+    print(f"  Legacy extractor:   {result['legacy_lines_per_sec']:>12,} lines/sec ({result['legacy_seconds']}s)")
+    print(f"  Compiled extractor: {result['current_lines_per_sec']:>12,} lines/sec ({result['current_seconds']}s)")
+    print(f"  Speedup: {result['speedup']}x")
+    print(f"  Domains found: {result['domains_found']} (results match: {result['results_match']})")
+
+    print(f"\nBenchmarking classification of {args.candidates:,} candidate domains...")
+    classified = benchmark_classification(args.candidates, args.seed, args.repeat)
+    print(f"  Legacy classifier:  {classified['legacy_domains_per_sec']:>12,} domains/sec ({classified['legacy_seconds']}s)")
+    print(f"  DomainClassifier:   {classified['current_domains_per_sec']:>12,} domains/sec ({classified['current_seconds']}s)")
+    print(f"  Speedup: {classified['speedup']}x (results match: {classified['results_match']})")
+
+    return 0 if result['results_match'] and classified['results_match'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Deterministic synthetic corpora for the offline benchmarks
+AdBlock source lists, classifier candidate streams, blocked-domain sets and
+DNS query streams, generated from a seed so that scripts/benchmark.py and
+scripts/benchmark_suite.py (and the stored baseline) time the same input.
+"""
+
+import random
+from typing import List, Sequence
+
+TLDS = ['com', 'net', 'org', 'co.kr', 'kr', 'io']
+KAKAO_BASES = ['kakao.com', 'kakaocdn.net', 'daum.net', 'daumcdn.net', 'kakaotalk.com', 'kakaopay.com']
+AD_LABELS = ['ad', 'ads', 'track', 'pixel', 'beacon', 'stats', 'log', 'display.ad', 'banner.ad']
+PLAIN_LABELS = ['www', 'img', 'static', 'm', 'api', 'news', 'cdn', 'blog', 'shop', 'mail']
+
+
+def _random_label(rng: random.Random, length: int = 8) -> str:
+    return ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz0123456789') for _ in range(length))
+
+
+def generate_adblock_corpus(lines: int, seed: int = 42, kakao_ratio: float = 0.01) -> str:
+    """
+    Build a deterministic AdBlock list with roughly kakao_ratio of its lines
+    mentioning Kakao/Daum, mixed with the rule shapes seen in real sources.
+    """
+    rng = random.Random(seed)
+    out: List[str] = ['! Title: Synthetic benchmark list', '! Expires: 1 day']
+
+    for i in range(lines - len(out)):
+        roll = rng.random()
+        if roll < kakao_ratio:
+            label = rng.choice(AD_LABELS + PLAIN_LABELS)
+            domain = f"{label}.{rng.choice(KAKAO_BASES)}"
+            shape = rng.randrange(5)
+            if shape == 0:
+                out.append(f"||{domain}^")
+            elif shape == 1:
+                out.append(f"||{domain}^$third-party")
+            elif shape == 2:
+                out.append(f"@@||{domain}^")
+            elif shape == 3:
+                out.append(f"|{domain}^")
+            else:
+                out.append(f"{domain}##.kakao_ad_area")
+            continue
+
+        domain = f"{_random_label(rng)}.{rng.choice(TLDS)}"
+        if roll < 0.55:
+            out.append(f"||{domain}^")
+        elif roll < 0.70:
+            out.append(f"||{domain}^$script,third-party")
+        elif roll < 0.80:
+            out.append(f"{domain}##.ad-banner-{i % 97}")
+        elif roll < 0.88:
+            out.append(f"! comment line {i}")
+        elif roll < 0.95:
+            out.append(f"/{_random_label(rng, 5)}/ads/*$image")
+        else:
+            out.append(f"@@||{domain}^$document")
+
+    return '\n'.join(out) + '\n'
+
+
+def generate_candidate_domains(count: int, seed: int = 42, kakao_ratio: float = 0.3) -> List[str]:
+    """Candidate domains as the extractor hands them to the classifier, with repeats"""
+    rng = random.Random(seed)
+    distinct = max(1, count // 4)
+    pool = []
+    for _ in range(distinct):
+        if rng.random() < kakao_ratio:
+            label = rng.choice(AD_LABELS + PLAIN_LABELS)
+            pool.append(f"{label}.{_random_label(rng, 4)}.{rng.choice(KAKAO_BASES)}")
+        else:
+            pool.append(f"{_random_label(rng)}.{rng.choice(TLDS)}")
+    return [rng.choice(pool) for _ in range(count)]
+
+
+def generate_blocked_domains(count: int, seed: int = 42) -> List[str]:
+    """Distinct Kakao/Daum-looking ad domains, as they appear in a generated filter"""
+    rng = random.Random(seed)
+    domains = set()
+    while len(domains) < count:
+        domains.add(f"ad.{_random_label(rng, 6)}.{rng.choice(KAKAO_BASES)}")
+    return sorted(domains)
+
+
+def generate_query_stream(blocked: Sequence[str], count: int, seed: int = 42) -> List[str]:
+    """DNS query names: a third blocked names, a third their subdomains, a third unrelated"""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 1 / 3:
+            queries.append(rng.choice(blocked))
+        elif roll < 2 / 3:
+            queries.append(f"{_random_label(rng, 4)}.{rng.choice(blocked)}")
+        else:
+            queries.append(f"www.{_random_label(rng)}.{rng.choice(TLDS)}")
+    return queries
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Offline performance regression suite for the collector, classifier and filter matcher
+Times extract_domains_from_adblock, is_kakao_related, generate_adguard_filter
+and DNSValidator.is_blocked on deterministic synthetic corpora (10k to 5M
+lines), compares the results with a stored baseline and exits non-zero when
+any benchmark regresses past the threshold. No network access is needed.
+
+Timings are normalised by a fixed pure-Python calibration workload, so a
+baseline recorded on one machine stays meaningful on another.
+"""
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+_REPO_ROOT = str(Path(__file__).resolve().parent.parent)
+if _REPO_ROOT not in sys.path:
+    sys.path.insert(0, _REPO_ROOT)
+
+from scripts.benchmark import time_call  # noqa: E402
+from scripts.benchmark_corpus import (  # noqa: E402
+    generate_adblock_corpus, generate_blocked_domains, generate_candidate_domains, generate_query_stream,
+)
+from scripts.collect_kakao_domains import KakaoDomainCollector  # noqa: E402
+from scripts.dns_validator import DNSValidator  # noqa: E402
+from scripts.domain_classifier import DomainClassifier  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join('scripts', 'benchmark_baseline.json')
+DEFAULT_SIZES = '10k,100k,1m,5m'
+QUICK_SIZES = '10k,100k'
+MAX_REPEAT = 50
+DEFAULT_THRESHOLD = 0.25  # Fail when a benchmark is more than 25% slower than its baseline
+
+_SUFFIXES = {'k': 1_000, 'm': 1_000_000}
+
+
+def parse_size(text: str) -> int:
+    """'10k' -> 10000, '5m' -> 5000000, '2500' -> 2500"""
+    text = text.strip().lower()
+    if text and text[-1] in _SUFFIXES:
+        return int(float(text[:-1]) * _SUFFIXES[text[-1]])
+    return int(text)
+
+
+def size_label(size: int) -> str:
+    for suffix, factor in sorted(_SUFFIXES.items(), key=lambda item: -item[1]):
+        if size >= factor and size % factor == 0:
+            return f"{size // factor}{suffix}"
+    return str(size)
+
+
+def calibrate(repeat: int = 10) -> float:
+    """Best-of-repeat time of a fixed workload of string, dict and set operations"""
+    def workload():
+        table = {}
+        for i in range(200_000):
+            key = f"label{i % 5000}.example.com"
+            table[key] = table.get(key, 0) + len(key.split('.'))
+        return sum(table.values())
+    return time_call(workload, repeat)
+
+
+def _fresh_classifier(collector: KakaoDomainCollector) -> None:
+    collector.classifier = DomainClassifier.from_config(collector.sources, collector.whitelist_domains)
+
+
+def run_size(collector: KakaoDomainCollector, size: int, seed: int, repeat: int) -> Dict[str, Dict]:
+    """Run every benchmark at one corpus size; returns {name: {seconds, items, ...}}"""
+    results = {}
+    # Millisecond-scale runs are noisy, so small sizes get more repetitions
+    repeat = max(repeat, min(MAX_REPEAT, 1_000_000 // size))
+    label = size_label(size)
+    filter_size = max(1000, size // 10)  # Published filters are far smaller than source lists
+
+    corpus = generate_adblock_corpus(size, seed)
+
+    def extract():
+        _fresh_classifier(collector)  # Cold memo, as in a real run
+        return collector.extract_domains_from_adblock(corpus)
+    results[f"extract_domains_from_adblock/{label}"] = {
+        'seconds': time_call(extract, repeat), 'items': size, 'unit': 'lines'}
+    del corpus
+
+    candidates = generate_candidate_domains(size, seed)
+
+    def classify():
+        _fresh_classifier(collector)
+        is_kakao_related = collector.is_kakao_related
+        return [is_kakao_related(d) for d in candidates]
+    results[f"is_kakao_related/{label}"] = {
+        'seconds': time_call(classify, repeat), 'items': size, 'unit': 'domains'}
+    del candidates
+
+    blocked = generate_blocked_domains(filter_size, seed)
+    collector.validated_domains = set(blocked)
+    results[f"generate_adguard_filter/{label}"] = {
+        'seconds': time_call(collector.generate_adguard_filter, repeat),
+        'items': filter_size, 'unit': 'domains'}
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filter_path = os.path.join(tmpdir, 'filter.txt')
+        with open(filter_path, 'w', encoding='utf-8') as f:
+            f.write(collector.generate_adguard_filter())
+        validator = DNSValidator(filter_path)
+    queries = generate_query_stream(blocked, size, seed)
+
+    def match():
+        is_blocked = validator.is_blocked
+        return [is_blocked(q) for q in queries]
+    results[f"DNSValidator.is_blocked/{label}"] = {
+        'seconds': time_call(match, repeat), 'items': size, 'unit': 'queries'}
+
+    return results
+
+
+def run_suite(sizes: Sequence[int], seed: int = 42, repeat: int = 3,
+              sources_file: str = 'scripts/sources.json') -> Dict:
+    """Run all benchmarks at all sizes and return a baseline-shaped result document"""
+    logging.getLogger('scripts.dns_validator').setLevel(logging.WARNING)
+    with contextlib.redirect_stdout(io.StringIO()):
+        collector = KakaoDomainCollector(sources_file)
+
+    # Collector pauses add the most jitter to allocation-heavy loops; the
+    # corpora hold no reference cycles, so collection can wait until the end
+    gc.collect()
+    gc.disable()
+    try:
+        calibration = calibrate()
+        results = {}
+        for size in sizes:
+            results.update(run_size(collector, size, seed, repeat))
+            gc.collect()
+    finally:
+        gc.enable()
+
+    benchmarks = {}
+    for name, result in results.items():
+        result['per_sec'] = round(result['items'] / result['seconds']) if result['seconds'] else None
+        result['normalized'] = round(result['seconds'] / calibration, 4)
+        result['seconds'] = round(result['seconds'], 5)
+        benchmarks[name] = result
+
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'seed': seed,
+        'calibration_seconds': round(calibration, 5),
+        'benchmarks': benchmarks,
+    }
+
+
+def compare(current: Dict, baseline: Dict, threshold: float = DEFAULT_THRESHOLD) -> List[Dict]:
+    """
+    Compare normalised timings of the benchmarks present in both documents.
+    Returns one row per benchmark with its ratio (current / baseline) and
+    whether it regressed past the threshold.
+    """
+    rows = []
+    for name, result in current.get('benchmarks', {}).items():
+        reference = baseline.get('benchmarks', {}).get(name)
+        if not reference or not reference.get('normalized'):
+            continue
+        ratio = result['normalized'] / reference['normalized']
+        rows.append({'name': name, 'ratio': round(ratio, 3), 'regressed': ratio > 1 + threshold})
+    return rows
+
+
+def load_baseline(path: str) -> Optional[Dict]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_baseline(path: str, document: Dict) -> None:
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline performance regression suite')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES,
+                        help=f'Comma-separated corpus sizes in lines (default: {DEFAULT_SIZES})')
+    parser.add_argument('--quick', action='store_true',
+                        help=f'Only run the small sizes ({QUICK_SIZES})')
+    parser.add_argument('--seed', type=int, default=42, help='Corpus random seed (default: 42)')
+    parser.add_argument('--repeat', type=int, default=3, help='Timing repetitions, best is kept (default: 3)')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE,
+                        help=f'Baseline JSON file (default: {DEFAULT_BASELINE})')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'Allowed slowdown before failing, as a fraction (default: {DEFAULT_THRESHOLD})')
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='Store this run as the new baseline instead of comparing')
+    parser.add_argument('--output', help='Also write this run\'s results to a JSON file')
+    args = parser.parse_args()
+
+    sizes = [parse_size(s) for s in (QUICK_SIZES if args.quick else args.sizes).split(',') if s.strip()]
+    print(f"Running benchmarks at {', '.join(size_label(s) for s in sizes)} lines (seed {args.seed})...")
+    current = run_suite(sizes, args.seed, args.repeat)
+    print(f"  Calibration workload: {current['calibration_seconds']}s")
+    for name, result in current['benchmarks'].items():
+        print(f"  {name:<40} {result['seconds']:>10.4f}s {result['per_sec']:>14,} {result['unit']}/sec")
+
+    if args.output:
+        save_baseline(args.output, current)
+
+    if args.update_baseline:
+        baseline = load_baseline(args.baseline) or {'benchmarks': {}}
+        baseline.update({k: v for k, v in current.items() if k != 'benchmarks'})
+        baseline['benchmarks'].update(current['benchmarks'])
+        save_baseline(args.baseline, baseline)
+        print(f"\nBaseline updated: {args.baseline}")
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        print(f"\nNo baseline at {args.baseline}; run with --update-baseline to create one")
+        return 0
+
+    rows = compare(current, baseline, args.threshold)
+    print(f"\nCompared with {args.baseline} (threshold +{args.threshold:.0%}):")
+    for row in rows:
+        marker = '❌ REGRESSION' if row['regressed'] else '✅'
+        print(f"  {row['name']:<40} {row['ratio']:>6.2f}x baseline  {marker}")
+
+    regressions = [row for row in rows if row['regressed']]
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) regressed past the threshold")
+        return 1
+    print("\nNo regressions")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Build profiles: extra filter variants from one collection run
+Each entry of "profiles" in sources.json selects a subset of the domains the
+run already collected and validated (validated or all collected names, only
+some services, only some classifier verdicts, minus exclusions) and writes
+it with its own grouping and formats. Fetching, parsing, classification and
+DNS validation happen once, however many variants are configured.
+"""
+
+import os
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from scripts.domain_classifier import Verdict
+from scripts.filter_emitters import AdGuardEmitter, get_emitter
+
+DOMAIN_SETS = ('validated', 'collected')
+# output_format keys a profile may override
+OUTPUT_SETTINGS = ('include_comments', 'group_by_service', 'sort_alphabetically', 'minimize_subdomains')
+
+
+def _is_under(domain: str, suffixes: Iterable[str]) -> bool:
+    return any(domain == s or domain.endswith('.' + s) for s in suffixes)
+
+
+@dataclass
+class BuildProfile:
+    """One configured filter variant"""
+    name: str
+    path: str  # Relative to the directory of the main output file
+    type: str = AdGuardEmitter.format_name
+    domains: str = 'validated'  # 'validated' (DNS-checked) or 'collected' (everything found)
+    services: List[str] = field(default_factory=list)  # Base domains to keep; empty keeps all
+    reasons: List[str] = field(default_factory=list)  # Classifier verdict reasons to keep; empty keeps all
+    exclude: List[str] = field(default_factory=list)  # Names dropped together with their subdomains
+    title: Optional[str] = None
+    outputs: List[Dict] = field(default_factory=list)  # Further formats, like output_format.outputs
+    settings: Dict = field(default_factory=dict)  # Overrides of the output_format settings
+
+    @classmethod
+    def from_config(cls, entry: Dict) -> 'BuildProfile':
+        name = entry.get('name')
+        if not name or not entry.get('path'):
+            raise ValueError(f"Build profile needs a name and a path: {entry}")
+        if entry.get('domains', 'validated') not in DOMAIN_SETS:
+            raise ValueError(f"Build profile {name}: domains must be one of {', '.join(DOMAIN_SETS)}")
+        profile = cls(
+            name=name,
+            path=entry['path'],
+            type=entry.get('type', AdGuardEmitter.format_name),
+            domains=entry.get('domains', 'validated'),
+            services=[s.lower() for s in entry.get('services', [])],
+            reasons=list(entry.get('reasons', [])),
+            exclude=[d.lower() for d in entry.get('exclude', [])],
+            title=entry.get('title'),
+            outputs=list(entry.get('outputs', [])),
+            settings={key: entry[key] for key in OUTPUT_SETTINGS if key in entry},
+        )
+        for format_name, _ in profile.targets(''):
+            get_emitter(format_name)
+        return profile
+
+    def select(self, collected: Set[str], validated: Set[str],
+               classify: Callable[[str], Verdict]) -> Set[str]:
+        """The domains of this variant, taken from the run's shared results"""
+        selected = set(validated if self.domains == 'validated' else collected)
+        if self.services:
+            selected = {d for d in selected if _is_under(d, self.services)}
+        if self.reasons:
+            selected = {d for d in selected if classify(d).reason in self.reasons}
+        if self.exclude:
+            selected = {d for d in selected if not _is_under(d, self.exclude)}
+        return selected
+
+    def targets(self, base_dir: str) -> List[Tuple[str, str]]:
+        """(format, path) pairs for the main file and every extra output"""
+        targets = [(self.type, os.path.join(base_dir, self.path))]
+        for output in self.outputs:
+            targets.append((output['type'], os.path.join(base_dir, output['path'])))
+        return targets
+
+    def output_settings(self, defaults: Optional[Dict]) -> Dict:
+        merged = {key: value for key, value in (defaults or {}).items() if key in OUTPUT_SETTINGS}
+        merged.update(self.settings)
+        return merged
+
+
+def load_profiles(config: Dict) -> List[BuildProfile]:
+    """Profiles from the "profiles" section of a sources.json configuration"""
+    profiles = [BuildProfile.from_config(entry) for entry in config.get('profiles', [])]
+    names = [profile.name for profile in profiles]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate build profile names: {', '.join(duplicates)}")
+    return profiles
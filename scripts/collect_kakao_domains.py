@@ -5,26 +5,215 @@ Fetches and extracts Kakao/Daum related domains from multiple sources
 Validates domains via DNS to exclude NXDOMAIN (non-existent) domains
 """
 
+import argparse
+import cProfile
+import hashlib
 import json
+import multiprocessing
+import os
+import pstats
 import re
 import sys
-import urllib.request
-import urllib.error
 import socket
 import concurrent.futures
 from datetime import datetime
 from pathlib import Path
-from typing import Set, Dict, Optional, Tuple
+from typing import Callable, Set, Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple, Union
+
+# Allow running as `python scripts/collect_kakao_domains.py` as well as importing
+# as `scripts.collect_kakao_domains` (tests, CI snippets)
+_REPO_ROOT = str(Path(__file__).resolve().parent.parent)
+if _REPO_ROOT not in sys.path:
+    sys.path.insert(0, _REPO_ROOT)
+
+from scripts.async_resolver import AsyncDNSResolver  # noqa: E402
+from scripts.build_profiles import load_profiles  # noqa: E402
+from scripts.dns_cache import (  # noqa: E402
+    DEFAULT_NEGATIVE_TTL, DEFAULT_POSITIVE_TTL, DNSAnswerCache, DNSLivenessCache,
+)
+from scripts.artifacts import ArtifactPublisher, find_patches, stabilize_from_outputs  # noqa: E402
+from scripts.diff_updates import DiffUpdatePublisher  # noqa: E402
+from scripts.domain_classifier import DomainClassifier, Verdict  # noqa: E402
+from scripts.filter_emitters import (  # noqa: E402
+    AdGuardEmitter, FilterModel, build_model, emit_files, output_targets, render,
+)
+from scripts.http_client import RetryPolicy  # noqa: E402
+from scripts.instrumentation import (  # noqa: E402
+    BYTES_FETCHED, CANDIDATES_CLASSIFIED, DNS_CACHE_HITS, DNS_QUERIES, DOMAINS_FOUND, LINES_PARSED, RunReport,
+)
+from scripts.snapshot import Snapshot, SnapshotRecorder  # noqa: E402
+from scripts.source_fetcher import (  # noqa: E402
+    DEFAULT_MAX_BYTES, ParseCache, SourceFetcher, iter_blocks, iter_lines,
+)
+
+DEFAULT_CACHE_DIR = ".cache/collector"
+DEFAULT_PARSE_BLOCK_SIZE = 1024 * 1024  # Bytes of a source handed to one parse worker task
+
+# getaddrinfo errors that mean "this name has no address", as opposed to a transient failure
+_NO_ADDRESS_ERRNOS = {
+    getattr(socket, name) for name in ('EAI_NONAME', 'EAI_NODATA') if hasattr(socket, name)
+}
+
+
+def split_lines(text: str) -> Iterator[str]:
+    """Yield the lines of text one at a time without building a list of them"""
+    start = 0
+    while True:
+        end = text.find('\n', start)
+        if end == -1:
+            if start < len(text):
+                yield text[start:]
+            return
+        yield text[start:end]
+        start = end + 1
+
+
+class AdblockExtractor:
+    """
+    Single-pass domain extractor for AdBlock filter lists.
+
+    Every Kakao/Daum domain we can block contains 'kakao' or 'daum', so lines
+    without either substring are discarded before any regex runs. The remaining
+    lines are scanned once with a combined pattern that covers '||domain^'
+    (incl. '@@||domain^' and '$modifiers') and '|domain^' rules, and each
+    distinct candidate is classified only once per extraction.
+    """
+
+    # Bump whenever extraction semantics change, so cached parse results are invalidated
+    VERSION = 1
+
+    # '||domain^' or '|domain^'; the optional second pipe makes one pattern cover both
+    RULE_DOMAIN_RE = re.compile(r'\|\|?([a-zA-Z0-9.-]+)\^')
+    HINTS = ('kakao', 'daum')
+
+    def extract(self, content: Union[str, Iterable[str]],
+                classify: Callable[[str], bool],
+                stats: Optional[Dict[str, int]] = None) -> Set[str]:
+        """
+        Return the candidates in content for which classify() is True.
+        If stats is given, the numbers of lines read and candidates classified
+        are added to its LINES_PARSED/CANDIDATES_CLASSIFIED entries.
+        """
+        domains: Set[str] = set()
+        seen: Set[str] = set()
+        findall = self.RULE_DOMAIN_RE.findall
+        kakao, daum = self.HINTS
+        line_count = 0
+
+        lines = split_lines(content) if isinstance(content, str) else content
+        for line_count, line in enumerate(lines, 1):
+            # Cheap prefilter: ~99% of lines never mention Kakao/Daum
+            lowered = line.lower()
+            if kakao not in lowered and daum not in lowered:
+                continue
+
+            line = line.strip()
+
+            # Skip comments and empty lines
+            if not line or line[0] in '!#':
+                continue
+
+            for domain in findall(line):
+                if domain in seen:
+                    continue
+                seen.add(domain)
+                if classify(domain):
+                    domains.add(domain)
+
+        if stats is not None:
+            stats[LINES_PARSED] = stats.get(LINES_PARSED, 0) + line_count
+            stats[CANDIDATES_CLASSIFIED] = stats.get(CANDIDATES_CLASSIFIED, 0) + len(seen)
+        return domains
+
+
+# Per-process parser state for the parse pool (see KakaoDomainCollector.collect_from_sources)
+_worker_parser: Optional[Tuple[AdblockExtractor, DomainClassifier]] = None
+
+
+def _init_parse_worker(config: Dict, whitelist: List[str]) -> None:
+    global _worker_parser
+    _worker_parser = (AdblockExtractor(), DomainClassifier.from_config(config, whitelist))
+
+
+def _parse_block(block: bytes, encoding: str) -> Tuple[FrozenSet[str], Dict[str, int]]:
+    """Parse one newline-aligned block of a source inside a pool worker; returns (domains, stats)"""
+    extractor, classifier = _worker_parser
+    text = block.decode(encoding, errors='ignore')
+    stats: Dict[str, int] = {}
+    return frozenset(extractor.extract(text, classifier.is_ad_domain, stats)), stats
+
+
+def _is_ascii_compatible(encoding: str) -> bool:
+    """True if newline bytes can be used to split encoded text safely"""
+    try:
+        return '\n'.encode(encoding) == b'\n' and 'a'.encode(encoding) == b'a'
+    except LookupError:
+        return False
 
 
 class KakaoDomainCollector:
-    def __init__(self, sources_file: str = "scripts/sources.json"):
+    def __init__(self, sources_file: str = "scripts/sources.json",
+                 cache_dir: Optional[str] = None, fetch_workers: int = 8,
+                 dns_positive_ttl: float = DEFAULT_POSITIVE_TTL,
+                 dns_negative_ttl: float = DEFAULT_NEGATIVE_TTL,
+                 dns_engine: str = 'threads', dns_concurrency: int = 256,
+                 dns_timeout: float = 2.0, nameservers: Optional[List[str]] = None,
+                 dns_port: int = 53, parse_workers: int = 1,
+                 parse_block_size: int = DEFAULT_PARSE_BLOCK_SIZE,
+                 profile_path: Optional[str] = None, record: bool = False,
+                 replay_path: Optional[str] = None):
         self.sources_file = Path(sources_file)
         self.sources = self.load_sources()
+        self.profiles = load_profiles(self.sources)  # Extra filter variants, see save_profiles()
+        # replay_path rebuilds from a recorded snapshot: bodies and DNS answers
+        # come from the archive, nothing touches the network or the disk caches
+        self.snapshot = Snapshot.load(replay_path) if replay_path else None
+        if self.snapshot:
+            cache_dir = None
+        # cache_dir=None disables the on-disk caches (every run downloads and resolves everything)
+        fetch_settings = self.sources.get('fetch_settings', {})
+        self.fetcher = SourceFetcher(
+            cache_dir=cache_dir, max_workers=fetch_workers,
+            max_bytes=fetch_settings.get('max_bytes', DEFAULT_MAX_BYTES),
+            retry=RetryPolicy(attempts=1 + fetch_settings.get('retries', 3)),
+            max_per_host=fetch_settings.get('max_connections_per_host', 4),
+            client=self.snapshot.client() if self.snapshot else None,
+        )
+        # With record, fetched bodies and DNS answers are kept for save_snapshot()
+        self.recorder = SnapshotRecorder() if record else None
+        if self.recorder:
+            self.fetcher.client = self.recorder.client(self.fetcher.client)
+        self.dns_cache = DNSLivenessCache(
+            str(Path(cache_dir) / 'dns-liveness.sqlite3'),
+            positive_ttl=dns_positive_ttl, negative_ttl=dns_negative_ttl,
+        ) if cache_dir else None
+        # Per-record answers kept for their own TTLs; used by the async engine,
+        # which sees the TTLs (the system resolver behind 'threads' hides them)
+        self.answer_cache = DNSAnswerCache(
+            str(Path(cache_dir) / 'dns-answers.sqlite3')
+        ) if cache_dir else None
+        self.parse_cache = ParseCache(cache_dir) if cache_dir else None
+        # 'threads': socket.gethostbyname in a thread pool (system resolver, IPv4 only)
+        # 'async': AsyncDNSResolver sending A/AAAA queries itself with high concurrency
+        if dns_engine not in ('threads', 'async'):
+            raise ValueError(f"Unknown DNS engine: {dns_engine}")
+        self.dns_engine = dns_engine
+        self.dns_concurrency = dns_concurrency
+        self.dns_timeout = dns_timeout
+        self.nameservers = nameservers
+        self.dns_port = dns_port
+        # parse_workers <= 1 parses in the fetch threads; 0 on the CLI means one per CPU core
+        self.parse_workers = parse_workers
+        self.parse_block_size = parse_block_size
+        # With profile_path, parsing and classification run in-process under cProfile
+        self.profile_path = profile_path
+        self.report = RunReport()
         self.collected_domains: Set[str] = set()
         self.validated_domains: Set[str] = set()  # Domains that actually exist
         self.nxdomain_domains: Set[str] = set()  # Domains that don't exist
         self.whitelist_domains = self._get_whitelist_domains()
+        self.classifier = DomainClassifier.from_config(self.sources, self.whitelist_domains)
+        self.extractor = AdblockExtractor()
 
     def load_sources(self) -> Dict:
         """Load data sources configuration"""
@@ -197,152 +386,191 @@ class KakaoDomainCollector:
 
     def fetch_content(self, url: str, encoding: str = 'utf-8') -> str:
         """Fetch content from URL with error handling"""
-        try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (compatible; KakaoDomainCollector/1.0)'
-            }
-            req = urllib.request.Request(url, headers=headers)
-
-            with urllib.request.urlopen(req, timeout=30) as response:
-                content = response.read()
-                if encoding:
-                    return content.decode(encoding, errors='ignore')
-                return content.decode('utf-8', errors='ignore')
-
-        except urllib.error.HTTPError as e:
-            print(f"HTTP Error {e.code} fetching {url}: {e.reason}")
-        except urllib.error.URLError as e:
-            print(f"URL Error fetching {url}: {e.reason}")
-        except Exception as e:
-            print(f"Error fetching {url}: {e}")
-
-        return ""
-
-    def extract_domains_from_adblock(self, content: str) -> Set[str]:
-        """Extract domains from AdBlock filter format"""
-        domains = set()
-
-        # Multiple patterns for different AdBlock rule formats
-        patterns = [
-            r'\|\|([a-zA-Z0-9.-]+)\^',  # Standard: ||domain.com^
-            r'\|\|([a-zA-Z0-9.-]+)\^[^$]*$',  # With additional modifiers
-            r'@@\|\|([a-zA-Z0-9.-]+)\^',  # Whitelist rules (to identify domains)
-            r'[|]{1,2}([a-zA-Z0-9.-]*(?:kakao|daum)[a-zA-Z0-9.-]*)\^',  # Kakao/Daum specific
-        ]
-
-        for line in content.split('\n'):
-            line = line.strip()
-
-            # Skip comments and empty lines
-            if not line or line.startswith('!') or line.startswith('#'):
-                continue
+        result = self.fetcher.fetch({'url': url, 'encoding': encoding})
+        if not result.ok:
+            print(f"{result.error} fetching {url}")
+            return ""
+        return result.text
 
-            # Try each pattern
-            for pattern in patterns:
-                matches = re.findall(pattern, line)
-                for domain in matches:
-                    if domain and self.is_kakao_related(domain):
-                        domains.add(domain)
-
-            # Also look for domain patterns in comments (sometimes contain example domains)
-            if line.startswith('!') and ('kakao' in line.lower() or 'daum' in line.lower()):
-                # Extract domains from comments
-                comment_domains = re.findall(
-                    r'([a-zA-Z0-9.-]*(?:kakao|daum)[a-zA-Z0-9.-]*\.(?:com|net|kr))',
-                    line.lower()
-                )
-                for domain in comment_domains:
-                    if self.is_kakao_related(domain):
-                        domains.add(domain)
+    def _parse_key(self) -> str:
+        """
+        Fingerprint of everything that influences extraction results.
+        Cached parse results are only reused when this matches, so editing
+        kakao_patterns, ad_keywords or the whitelist forces a re-parse.
+        """
+        config = {
+            'extractor_version': AdblockExtractor.VERSION,
+            'kakao_patterns': self.sources.get('kakao_patterns', []),
+            'ad_keywords': self.sources.get('ad_keywords', []),
+            'whitelist': sorted(self.whitelist_domains),
+        }
+        encoded = json.dumps(config, sort_keys=True).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
 
-        return domains
+    def extract_domains_from_adblock(self, content: Union[str, Iterable[str]],
+                                     stats: Optional[Dict[str, int]] = None) -> Set[str]:
+        """
+        Extract domains from AdBlock filter format.
+        content is either the whole list as one string or an iterable of lines
+        (e.g. the streaming generator from SourceFetcher). Line and candidate
+        counts are added to stats if given.
+        """
+        return self.extractor.extract(content, self.is_kakao_related, stats)
 
     def is_kakao_related(self, domain: str) -> bool:
         """
         Check if domain is related to Kakao/Daum services AND is an ad/tracking domain.
 
         Returns True only if:
-        1. Domain matches Kakao/Daum patterns AND
+        1. Domain is (a subdomain of) a Kakao/Daum base domain AND
         2. Domain contains specific ad/tracking keywords AND
         3. Domain is NOT in the whitelist of legitimate services
 
         This ensures we only block advertising/tracking domains, not legitimate services.
+        Use classify() to get the reason and matched keywords behind a decision.
         """
-        if not domain:
-            return False
-
-        domain_lower = domain.lower().strip()
-
-        # Basic domain format validation
-        if not re.match(r'^[a-zA-Z0-9.-]+$', domain) or domain.startswith('.') or domain.endswith('.'):
-            return False
+        return self.classifier.classify(domain).is_ad
 
-        # CRITICAL: Skip whitelisted legitimate service domains
-        if domain_lower in self.whitelist_domains:
-            print(f"  WHITELIST: Skipping legitimate service domain: {domain_lower}")
-            return False
+    def classify(self, domain: str) -> Verdict:
+        """Return the classifier verdict (decision, reason, matched keywords) for domain"""
+        return self.classifier.classify(domain)
 
-        # Skip obviously non-Kakao domains
-        if not any(x in domain_lower for x in ['kakao', 'daum']):
-            return False
+    def collect_from_sources(self) -> None:
+        """
+        Collect domains from all configured sources.
+        Sources are downloaded in parallel and streamed through the extractor, so
+        parsing starts before a download finishes and no source is ever held in
+        memory as a whole. With parse_workers > 1 the streamed bytes are cut into
+        newline-aligned blocks that are parsed in a process pool across CPU cores.
+        With a cache, extraction results are stored by the SHA-256 of the source
+        body plus the classifier fingerprint (see _parse_key), so a source whose
+        bytes are unchanged - a 304 Not Modified or an identical re-download -
+        skips extraction and classification entirely. Bodies are then spooled
+        to the cache before parsing so their hash is known up front.
+        """
+        sources = self.sources.get("sources", [])
+        for source in sources:
+            print(f"Fetching from {source.get('name', 'Unknown')}: {source.get('url', '')}")
+
+        parse_key = self._parse_key()
+        parse_cache = self.parse_cache
+        use_pool = self.parse_workers > 1 and not self.profile_path
+        pool = self._start_parse_pool() if use_pool else None
+        profiles: List[cProfile.Profile] = []
+
+        def parse(result, stream, stats) -> Set[str]:
+            if pool is None:
+                return self.extract_domains_from_adblock(stream, stats)
+            if not _is_ascii_compatible(result.encoding):
+                return self.extract_domains_from_adblock(iter_lines(stream, result.encoding), stats)
+
+            futures = [
+                pool.submit(_parse_block, block, result.encoding)
+                for block in iter_blocks(stream, self.parse_block_size)
+            ]
+            domains: Set[str] = set()
+            for future in futures:
+                block_domains, block_stats = future.result()
+                domains.update(block_domains)
+                for counter, value in block_stats.items():
+                    stats[counter] = stats.get(counter, 0) + value
+            return domains
+
+        def consume(result, stream) -> Optional[Tuple[Set[str], bool, Dict[str, int]]]:
+            if result.source.get("type", "adblock") != "adblock":
+                return None
+            if parse_cache:
+                cached_domains = parse_cache.get(result.sha256, parse_key)
+                if cached_domains is not None:
+                    return set(cached_domains), True, {}
+
+            stats: Dict[str, int] = {}
+            if not self.profile_path:
+                return parse(result, stream, stats), False, stats
+            # cProfile only sees the thread that enabled it: one profile per source
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                return parse(result, stream, stats), False, stats
+            finally:
+                profile.disable()
+                profiles.append(profile)
 
-        # Check if domain matches Kakao/Daum patterns
-        kakao_pattern_matched = False
-        for pattern in self.sources.get("kakao_patterns", []):
-            if re.search(pattern, domain_lower):
-                kakao_pattern_matched = True
-                break
+        try:
+            results = self.fetcher.fetch_all(sources, consume=consume, raw=pool is not None,
+                                             spool=parse_cache is not None)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        for result in results:
+            name = result.name
+            self.report.count(BYTES_FETCHED, result.size)
+            self.report.record_source(name, url=result.url, status=result.status, error=result.error,
+                                      bytes=result.size, elapsed_seconds=round(result.elapsed, 4))
+
+            if not result.ok:
+                print(f"  Failed to fetch content from {name}: {result.error}")
+                continue
 
-        if not kakao_pattern_matched:
-            return False
+            if self.recorder and result.status == 'not_modified':
+                # Served from the cache, so the recording client never saw the body
+                self.recorder.add_body(result.url, self.fetcher.cache.read_body(result.url),
+                                       result.etag, result.last_modified)
 
-        # Now check for SPECIFIC ad-related keywords (more restrictive than before)
-        ad_keyword_matched = False
-        matched_keywords = []
+            if not result.size:
+                print(f"  Failed to fetch content from {name}")
+                continue
 
-        for ad_keyword in self.sources.get("ad_keywords", []):
-            if re.search(ad_keyword, domain_lower):
-                ad_keyword_matched = True
-                matched_keywords.append(ad_keyword)
+            if result.parsed is None:
+                continue
 
-        if ad_keyword_matched:
-            print(f"  AD DOMAIN: {domain_lower} matched keywords: {matched_keywords}")
-            return True
+            domains, reused, stats = result.parsed
+            self.collected_domains.update(domains)
+            for counter, value in stats.items():
+                self.report.count(counter, value)
+            self.report.count(DOMAINS_FOUND, len(domains))
+            self.report.record_source(name, parse_cache_hit=reused, domains_found=len(domains),
+                                      lines_parsed=stats.get(LINES_PARSED, 0),
+                                      candidates_classified=stats.get(CANDIDATES_CLASSIFIED, 0))
+            if reused:
+                label = "Not modified" if result.status == 'not_modified' else "Unchanged content"
+                print(f"  {label}: reused {len(domains)} Kakao/Daum domains from {name}")
+                continue
 
-        # Additional check for obvious ad domains with simple patterns
-        # These are fallback patterns for domains that might not match the regex exactly
-        simple_ad_patterns = [
-            'ad.', 'ads.', 'adm.', 'adapi.', 'adserver.', 'track.',
-            'pixel.', 'beacon.', 'collector.', 'bizboard.', 'dmp.'
-        ]
-        for pattern in simple_ad_patterns:
-            if pattern in domain_lower:
-                print(f"  AD DOMAIN: {domain_lower} matched simple pattern: {pattern}")
-                return True
-
-        # If we get here, it's a Kakao domain but doesn't contain ad indicators
-        print(f"  LEGITIMATE: Skipping Kakao domain without ad indicators: {domain_lower}")
-        return False
+            if parse_cache:
+                parse_cache.put(result.sha256, parse_key, domains)
+            print(f"  Extracted {len(domains)} Kakao/Daum domains from {name}")
 
-    def collect_from_sources(self) -> None:
-        """Collect domains from all configured sources"""
-        for source in self.sources.get("sources", []):
-            name = source.get("name", "Unknown")
-            url = source.get("url", "")
-            source_type = source.get("type", "adblock")
-            encoding = source.get("encoding", "utf-8")
+        if parse_cache:
+            parse_cache.prune()
 
-            print(f"Fetching from {name}: {url}")
+        if pool is None:
+            info = self.classifier.cache_info()
+            print(f"  Classifier: {info.misses} distinct candidates classified, {info.hits} memo hits")
 
-            content = self.fetch_content(url, encoding)
-            if not content:
-                print(f"  Failed to fetch content from {name}")
-                continue
+        if self.profile_path:
+            self._dump_profile(profiles)
 
-            if source_type == "adblock":
-                domains = self.extract_domains_from_adblock(content)
-                self.collected_domains.update(domains)
-                print(f"  Extracted {len(domains)} Kakao/Daum domains from {name}")
+    def _dump_profile(self, profiles: List[cProfile.Profile]) -> None:
+        """Merge the per-source parse profiles into one pstats file"""
+        if not profiles:
+            print("  Profile: no sources were parsed, nothing to write")
+            return
+        stats = pstats.Stats(*profiles)
+        stats.dump_stats(self.profile_path)
+        print(f"  Profile of parse/classify written to {self.profile_path} "
+              f"(view with: python -m pstats {self.profile_path})")
+
+    def _start_parse_pool(self) -> concurrent.futures.ProcessPoolExecutor:
+        """Process pool whose workers each hold their own extractor and classifier"""
+        # Workers are started from the fetch threads; 'spawn' avoids forking a threaded process
+        return concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.parse_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_parse_worker,
+            initargs=(self.sources, sorted(self.whitelist_domains)),
+        )
 
     def add_known_domains(self) -> None:
         """
@@ -407,10 +635,11 @@ class KakaoDomainCollector:
         # Validate each known domain against our own criteria before adding
         validated_domains = set()
         for domain in known_ad_domains:
-            if self.is_kakao_related(domain):
+            verdict = self.classify(domain)
+            if verdict.is_ad:
                 validated_domains.add(domain)
             else:
-                print(f"  WARNING: Known domain {domain} failed validation, skipping")
+                print(f"  WARNING: Known domain {domain} failed validation ({verdict.reason}), skipping")
 
         initial_count = len(self.collected_domains)
         self.collected_domains.update(validated_domains)
@@ -418,57 +647,135 @@ class KakaoDomainCollector:
         print(f"Added {added_count} validated known ad domains")
         print(f"Total collected ad domains: {len(self.collected_domains)}")
 
-    def validate_domain_dns(self, domain: str) -> Tuple[bool, Optional[str]]:
+    def lookup_domain_dns(self, domain: str) -> Tuple[str, Optional[str]]:
         """
-        Validate if domain actually exists via DNS lookup.
-        Returns (exists, ip_address) tuple.
+        Resolve domain and classify the outcome.
+        Returns (status, ip_address) where status is 'active', 'nxdomain'
+        (the name definitely has no address) or 'error' (transient failure).
         """
         try:
-            # Try to resolve the domain
-            result = socket.gethostbyname(domain)
-            return (True, result)
+            return ('active', socket.gethostbyname(domain))
         except socket.gaierror as e:
-            # NXDOMAIN or other DNS errors
-            return (False, None)
-        except Exception as e:
-            # Other errors - treat as non-existent
-            return (False, None)
+            if e.errno in _NO_ADDRESS_ERRNOS:
+                return ('nxdomain', None)
+            return ('error', None)
+        except Exception:
+            return ('error', None)
 
-    def validate_domains(self) -> None:
+    def validate_domain_dns(self, domain: str) -> Tuple[bool, Optional[str]]:
         """
-        Validate all collected domains via DNS to exclude NXDOMAIN.
-        Uses concurrent lookups for performance.
+        Validate if domain actually exists via DNS lookup.
+        Returns (exists, ip_address) tuple.
         """
-        if not self.collected_domains:
-            print("No domains to validate")
+        status, ip = self.lookup_domain_dns(domain)
+        return (status == 'active', ip)
+
+    def _record_dns_result(self, domain: str, exists: bool, ip: Optional[str], note: str = "") -> None:
+        if exists:
+            self.validated_domains.add(domain)
+            print(f"  ✅ ACTIVE{note}: {domain} → {ip}")
+        else:
+            self.nxdomain_domains.add(domain)
+            print(f"  ❌ NXDOMAIN{note}: {domain} (doesn't exist)")
+
+    def _resolve_domains(self, domains: Set[str]) -> Iterator[Tuple[str, str, Optional[str]]]:
+        """
+        Resolve domains with the configured engine, yielding (domain, status, ip).
+        status is one of 'active', 'nxdomain', 'nodata', 'timeout' or 'error'.
+        """
+        if not domains:
             return
 
-        print(f"\nValidating {len(self.collected_domains)} domains via DNS...")
-        print("  (This may take a moment - checking if domains actually exist)")
+        if self.snapshot:
+            missing = [domain for domain in sorted(domains) if domain not in self.snapshot.dns]
+            if missing:
+                print(f"  {len(missing)} domains have no recorded DNS answer in {self.snapshot.path}")
+            for domain in sorted(domains):
+                status, ip = self.snapshot.lookup(domain)
+                yield domain, status, ip
+            return
+
+        if self.dns_engine == 'async':
+            resolver = AsyncDNSResolver(
+                nameservers=self.nameservers, port=self.dns_port,
+                concurrency=self.dns_concurrency, timeout=self.dns_timeout,
+                cache=self.answer_cache,
+            )
+            results = resolver.resolve_all(sorted(domains))
+            self.report.count(DNS_QUERIES, resolver.queries_sent)
+            print(f"  Async engine: {resolver.queries_sent} queries, "
+                  f"up to {resolver.concurrency} in flight via {', '.join(resolver.nameservers)}")
+            if self.answer_cache:
+                print(f"  Answer cache: {self.answer_cache.hits} answers reused within their TTL")
+            for domain, result in results.items():
+                yield domain, result.status, (result.addresses[0] if result.addresses else None)
+            return
 
-        # Use thread pool for concurrent DNS lookups
+        # Use thread pool for concurrent DNS lookups through the system resolver
+        self.report.count(DNS_QUERIES, len(domains))
         with concurrent.futures.ThreadPoolExecutor(max_workers=20) as executor:
-            # Submit all DNS lookups
             future_to_domain = {
-                executor.submit(self.validate_domain_dns, domain): domain
-                for domain in self.collected_domains
+                executor.submit(self.lookup_domain_dns, domain): domain
+                for domain in domains
             }
 
             # Process results as they complete
             for future in concurrent.futures.as_completed(future_to_domain):
                 domain = future_to_domain[future]
                 try:
-                    exists, ip = future.result(timeout=5)
-                    if exists:
-                        self.validated_domains.add(domain)
-                        print(f"  ✅ ACTIVE: {domain} → {ip}")
-                    else:
-                        self.nxdomain_domains.add(domain)
-                        print(f"  ❌ NXDOMAIN: {domain} (doesn't exist)")
-                except Exception as e:
-                    # Timeout or other error - treat as NXDOMAIN
-                    self.nxdomain_domains.add(domain)
-                    print(f"  ⚠️  TIMEOUT: {domain} (treating as non-existent)")
+                    status, ip = future.result(timeout=5)
+                except Exception:
+                    status, ip = 'error', None
+                yield domain, status, ip
+
+    def validate_domains(self) -> None:
+        """
+        Validate all collected domains via DNS to exclude NXDOMAIN.
+        Results still fresh in the persistent liveness cache are reused, so only
+        new or expired domains are resolved. Uses concurrent lookups for performance.
+        """
+        if not self.collected_domains:
+            print("No domains to validate")
+            return
+
+        print(f"\nValidating {len(self.collected_domains)} domains via DNS...")
+
+        to_resolve = set(self.collected_domains)
+        if self.dns_cache:
+            cached = self.dns_cache.get_many(sorted(to_resolve))
+            for domain, (exists, ip) in sorted(cached.items()):
+                self._record_dns_result(domain, exists, ip, " (cached)")
+                if self.recorder:
+                    self.recorder.add_dns(domain, 'active' if exists else 'nxdomain', ip)
+            to_resolve -= cached.keys()
+            self.report.count(DNS_CACHE_HITS, len(cached))
+            print(f"  {len(cached)} cached results reused, {len(to_resolve)} domains to resolve")
+
+        if to_resolve:
+            print("  (This may take a moment - checking if domains actually exist)")
+
+        definitive = []
+        for domain, status, ip in self._resolve_domains(to_resolve):
+            if self.recorder:
+                self.recorder.add_dns(domain, status, ip)
+            if status in ('timeout', 'error'):
+                # Timeout or other error - treat as NXDOMAIN for this run, but don't cache
+                self.nxdomain_domains.add(domain)
+                print(f"  ⚠️  TIMEOUT: {domain} (treating as non-existent)")
+                continue
+
+            if status == 'nodata':
+                self.nxdomain_domains.add(domain)
+                print(f"  ❌ NODATA: {domain} (no A/AAAA records)")
+            else:
+                self._record_dns_result(domain, status == 'active', ip)
+            definitive.append((domain, status == 'active', ip))
+
+        if self.dns_cache:
+            self.dns_cache.put_many(definitive)
+            self.dns_cache.purge_expired()
+        if self.answer_cache:
+            self.answer_cache.purge_expired()
 
         # Summary
         print(f"\n  DNS Validation Summary:")
@@ -482,96 +789,125 @@ class KakaoDomainCollector:
             if len(self.nxdomain_domains) > 10:
                 print(f"    ... and {len(self.nxdomain_domains) - 10} more")
 
+    def save_snapshot(self, path: str) -> None:
+        """Write the bodies and DNS answers recorded during this run to path"""
+        if not self.recorder:
+            raise ValueError("Collector was not created with record=True")
+        config = {key: value for key, value in self.sources.items() if key != 'sources'}
+        self.recorder.save(path, config=config)
+        print(f"Snapshot written to {path}: {len(self.recorder.sources)} sources, "
+              f"{len(self.recorder.dns)} DNS answers")
+
+    def build_filter_model(self, domains: Optional[Set[str]] = None,
+                           settings: Optional[Dict] = None, **fields) -> FilterModel:
+        """
+        Validated domains (or the given subset) grouped as configured in the
+        output_format section, or in settings for a build profile
+        """
+        if settings is None:
+            settings = self.sources.get('output_format', {})
+        return build_model(
+            self.validated_domains if domains is None else domains,
+            self.snapshot.created_at if self.snapshot else datetime.utcnow(),
+            group_by_service=settings.get('group_by_service', True),
+            sort_alphabetically=settings.get('sort_alphabetically', True),
+            minimize=settings.get('minimize_subdomains', False),
+            whitelist=self.whitelist_domains,
+            source_count=len(self.sources.get('sources', [])),
+            nxdomain_count=len(self.nxdomain_domains),
+            whitelist_count=len(self.whitelist_domains),
+            **fields,
+        )
+
+    def save_profiles(self, output_file: str) -> List[str]:
+        """
+        Write every build profile configured in sources.json from this run's
+        collected and validated domains; paths are relative to the directory
+        of output_file. Returns the paths written.
+        """
+        written: List[str] = []
+        base_dir = os.path.dirname(output_file)
+        defaults = self.sources.get('output_format', {})
+        for profile in self.profiles:
+            domains = profile.select(self.collected_domains, self.validated_domains, self.classify)
+            if not domains:
+                print(f"  Profile {profile.name}: no domains selected, skipped")
+                continue
+            settings = profile.output_settings(defaults)
+            fields = {'title': profile.title} if profile.title else {}
+            model = self.build_filter_model(domains, settings, **fields)
+            targets = profile.targets(base_dir)
+            include_comments = settings.get('include_comments', True)
+            # Unchanged rules keep the previous header, so the files stay byte-identical
+            stabilize_from_outputs(model, targets, include_comments)
+            paths = emit_files(model, targets, include_comments)
+            written.extend(paths)
+            print(f"  Profile {profile.name}: {len(domains)} domains -> {', '.join(paths)}")
+        return written
+
     def generate_adguard_filter(self) -> str:
         """Generate AdGuard DNS filter format"""
         # Use only validated domains (that actually exist)
         if not self.validated_domains:
             return ""
 
-        # Sort domains for consistent output
-        sorted_domains = sorted(self.validated_domains)
-
-        # Generate header
-        timestamp = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC')
-        short_date = datetime.utcnow().strftime('%Y%m%d')
-
-        lines = [
-            "! Title: Kakao AdBlock Filter (Auto-Generated)",
-            "! Description: Precision AdGuard DNS filter for blocking ONLY Kakao advertising/tracking domains",
-            "! Homepage: https://github.com/seonghobae/AdGuardDNS_KakaoAdBlock",
-            f"! Version: {short_date}",
-            f"! Last modified: {timestamp}",
-            "! Expires: 6 hours",
-            "! License: MIT",
-            "!",
-            "! === PRECISION FILTERING APPROACH ===",
-            "! This filter uses a WHITELIST-FIRST approach to ensure legitimate services work:",
-            "! - BLOCKS: Only domains with specific ad/tracking patterns (ad., ads., track., pixel., etc.)",
-            "! - PRESERVES: Essential services (kakao.com, accounts.kakao.com, pay.kakao.com, etc.)",
-            "! - PHILOSOPHY: Better to miss some ads than break legitimate functionality",
-            "!",
-            f"! Generated from {len(self.sources.get('sources', []))} data sources",
-            f"! Total ad domains blocked: {len(sorted_domains)} (validated via DNS)",
-            f"! Domains removed as NXDOMAIN: {len(self.nxdomain_domains)}",
-            f"! Legitimate domains protected: {len(self.whitelist_domains)}",
-            "!",
-            "! Data Sources:",
-            "!   - List-KR: Korean-language website filters",
-            "!   - YousList: Korean sites ad block filter",
-            "!   - Known ad domains: Curated list of confirmed advertising domains",
-            "!",
-            "! Whitelisted legitimate services (NEVER blocked):",
-            "!   - kakao.com, accounts.kakao.com, kauth.kakao.com (authentication)",
-            "!   - pay.kakao.com, map.kakao.com, talk.kakao.com (core services)",
-            "!   - developers.kakao.com, api.kakao.com (developer services)",
-            "!   - melon.com, brunch.co.kr (entertainment/media)",
-            "!   - daum.net (portal), and other essential services",
-            "!",
-            "! Ad patterns blocked:",
-            "!   - Subdomains: ad.*, ads.*, track.*, pixel.*, beacon.*, collector.*",
-            "!   - Analytics: analytics.*, metrics.*, dmp.*, bizboard.*",
-            "!   - Ad paths: *.ad.*, display.ad.*, banner.ad.*, video.ad.*",
-            "!",
-        ]
-
-        # Group domains by service
-        kakao_domains = [d for d in sorted_domains if 'kakao' in d.lower()]
-        daum_domains = [d for d in sorted_domains if 'daum' in d.lower()]
-        other_domains = [d for d in sorted_domains if d not in kakao_domains and d not in daum_domains]
-
-        if kakao_domains:
-            lines.append("! === Kakao Ad Domains ===")
-            for domain in kakao_domains:
-                lines.append(f"||{domain}^")
-            lines.append("!")
-
-        if daum_domains:
-            lines.append("! === Daum Ad Domains ===")
-            for domain in daum_domains:
-                lines.append(f"||{domain}^")
-            lines.append("!")
-
-        if other_domains:
-            lines.append("! === Other Kakao-related Ad Domains ===")
-            for domain in other_domains:
-                lines.append(f"||{domain}^")
-            lines.append("!")
-
-        lines.append("! === End of Filter ===")
-
-        return '\n'.join(lines)
-
-    def save_filter(self, output_file: str) -> bool:
-        """Save generated filter to file"""
-        try:
-            filter_content = self.generate_adguard_filter()
+        include_comments = self.sources.get('output_format', {}).get('include_comments', True)
+        return render(self.build_filter_model(), AdGuardEmitter.format_name, include_comments)
 
-            if not filter_content:
+    def save_filter(self, output_file: str, patches_dir: Optional[str] = None,
+                    artifacts_dir: Optional[str] = None) -> bool:
+        """
+        Save the filter in every format configured in output_format.
+        The primary format ('type') goes to output_file and each entry of
+        'outputs' to its own path; all of them are written in one pass over
+        the domain model, with atomic replacement of the previous files.
+        With patches_dir, AdGuard outputs are published with differential
+        updates: a '! Diff-Path:' header plus an RCS patch from the previous
+        version (see scripts/diff_updates.py).
+        As long as the rules are unchanged the previous header is kept, so
+        every output stays byte-identical between runs (see
+        scripts/artifacts.py). With artifacts_dir, every output is also
+        published there with .gz/.br siblings and a manifest.
+        """
+        try:
+            if not self.validated_domains:
                 print("No domains collected, filter not generated")
                 return False
 
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(filter_content)
+            settings = self.sources.get('output_format', {})
+            include_comments = settings.get('include_comments', True)
+            targets = output_targets(settings, output_file)
+            model = self.build_filter_model()
+            artifacts = ArtifactPublisher(artifacts_dir) if artifacts_dir else None
+            if model.covered:
+                print(f"Subdomain rules dropped: {len(model.covered)} (covered by a blocked parent)")
+            if (artifacts and artifacts.stabilize(model)) or stabilize_from_outputs(model, targets, include_comments):
+                print(f"Rules unchanged: keeping header from {model.timestamp}")
+            written = [path for _, path in targets]
+
+            if patches_dir:
+                # Diff-Path is an AdGuard feature; other formats are plain rewrites
+                for format_name, path in [t for t in targets if t[0] == AdGuardEmitter.format_name]:
+                    content = render(model, format_name, include_comments)
+                    published = DiffUpdatePublisher(path, patches_dir).publish(content)
+                    if not published.changed:
+                        print(f"Filter content unchanged, keeping {path}")
+                    elif published.patch_path:
+                        print(f"Diff update: {published.patch_lines} patch lines written to {published.patch_path}")
+                    print(f"Diff-Path: {published.diff_path}")
+                targets = [t for t in targets if t[0] != AdGuardEmitter.format_name]
+
+            emit_files(model, targets, include_comments)
+            for format_name, path in targets:
+                if path != output_file:
+                    print(f"  {format_name} output saved to {path}")
+
+            if artifacts:
+                changed = artifacts.publish(written, model)
+                if patches_dir:
+                    changed += artifacts.mirror_patches(find_patches(patches_dir),
+                                                        os.path.dirname(os.path.abspath(output_file)))
+                print(f"Artifacts in {artifacts_dir}: {len(changed)} file(s) changed")
 
             print(f"Filter saved to {output_file}")
             print(f"Total domains: {len(self.collected_domains)}")
@@ -584,10 +920,54 @@ class KakaoDomainCollector:
 
 def main():
     """Main function"""
-    if len(sys.argv) > 1:
-        output_file = sys.argv[1]
-    else:
-        output_file = "kakao-adblock-filter.txt"
+    parser = argparse.ArgumentParser(description='Collect Kakao/Daum ad domains and generate an AdGuard filter')
+    parser.add_argument('output_file', nargs='?', default='kakao-adblock-filter.txt',
+                        help='Output filter file (default: kakao-adblock-filter.txt)')
+    parser.add_argument('--sources', default='scripts/sources.json',
+                        help='Sources configuration file (default: scripts/sources.json)')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help=f'Directory for the HTTP source cache (default: {DEFAULT_CACHE_DIR})')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Disable the on-disk source cache and always download everything')
+    parser.add_argument('--fetch-workers', type=int, default=8,
+                        help='Number of sources downloaded in parallel (default: 8)')
+    parser.add_argument('--dns-ttl', type=float, default=DEFAULT_POSITIVE_TTL,
+                        help=f'Seconds a cached ACTIVE DNS result is reused (default: {DEFAULT_POSITIVE_TTL})')
+    parser.add_argument('--dns-negative-ttl', type=float, default=DEFAULT_NEGATIVE_TTL,
+                        help=f'Seconds a cached NXDOMAIN result is reused (default: {DEFAULT_NEGATIVE_TTL})')
+    parser.add_argument('--dns-engine', choices=['threads', 'async'], default='threads',
+                        help='DNS validation engine: system resolver in 20 threads, or asyncio A/AAAA '
+                             'queries sent directly over UDP (default: threads)')
+    parser.add_argument('--dns-concurrency', type=int, default=256,
+                        help='Queries in flight for the async engine (default: 256)')
+    parser.add_argument('--dns-timeout', type=float, default=2.0,
+                        help='Per-query deadline in seconds for the async engine (default: 2.0)')
+    parser.add_argument('--parse-workers', type=int, default=1,
+                        help='Worker processes for parsing sources; 1 parses in-process, '
+                             '0 uses one per CPU core (default: 1)')
+    parser.add_argument('--nameserver', action='append', dest='nameservers',
+                        help='Nameserver for the async engine (repeatable, default: system resolvers)')
+    parser.add_argument('--patches-dir',
+                        help='Publish AdGuard differential updates (Diff-Path header and RCS patches) '
+                             'under this directory (default: disabled)')
+    parser.add_argument('--artifacts-dir',
+                        help='Also publish all outputs with .gz/.br siblings and a manifest to this '
+                             'directory, e.g. docs/filters (default: disabled)')
+    parser.add_argument('--report',
+                        help='Write a JSON run report with per-stage and per-source timings, bytes, '
+                             'lines, candidates, DNS queries and peak RSS to this file')
+    parser.add_argument('--record', metavar='SNAPSHOT',
+                        help='Save all fetched source bodies and DNS answers into this snapshot archive')
+    parser.add_argument('--replay', metavar='SNAPSHOT',
+                        help='Rebuild from a snapshot archive recorded with --record, without network '
+                             'access (the current sources.json and classifier are used)')
+    parser.add_argument('--profile',
+                        help='Dump a cProfile of source parsing and classification to this file '
+                             '(parsing then runs in-process)')
+    args = parser.parse_args()
+    output_file = args.output_file
+    if args.record and args.replay:
+        parser.error('--record and --replay cannot be combined')
 
     print("Kakao/Daum Precision Ad Domain Collector")
     print("=" * 50)
@@ -595,26 +975,60 @@ def main():
     print("WHITELIST PROTECTION: Preserving essential Kakao services")
     print("=" * 50)
 
-    collector = KakaoDomainCollector()
+    collector = KakaoDomainCollector(
+        args.sources,
+        cache_dir=None if args.no_cache else args.cache_dir,
+        fetch_workers=args.fetch_workers,
+        dns_positive_ttl=args.dns_ttl,
+        dns_negative_ttl=args.dns_negative_ttl,
+        dns_engine=args.dns_engine,
+        dns_concurrency=args.dns_concurrency,
+        dns_timeout=args.dns_timeout,
+        nameservers=args.nameservers,
+        parse_workers=args.parse_workers if args.parse_workers > 0 else (os.cpu_count() or 1),
+        profile_path=args.profile,
+        record=bool(args.record),
+        replay_path=args.replay,
+    )
+    report = collector.report
+    if collector.snapshot:
+        print(f"\nReplaying snapshot {args.replay} recorded {collector.snapshot.created_at:%Y-%m-%d %H:%M:%S} UTC")
 
     print(f"\nWhitelist: {len(collector.whitelist_domains)} legitimate domains protected")
     print("Sample protected domains: kakao.com, accounts.kakao.com, pay.kakao.com")
 
     # Collect domains from external sources
     print("\n1. Collecting from external sources...")
-    collector.collect_from_sources()
+    with report.stage('collect_sources'):
+        collector.collect_from_sources()
 
     # Add known domains
     print("\n2. Adding known ad domains...")
-    collector.add_known_domains()
+    with report.stage('known_domains'):
+        collector.add_known_domains()
 
     # Validate domains via DNS
     print("\n3. Validating domains via DNS...")
-    collector.validate_domains()
+    with report.stage('dns_validation'):
+        collector.validate_domains()
+
+    if args.record:
+        collector.save_snapshot(args.record)
 
     # Generate and save filter
     print("\n4. Generating filter...")
-    if collector.save_filter(output_file):
+    with report.stage('generate_filter'):
+        saved = collector.save_filter(output_file, patches_dir=args.patches_dir,
+                                      artifacts_dir=args.artifacts_dir)
+        if saved:
+            collector.save_profiles(output_file)
+
+    report.print_summary()
+    if args.report:
+        report.write(args.report)
+        print(f"Run report written to {args.report}")
+
+    if saved:
         print("\n✅ SUCCESS: Precision filter generated")
         print(f"📁 File: {output_file}")
         print(f"🚫 Ad domains blocked: {len(collector.validated_domains)} (DNS validated)")
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+AdGuard differential filter updates (Diff-Path) for the published filter
+Keeps the previously published version of the filter and, whenever a new
+version is written, emits an RCS-style patch (the format of `diff -n`) that
+turns the old version into the new one. Each version carries a
+`! Diff-Path:` header pointing to the patch that will update it, so
+subscribed clients download a few bytes of patch instead of the full list.
+Also provides a verifier that walks the patch chain and checks the result
+is byte-identical to the published file.
+"""
+
+import argparse
+import difflib
+import os
+import re
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+# Allow running as `python scripts/diff_updates.py` as well as importing
+# as `scripts.diff_updates`
+_REPO_ROOT = str(Path(__file__).resolve().parent.parent)
+if _REPO_ROOT not in sys.path:
+    sys.path.insert(0, _REPO_ROOT)
+
+from scripts.atomic_write import write_atomic  # noqa: E402
+
+DIFF_PATH_HEADER = '! Diff-Path:'
+
+# Patch file names: <name>-<resolution>-<epochTimestamp>-<expirationPeriod>.patch,
+# with the timestamp and the expiration period expressed in resolution units
+RESOLUTION_SECONDS = {'h': 3600, 'm': 60, 's': 1}
+DEFAULT_RESOLUTION = 'm'
+DEFAULT_EXPIRATION = 7 * 24 * 60  # One week, in minutes
+
+_PATCH_NAME_RE = re.compile(r'^(?P<name>.+)-(?P<resolution>[hms])-(?P<timestamp>\d+)-(?P<expiration>\d+)\.patch$')
+# Retained versions: <name>-<resolution>-<epochTimestamp>.txt
+_VERSION_NAME_RE = re.compile(r'^(?P<name>.+)-(?P<resolution>[hms])-(?P<timestamp>\d+)\.txt$')
+_RCS_COMMAND_RE = re.compile(r'^([ad])(\d+) (\d+)$')
+
+# Guard against cycles in a corrupted patch chain
+MAX_CHAIN_LENGTH = 100000
+
+
+class PatchError(ValueError):
+    """A patch that cannot be applied to the given text"""
+
+
+def split_filter_lines(text: str) -> List[str]:
+    """Split on '\\n' only, so '\\n'.join() restores the exact bytes"""
+    return text.split('\n')
+
+
+def rcs_diff(old: Sequence[str], new: Sequence[str]) -> List[str]:
+    """
+    RCS diff (as produced by `diff -n`) turning old lines into new lines.
+    'dN M' deletes M lines starting at line N, 'aN M' adds the M lines that
+    follow after line N; line numbers always refer to the old text.
+    """
+    out: List[str] = []
+    matcher = difflib.SequenceMatcher(None, old, new, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+        if tag in ('delete', 'replace'):
+            out.append(f"d{i1 + 1} {i2 - i1}")
+        if tag in ('insert', 'replace'):
+            out.append(f"a{i2} {j2 - j1}")
+            out.extend(new[j1:j2])
+    return out
+
+
+def apply_rcs_patch(old: Sequence[str], patch: Sequence[str]) -> List[str]:
+    """Apply RCS diff commands to old lines; raises PatchError on malformed input"""
+    result: List[str] = []
+    pos = 0  # Lines of old already consumed
+    i = 0
+    while i < len(patch):
+        command = patch[i]
+        i += 1
+        if not command or command.startswith('diff '):
+            continue
+        match = _RCS_COMMAND_RE.match(command)
+        if not match:
+            raise PatchError(f"Invalid patch command: {command!r}")
+        op, line, count = match.group(1), int(match.group(2)), int(match.group(3))
+
+        if op == 'd':
+            start = line - 1
+            if start < pos or start + count > len(old):
+                raise PatchError(f"Delete outside of the text: {command}")
+            result.extend(old[pos:start])
+            pos = start + count
+        else:
+            if line < pos or line > len(old) or i + count > len(patch):
+                raise PatchError(f"Add outside of the text: {command}")
+            result.extend(old[pos:line])
+            pos = line
+            result.extend(patch[i:i + count])
+            i += count
+
+    result.extend(old[pos:])
+    return result
+
+
+def read_diff_path(text: str) -> Optional[str]:
+    """Return the Diff-Path header value from the leading comment block, if any"""
+    for line in split_filter_lines(text):
+        if not line.startswith('!'):
+            return None
+        if line.startswith(DIFF_PATH_HEADER):
+            return line[len(DIFF_PATH_HEADER):].strip() or None
+    return None
+
+
+def set_diff_path(text: str, diff_path: str) -> str:
+    """Replace the Diff-Path header, or insert it after '! Expires:' (or the first line)"""
+    lines = split_filter_lines(text)
+    header = f"{DIFF_PATH_HEADER} {diff_path}"
+    insert_at = 1 if lines else 0
+    for index, line in enumerate(lines):
+        if not line.startswith('!'):
+            break
+        if line.startswith(DIFF_PATH_HEADER):
+            lines[index] = header
+            return '\n'.join(lines)
+        if line.startswith('! Expires:'):
+            insert_at = index + 1
+    lines.insert(insert_at, header)
+    return '\n'.join(lines)
+
+
+def strip_diff_path(text: str) -> str:
+    """text without its Diff-Path header, for comparing versions"""
+    return '\n'.join(line for line in split_filter_lines(text) if not line.startswith(DIFF_PATH_HEADER))
+
+
+def read_text_exact(path: Path) -> str:
+    """Read a file without newline translation"""
+    return path.read_bytes().decode('utf-8')
+
+
+def patch_file_path(filter_dir: Path, diff_path: str) -> Path:
+    """Local file a Diff-Path value refers to (the '#resourceName' suffix is dropped)"""
+    return filter_dir / diff_path.split('#', 1)[0]
+
+
+@dataclass
+class PublishResult:
+    """Outcome of publishing one filter version"""
+    changed: bool
+    diff_path: Optional[str] = None
+    patch_path: Optional[Path] = None  # Patch from the previous version, if one was written
+    patch_lines: int = 0
+    pruned: int = 0
+
+
+class DiffUpdatePublisher:
+    """
+    Writes a filter file together with its differential-update patches.
+
+    Patches and snapshots of every published version go to
+    patches_root/<filter name>/; the snapshots let the verifier check that
+    every retained version still reaches the current one. Files older than
+    the expiration period are removed, after which clients fall back to a
+    full download.
+    """
+
+    def __init__(self, filter_path: str, patches_root: str = 'patches',
+                 resolution: str = DEFAULT_RESOLUTION, expiration: int = DEFAULT_EXPIRATION):
+        if resolution not in RESOLUTION_SECONDS:
+            raise ValueError(f"Unknown resolution: {resolution}")
+        self.filter_path = Path(filter_path)
+        self.name = self.filter_path.stem
+        self.patches_dir = Path(patches_root) / self.name
+        self.versions_dir = self.patches_dir / 'versions'
+        self.resolution = resolution
+        self.expiration = expiration
+
+    def _diff_path_for(self, timestamp: int) -> str:
+        patch = self.patches_dir / f"{self.name}-{self.resolution}-{timestamp}-{self.expiration}.patch"
+        relative = os.path.relpath(os.path.abspath(patch), os.path.abspath(self.filter_path.parent))
+        return Path(relative).as_posix()
+
+    @staticmethod
+    def _timestamp_of(diff_path: Optional[str]) -> Optional[int]:
+        if not diff_path:
+            return None
+        match = _PATCH_NAME_RE.match(Path(diff_path.split('#', 1)[0]).name)
+        return int(match.group('timestamp')) if match else None
+
+    def publish(self, content: str, now: Optional[float] = None) -> PublishResult:
+        """
+        Publish content as the new version of the filter.
+        Returns without writing anything if only the Diff-Path header would change.
+        """
+        now = time.time() if now is None else now
+        previous = None
+        if self.filter_path.exists():
+            previous = read_text_exact(self.filter_path)
+        previous_diff_path = read_diff_path(previous) if previous is not None else None
+
+        if previous is not None and strip_diff_path(previous) == strip_diff_path(content):
+            return PublishResult(changed=False, diff_path=previous_diff_path)
+
+        # A new version needs a patch name different from the one its predecessor points to
+        timestamp = int(now // RESOLUTION_SECONDS[self.resolution])
+        previous_timestamp = self._timestamp_of(previous_diff_path)
+        if previous_timestamp is not None and timestamp <= previous_timestamp:
+            timestamp = previous_timestamp + 1
+
+        diff_path = self._diff_path_for(timestamp)
+        new_text = set_diff_path(content, diff_path)
+        result = PublishResult(changed=True, diff_path=diff_path)
+
+        # The previous version announced where its update will appear: write it there
+        if previous is not None and previous_diff_path:
+            patch = rcs_diff(split_filter_lines(previous), split_filter_lines(new_text))
+            result.patch_path = patch_file_path(self.filter_path.parent, previous_diff_path)
+            result.patch_lines = len(patch)
+            write_atomic(str(result.patch_path), '\n'.join(patch) + '\n')
+
+        write_atomic(str(self.versions_dir / f"{self.name}-{self.resolution}-{timestamp}.txt"), new_text)
+        write_atomic(str(self.filter_path), new_text)
+        result.pruned = self.prune(now)
+        return result
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """
+        Delete patches and snapshots older than the expiration period.
+        Their age comes from the timestamp in the file name: a fresh checkout
+        gives every file the current time as its mtime.
+        """
+        now = time.time() if now is None else now
+        max_age = self.expiration * RESOLUTION_SECONDS[self.resolution]
+        removed = 0
+        for pattern, name_re in (('*.patch', _PATCH_NAME_RE), ('versions/*.txt', _VERSION_NAME_RE)):
+            for path in self.patches_dir.glob(pattern):
+                match = name_re.match(path.name)
+                if not match:
+                    continue  # Not written by this publisher
+                created = int(match.group('timestamp')) * RESOLUTION_SECONDS[match.group('resolution')]
+                if now - created > max_age:
+                    try:
+                        path.unlink()
+                        removed += 1
+                    except OSError:
+                        pass
+        return removed
+
+    def snapshots(self) -> List[Path]:
+        return sorted(self.versions_dir.glob('*.txt'))
+
+
+def follow_patch_chain(filter_dir: Path, text: str) -> Tuple[str, int]:
+    """Apply patches starting from text until a Diff-Path has no patch yet; returns (text, patches applied)"""
+    applied = 0
+    while applied < MAX_CHAIN_LENGTH:
+        diff_path = read_diff_path(text)
+        if not diff_path:
+            break
+        patch_path = patch_file_path(filter_dir, diff_path)
+        if not patch_path.exists():
+            break
+        patch = split_filter_lines(read_text_exact(patch_path))
+        text = '\n'.join(apply_rcs_patch(split_filter_lines(text), patch))
+        applied += 1
+    return text, applied
+
+
+def verify_patch_chain(filter_path: str, base_text: str) -> Tuple[bool, int, str]:
+    """
+    Check that applying the patch chain to base_text reproduces the published
+    filter byte for byte. Returns (ok, patches applied, message).
+    """
+    path = Path(filter_path)
+    published = path.read_bytes()
+    try:
+        result, applied = follow_patch_chain(path.parent, base_text)
+    except (OSError, PatchError) as e:
+        return False, 0, str(e)
+    if result.encode('utf-8') == published:
+        return True, applied, f"identical after {applied} patch(es)"
+    return False, applied, f"differs from {path.name} after {applied} patch(es)"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Verify the Diff-Path patch chain of a published filter')
+    parser.add_argument('filter_file', nargs='?', default='kakao-adblock-filter.txt',
+                        help='Published filter file (default: kakao-adblock-filter.txt)')
+    parser.add_argument('--patches-dir', default='patches',
+                        help='Root directory of the patches (default: patches)')
+    parser.add_argument('--base', action='append', dest='bases',
+                        help='Older version to start from (repeatable, default: all retained snapshots)')
+    args = parser.parse_args()
+
+    publisher = DiffUpdatePublisher(args.filter_file, args.patches_dir)
+    bases = [Path(b) for b in args.bases] if args.bases else publisher.snapshots()
+    if not bases:
+        print(f"No earlier versions of {args.filter_file} to verify")
+        return 0
+
+    failures = 0
+    for base in bases:
+        ok, _, message = verify_patch_chain(args.filter_file, read_text_exact(base))
+        print(f"{'✅' if ok else '❌'} {base.name}: {message}")
+        failures += not ok
+
+    print(f"\nVerified {len(bases) - failures}/{len(bases)} versions")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
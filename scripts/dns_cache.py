@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Persistent DNS caches for the Kakao/Daum domain collector and validator
+DNSLivenessCache stores the outcome of each domain's DNS check in SQLite so
+hourly runs only re-resolve domains that are new or whose cached result has
+expired. Positive and NXDOMAIN results have separate TTLs; transient failures
+are never cached.
+DNSAnswerCache stores individual answers per (name, record type) for as long
+as the answer itself allows: the record TTL for positive answers and the SOA
+minimum (RFC 2308) for NXDOMAIN and NODATA answers.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import dns.rdatatype
+
+# Seconds a cached result stays valid
+DEFAULT_POSITIVE_TTL = 12 * 3600
+DEFAULT_NEGATIVE_TTL = 3 * 3600
+
+# Upper bound on how long any single answer is reused, whatever its TTL
+DEFAULT_MAX_ANSWER_TTL = 24 * 3600
+
+# Kinds of cached answers
+POSITIVE = 'positive'  # Records of the requested type (possibly behind a CNAME chain)
+NEGATIVE = 'negative'  # NODATA: the name exists without records of that type
+NXDOMAIN = 'nxdomain'  # The name does not exist
+
+# SQLite limits the number of bound parameters per statement
+_QUERY_CHUNK = 500
+# Buffered answers written per transaction
+_FLUSH_EVERY = 500
+# Record type column of NXDOMAIN entries, which hold for every type
+_ANY_TYPE = '*'
+
+
+def answer_ttl(response) -> Optional[int]:
+    """Lowest TTL in the answer section of a dns.message.Message (covers CNAME chains)"""
+    ttls = [rrset.ttl for rrset in response.answer]
+    return min(ttls) if ttls else None
+
+
+def negative_ttl(response) -> Optional[int]:
+    """
+    How long a negative answer may be cached: the lower of the SOA record's
+    own TTL and its minimum field. None when the response carries no SOA.
+    """
+    for rrset in response.authority:
+        if rrset.rdtype == dns.rdatatype.SOA:
+            return min(rrset.ttl, rrset[0].minimum)
+    return None
+
+
+class DNSLivenessCache:
+    """SQLite-backed cache of (exists, ip, checked_at) per domain"""
+
+    def __init__(self, path: str, positive_ttl: float = DEFAULT_POSITIVE_TTL,
+                 negative_ttl: float = DEFAULT_NEGATIVE_TTL):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS liveness ("
+            " domain TEXT PRIMARY KEY,"
+            " exists_ INTEGER NOT NULL,"
+            " ip TEXT,"
+            " checked_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def _is_fresh(self, exists: bool, checked_at: float, now: float) -> bool:
+        ttl = self.positive_ttl if exists else self.negative_ttl
+        return now - checked_at < ttl
+
+    def get(self, domain: str, now: Optional[float] = None) -> Optional[Tuple[bool, Optional[str]]]:
+        """Return (exists, ip) if a fresh result is cached for domain"""
+        return self.get_many([domain], now).get(domain)
+
+    def get_many(self, domains: Iterable[str],
+                 now: Optional[float] = None) -> Dict[str, Tuple[bool, Optional[str]]]:
+        """Return {domain: (exists, ip)} for the domains that have a fresh cached result"""
+        now = time.time() if now is None else now
+        domains = list(domains)
+        fresh = {}
+        for i in range(0, len(domains), _QUERY_CHUNK):
+            chunk = domains[i:i + _QUERY_CHUNK]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT domain, exists_, ip, checked_at FROM liveness WHERE domain IN ({placeholders})",
+                chunk,
+            )
+            for domain, exists, ip, checked_at in rows:
+                if self._is_fresh(bool(exists), checked_at, now):
+                    fresh[domain] = (bool(exists), ip)
+        return fresh
+
+    def put(self, domain: str, exists: bool, ip: Optional[str],
+            checked_at: Optional[float] = None) -> None:
+        self.put_many([(domain, exists, ip)], checked_at)
+
+    def put_many(self, results: Iterable[Tuple[str, bool, Optional[str]]],
+                 checked_at: Optional[float] = None) -> None:
+        """Record definitive results: (domain, exists, ip) tuples"""
+        checked_at = time.time() if checked_at is None else checked_at
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO liveness (domain, exists_, ip, checked_at) VALUES (?, ?, ?, ?)",
+            [(domain, int(exists), ip, checked_at) for domain, exists, ip in results],
+        )
+        self.conn.commit()
+
+    def purge_expired(self, now: Optional[float] = None) -> int:
+        """Delete entries that can no longer be served; returns the number removed"""
+        now = time.time() if now is None else now
+        cursor = self.conn.execute(
+            "DELETE FROM liveness WHERE (exists_ = 1 AND checked_at <= ?) OR (exists_ = 0 AND checked_at <= ?)",
+            (now - self.positive_ttl, now - self.negative_ttl),
+        )
+        self.conn.commit()
+        return cursor.rowcount
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class DNSAnswerCache:
+    """
+    SQLite-backed cache of answers per (name, rdtype), each valid until its own
+    TTL runs out. Thread-safe; new answers are buffered and written in batches
+    (flush() writes the rest).
+    """
+
+    def __init__(self, path: str, max_ttl: float = DEFAULT_MAX_ANSWER_TTL):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_ttl = max_ttl
+        self.hits = 0
+        self.misses = 0
+        self._pending: Dict[Tuple[str, str], Tuple[str, List[str], float]] = {}
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            " name TEXT NOT NULL,"
+            " rdtype TEXT NOT NULL,"
+            " kind TEXT NOT NULL,"
+            " records TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " PRIMARY KEY (name, rdtype))"
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def _key(name: str, rdtype: str, kind: Optional[str] = None) -> Tuple[str, str]:
+        # NXDOMAIN is about the name, not one type: it is stored once for all types
+        return name.lower().rstrip('.'), _ANY_TYPE if kind == NXDOMAIN else rdtype.upper()
+
+    def _lookup(self, key: Tuple[str, str]) -> Optional[Tuple[str, List[str], float]]:
+        entry = self._pending.get(key)
+        if entry is None:
+            row = self.conn.execute(
+                "SELECT kind, records, expires_at FROM answers WHERE name = ? AND rdtype = ?", key
+            ).fetchone()
+            entry = (row[0], json.loads(row[1]), row[2]) if row else None
+        return entry
+
+    def get(self, name: str, rdtype: str, now: Optional[float] = None) -> Optional[Tuple[str, List[str]]]:
+        """Return (kind, records) if an unexpired answer is cached"""
+        now = time.time() if now is None else now
+        key = self._key(name, rdtype)
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is None or entry[2] <= now:
+                entry = self._lookup((key[0], _ANY_TYPE))
+            if entry is None or entry[2] <= now:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def put(self, name: str, rdtype: str, kind: str, records: List[str], ttl: float,
+            now: Optional[float] = None) -> None:
+        """Remember an answer for ttl seconds (capped at max_ttl); ttl <= 0 is not cached"""
+        if ttl <= 0:
+            return
+        now = time.time() if now is None else now
+        with self._lock:
+            self._pending[self._key(name, rdtype, kind)] = (kind, list(records), now + min(ttl, self.max_ttl))
+            if len(self._pending) >= _FLUSH_EVERY:
+                self._flush()
+
+    def _flush(self) -> None:
+        pending, self._pending = self._pending, {}
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO answers (name, rdtype, kind, records, expires_at) VALUES (?, ?, ?, ?, ?)",
+            [(name, rdtype, kind, json.dumps(records), expires_at)
+             for (name, rdtype), (kind, records, expires_at) in pending.items()],
+        )
+        self.conn.commit()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush()
+
+    def purge_expired(self, now: Optional[float] = None) -> int:
+        """Delete expired answers; returns the number removed"""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._flush()
+            cursor = self.conn.execute("DELETE FROM answers WHERE expires_at <= ?", (now,))
+            self.conn.commit()
+        return cursor.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush()
+            self.conn.close()
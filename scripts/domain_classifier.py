@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Kakao/Daum ad-domain classifier
+Built once from the sources.json configuration and reused for every candidate:
+Kakao/Daum base domains are matched with a label-suffix lookup, ad indicators
+with one compiled keyword automaton, and verdicts are memoized.
+"""
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Pattern, Set, Tuple
+
+# Fallback patterns for obvious ad domains that might not match the regex keywords exactly
+SIMPLE_AD_PATTERNS = (
+    'ad.', 'ads.', 'adm.', 'adapi.', 'adserver.', 'track.',
+    'pixel.', 'beacon.', 'collector.', 'bizboard.', 'dmp.'
+)
+
+VALID_DOMAIN_RE = re.compile(r'^[a-zA-Z0-9.-]+$')
+
+# A kakao_patterns entry that is just an escaped domain name, e.g. "kakao\\.com"
+_LITERAL_DOMAIN_RE = re.compile(r'^(?:[a-z0-9-]|\\\.)+$')
+
+# Verdict reasons
+INVALID = 'invalid'
+WHITELISTED = 'whitelisted'
+NOT_KAKAO = 'not_kakao'
+AD_KEYWORD = 'ad_keyword'
+SIMPLE_PATTERN = 'simple_pattern'
+NO_AD_INDICATOR = 'no_ad_indicator'
+
+
+@dataclass(frozen=True)
+class Verdict:
+    """Classification result for one domain"""
+    domain: str
+    is_ad: bool
+    reason: str
+    matched: Tuple[str, ...] = ()  # Keywords/patterns responsible for the verdict
+    base_domain: Optional[str] = None  # Kakao/Daum base domain the name belongs to
+
+
+class DomainClassifier:
+    """
+    Decides whether a domain is a Kakao/Daum advertising/tracking domain.
+
+    A domain is an ad domain only if:
+    1. It is a syntactically valid name that is NOT whitelisted AND
+    2. It is (a subdomain of) one of the configured Kakao/Daum base domains AND
+    3. It contains one of the configured ad keywords (or a simple fallback pattern)
+    """
+
+    def __init__(self, kakao_patterns: Iterable[str], ad_keywords: Iterable[str],
+                 whitelist: Iterable[str], memo_size: int = 65536):
+        self.whitelist: Set[str] = {d.lower() for d in whitelist}
+        self.base_domains: Set[str] = set()
+        self.ad_keywords: List[str] = list(ad_keywords)
+
+        # Patterns that are real regexes (not plain domain names) keep regex semantics
+        regex_patterns = []
+        for pattern in kakao_patterns:
+            if _LITERAL_DOMAIN_RE.match(pattern):
+                self.base_domains.add(pattern.replace('\\.', '.'))
+            else:
+                regex_patterns.append(pattern)
+        self._base_regex = self._compile_union(regex_patterns)
+        self._max_labels = max((d.count('.') + 1 for d in self.base_domains), default=0)
+
+        # One automaton for the verdict; per-keyword patterns only to report reasons
+        self._keyword_regex = self._compile_union(self.ad_keywords)
+        self._keyword_patterns: List[Tuple[str, Pattern]] = [
+            (keyword, re.compile(keyword)) for keyword in self.ad_keywords
+        ]
+
+        self._classify_cached = lru_cache(maxsize=memo_size)(self._classify)
+
+    @classmethod
+    def from_config(cls, config: Dict, whitelist: Iterable[str], **kwargs) -> 'DomainClassifier':
+        """Build a classifier from a sources.json style configuration"""
+        return cls(config.get('kakao_patterns', []), config.get('ad_keywords', []),
+                   whitelist, **kwargs)
+
+    @staticmethod
+    def _compile_union(patterns: Iterable[str]) -> Optional[Pattern]:
+        patterns = list(patterns)
+        if not patterns:
+            return None
+        return re.compile('|'.join(f'(?:{p})' for p in patterns))
+
+    def base_domain_of(self, domain: str) -> Optional[str]:
+        """Return the Kakao/Daum base domain that domain is equal to or below"""
+        labels = domain.split('.')
+        for i in range(max(0, len(labels) - self._max_labels), len(labels)):
+            suffix = '.'.join(labels[i:])
+            if suffix in self.base_domains:
+                return suffix
+        if self._base_regex is not None:
+            match = self._base_regex.search(domain)
+            if match:
+                return match.group(0)
+        return None
+
+    def classify(self, domain: str) -> Verdict:
+        """Classify domain; repeated calls for the same name are served from the memo"""
+        return self._classify_cached(domain)
+
+    def is_ad_domain(self, domain: str) -> bool:
+        return self.classify(domain).is_ad
+
+    def cache_info(self):
+        return self._classify_cached.cache_info()
+
+    def _classify(self, domain: str) -> Verdict:
+        if not domain:
+            return Verdict(domain, False, INVALID)
+
+        domain_lower = domain.lower().strip()
+
+        # Basic domain format validation
+        if not VALID_DOMAIN_RE.match(domain) or domain.startswith('.') or domain.endswith('.'):
+            return Verdict(domain, False, INVALID)
+
+        # CRITICAL: Skip whitelisted legitimate service domains
+        if domain_lower in self.whitelist:
+            return Verdict(domain, False, WHITELISTED)
+
+        # Skip obviously non-Kakao domains
+        if 'kakao' not in domain_lower and 'daum' not in domain_lower:
+            return Verdict(domain, False, NOT_KAKAO)
+
+        base_domain = self.base_domain_of(domain_lower)
+        if base_domain is None:
+            return Verdict(domain, False, NOT_KAKAO)
+
+        # Specific ad-related keywords
+        if self._keyword_regex is not None and self._keyword_regex.search(domain_lower):
+            matched = tuple(k for k, p in self._keyword_patterns if p.search(domain_lower))
+            return Verdict(domain, True, AD_KEYWORD, matched, base_domain)
+
+        # Fallback simple patterns for obvious ad domains
+        for pattern in SIMPLE_AD_PATTERNS:
+            if pattern in domain_lower:
+                return Verdict(domain, True, SIMPLE_PATTERN, (pattern,), base_domain)
+
+        # A Kakao domain that doesn't contain ad indicators
+        return Verdict(domain, False, NO_AD_INDICATOR, (), base_domain)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Reversed-label domain trie
+Domains are stored label by label from the TLD down (ad.daum.net is stored
+as net -> daum -> ad), so every ancestor of a name lies on its path. Used to
+find rules made redundant by a blocked parent: ||ad.daum.net^ already blocks
+banner.ad.daum.net, so the child rule can be dropped from formats that
+block whole subtrees.
+"""
+
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Node keys that cannot clash with a DNS label
+_BLOCKED = '#blocked'
+_PROTECTED = '#protected'
+
+
+def _labels(domain: str) -> List[str]:
+    return list(reversed(domain.lower().strip('.').split('.')))
+
+
+class DomainTrie:
+    """
+    Blocked domains plus the protected (whitelisted) names they must not
+    swallow. A blocked domain only covers its descendants when no protected
+    name lies at or below it.
+    """
+
+    def __init__(self, blocked: Iterable[str] = (), protected: Iterable[str] = ()):
+        self._root: Dict = {}
+        for domain in blocked:
+            self.add(domain)
+        for domain in protected:
+            self.protect(domain)
+
+    def add(self, domain: str) -> None:
+        node = self._root
+        for label in _labels(domain):
+            node = node.setdefault(label, {})
+        node[_BLOCKED] = domain
+
+    def protect(self, domain: str) -> None:
+        """Mark domain and all its ancestors as having a protected name below them"""
+        node = self._root
+        for label in _labels(domain):
+            node = node.get(label)
+            if node is None:
+                return  # Nothing blocked further down this path
+            node[_PROTECTED] = True
+
+    def _walk(self) -> Iterator[Tuple[str, Optional[str]]]:
+        """Yield (blocked domain, covering ancestor or None) for every blocked domain"""
+        stack = [(self._root, None)]
+        while stack:
+            node, cover = stack.pop()
+            for label, child in node.items():
+                if label in (_BLOCKED, _PROTECTED):
+                    continue
+                domain = child.get(_BLOCKED)
+                if domain is not None:
+                    yield domain, cover
+                covers_subtree = domain is not None and not child.get(_PROTECTED)
+                stack.append((child, cover or (domain if covers_subtree else None)))
+
+    def covered(self) -> Dict[str, str]:
+        """Blocked domains whose rule is implied by a blocked ancestor, mapped to that ancestor"""
+        return {domain: cover for domain, cover in self._walk() if cover is not None}
+
+    def minimal(self) -> List[str]:
+        """Blocked domains that still need a rule of their own, sorted"""
+        return sorted(domain for domain, cover in self._walk() if cover is None)
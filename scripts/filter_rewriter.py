@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Streaming rewriter that drops rules from an AdGuard filter file
+Reads the filter one line at a time, looks each '||domain^' rule up in a set
+(or dict) of domains to remove and writes every other line unchanged, so
+comments, blank lines, section headers and rules with modifiers keep their
+place. Removed rules can instead be kept as '!' comments where they stood.
+The output is written to a temporary file and moved into place, so a failed
+run never leaves a half-written filter. Time is linear in the size of the
+filter and memory does not grow with it.
+"""
+
+from dataclasses import dataclass
+from typing import AbstractSet, Mapping, Optional, Union
+
+from scripts.atomic_write import atomic_open
+
+REMOVED_PREFIX = '! Removed: '
+
+
+@dataclass
+class RewriteStats:
+    """Line counts of one rewrite"""
+    lines: int = 0
+    rules: int = 0
+    kept: int = 0
+    removed: int = 0
+
+
+def rule_domain(line: str) -> Optional[str]:
+    """The domain of a plain '||domain^' rule, as validate_domains.py reads it; None otherwise"""
+    line = line.strip()
+    if line.startswith('||') and line.endswith('^'):
+        domain = line[2:-1]
+        if domain and '/' not in domain and ':' not in domain:
+            return domain
+    return None
+
+
+def rewrite_filter(src: str, dest: str, remove: Union[AbstractSet[str], Mapping[str, str]],
+                   annotate: bool = False) -> RewriteStats:
+    """
+    Copy filter src to dest without the rules whose domain is in remove.
+    With annotate=True a removed rule becomes '! Removed: <rule>' in place;
+    if remove maps domains to reasons, the reason is appended to that comment.
+    src and dest may be the same file.
+    """
+    stats = RewriteStats()
+    # newline='' keeps each line's own line ending
+    with open(src, 'r', encoding='utf-8', newline='') as fin, atomic_open(dest) as fout:
+        for line in fin:
+            stats.lines += 1
+            domain = rule_domain(line)
+            if domain is None:
+                fout.write(line)
+                continue
+            stats.rules += 1
+            if domain not in remove:
+                stats.kept += 1
+                fout.write(line)
+                continue
+            stats.removed += 1
+            if annotate:
+                body = line.rstrip('\r\n')
+                ending = line[len(body):]
+                reason = remove.get(domain) if isinstance(remove, Mapping) else None
+                note = f"{REMOVED_PREFIX}{body.strip()}" + (f"  # {reason}" if reason else '')
+                fout.write(note + ending)
+    return stats
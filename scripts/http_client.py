@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Pooled keep-alive HTTP client for source downloads
+Keeps idle HTTP/1.1 connections per host so consecutive requests to the same
+host (all default sources live on raw.githubusercontent.com) skip the TCP and
+TLS handshakes, retries transient failures with capped exponential backoff
+and full jitter, asks for gzip and decompresses it while streaming, and stops
+reading once a response exceeds its byte limit.
+"""
+
+import http.client
+import random
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+USER_AGENT = 'Mozilla/5.0 (compatible; KakaoDomainCollector/1.0)'
+CHUNK_SIZE = 64 * 1024
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+MAX_REDIRECTS = 5
+
+
+class HTTPError(Exception):
+    """Non-2xx answer (after redirects); 304 is reported this way too, as urllib does"""
+
+    def __init__(self, url: str, code: int, reason: str, headers: Optional[http.client.HTTPMessage] = None):
+        super().__init__(f"HTTP Error {code}: {reason}")
+        self.url = url
+        self.code = code
+        self.reason = reason
+        self.headers = headers
+
+
+class ResponseTooLarge(Exception):
+    """The (decompressed) body exceeded the byte limit of the request"""
+
+    def __init__(self, url: str, limit: int):
+        super().__init__(f"Response exceeds {limit} bytes: {url}")
+        self.url = url
+        self.limit = limit
+
+
+# Failures worth another attempt: resets, timeouts, truncated bodies, broken gzip streams
+TRANSIENT_ERRORS = (OSError, http.client.HTTPException, zlib.error)
+
+
+class _ReadError(Exception):
+    """
+    A TRANSIENT_ERRORS failure while reading the body from the connection.
+    Wrapped so get() can tell it from errors raised by its handler (a full
+    disk is an OSError too, but not worth downloading the body again).
+    """
+
+    def __init__(self, error: Exception):
+        super().__init__(str(error))
+        self.error = error
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Capped exponential backoff with full jitter: attempt n (from 0) waits a
+    random time between 0 and min(max_delay, base_delay * 2**n). A numeric
+    Retry-After header raises the wait up to max_delay.
+    """
+    attempts: int = 4
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+    retry_statuses: Tuple[int, ...] = (408, 425, 429, 500, 502, 503, 504)
+
+    def delay(self, attempt: int, rng: random.Random, retry_after: Optional[str] = None) -> float:
+        wait = rng.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if retry_after and retry_after.strip().isdigit():
+            wait = max(wait, min(self.max_delay, float(retry_after)))
+        return wait
+
+
+class Response:
+    """
+    A response being read from a pooled connection.
+    read()/read1() return decompressed bytes; the connection goes back to the
+    pool on close() if the body was read completely.
+    """
+
+    def __init__(self, client: 'PooledHTTPClient', key: Tuple, conn: http.client.HTTPConnection,
+                 raw: http.client.HTTPResponse, url: str, max_bytes: Optional[int]):
+        self.url = url
+        self.status = raw.status
+        self.reason = raw.reason
+        self.headers = raw.headers
+        self.bytes_read = 0  # Decompressed bytes handed out so far
+        self._client = client
+        self._key = key
+        self._conn = conn
+        self._raw = raw
+        self._max_bytes = max_bytes
+        self._pending = b''
+        self._eof = False
+        encoding = (raw.headers.get('Content-Encoding') or '').strip().lower()
+        self._decoder = zlib.decompressobj(16 + zlib.MAX_WBITS) if encoding in ('gzip', 'x-gzip') else None
+        length = raw.headers.get('Content-Length')
+        if self._decoder is None and max_bytes is not None and length and length.isdigit() \
+                and int(length) > max_bytes:
+            self.close()
+            raise ResponseTooLarge(url, max_bytes)
+
+    def _fill(self, size: int) -> None:
+        try:
+            while not self._pending and not self._eof:
+                chunk = self._raw.read1(size)
+                if not chunk:
+                    if self._raw.length:
+                        # read1() does not complain when the server hangs up early
+                        raise http.client.IncompleteRead(b'', self._raw.length)
+                    if self._decoder is not None:
+                        if not self._decoder.eof:
+                            raise zlib.error('Truncated gzip stream')
+                        self._pending = self._decoder.flush()
+                    self._eof = True
+                    break
+                self._pending = self._decoder.decompress(chunk) if self._decoder is not None else chunk
+        except TRANSIENT_ERRORS as e:
+            raise _ReadError(e) from e
+
+    def read1(self, size: int = CHUNK_SIZE) -> bytes:
+        self._fill(size)
+        data, self._pending = self._pending[:size], self._pending[size:]
+        self.bytes_read += len(data)
+        if self._max_bytes is not None and self.bytes_read > self._max_bytes:
+            self.close()
+            raise ResponseTooLarge(self.url, self._max_bytes)
+        return data
+
+    def read(self, size: int = -1) -> bytes:
+        if size is not None and size >= 0:
+            return self.read1(size)
+        parts = []
+        while True:
+            chunk = self.read1(CHUNK_SIZE)
+            if not chunk:
+                return b''.join(parts)
+            parts.append(chunk)
+
+    def drain(self) -> None:
+        """Read and discard the rest of the body so the connection can be reused"""
+        while self.read1(CHUNK_SIZE):
+            pass
+
+    def close(self) -> None:
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        reusable = self._eof and not self._pending and not self._raw.will_close
+        self._raw.close()
+        self._client._release(self._key, conn, reusable)
+
+    def __enter__(self) -> 'Response':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class PooledHTTPClient:
+    """
+    Thread-safe GET client with a keep-alive connection pool per host.
+    At most max_per_host connections to one host are open at a time; further
+    requests wait for one to be released and then reuse it.
+    """
+
+    def __init__(self, timeout: float = 30.0, max_per_host: int = 4,
+                 retry: Optional[RetryPolicy] = None, user_agent: str = USER_AGENT,
+                 sleep: Callable[[float], None] = time.sleep, seed: Optional[int] = None):
+        self.timeout = timeout
+        self.max_per_host = max(1, max_per_host)
+        self.retry = retry or RetryPolicy()
+        self.user_agent = user_agent
+        self.sleep = sleep
+        self.connections_opened = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._idle: Dict[Tuple, List[http.client.HTTPConnection]] = {}
+        self._slots: Dict[Tuple, threading.BoundedSemaphore] = {}
+
+    @staticmethod
+    def _host_key(url: str) -> Tuple[str, str, int]:
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise ValueError(f"Unsupported URL: {url}")
+        return parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80)
+
+    def _acquire(self, key: Tuple) -> Tuple[http.client.HTTPConnection, bool]:
+        """Wait for a free slot on key's host; returns (connection, reused)"""
+        with self._lock:
+            slots = self._slots.setdefault(key, threading.BoundedSemaphore(self.max_per_host))
+        slots.acquire()
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+            self.connections_opened += 1
+        scheme, host, port = key
+        if scheme == 'https':
+            return http.client.HTTPSConnection(host, port, timeout=self.timeout), False
+        return http.client.HTTPConnection(host, port, timeout=self.timeout), False
+
+    def _release(self, key: Tuple, conn: http.client.HTTPConnection, reusable: bool) -> None:
+        if reusable:
+            with self._lock:
+                self._idle.setdefault(key, []).append(conn)
+        else:
+            conn.close()
+        self._slots[key].release()
+
+    def open(self, url: str, headers: Optional[Dict[str, str]] = None,
+             max_bytes: Optional[int] = None) -> Response:
+        """
+        Send one GET (following redirects) and return the 2xx response.
+        Raises HTTPError for other statuses and OSError/HTTPException on
+        connection failures. No retries; see get().
+        """
+        for _ in range(MAX_REDIRECTS + 1):
+            key = self._host_key(url)
+            parts = urlsplit(url)
+            target = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+            request_headers = {'User-Agent': self.user_agent, 'Accept-Encoding': 'gzip'}
+            request_headers.update(headers or {})
+
+            conn, reused = self._acquire(key)
+            try:
+                try:
+                    conn.request('GET', target, headers=request_headers)
+                    raw = conn.getresponse()
+                except (OSError, http.client.HTTPException):
+                    if not reused:
+                        raise
+                    # The server closed the idle connection meanwhile: reconnect once
+                    conn.close()
+                    with self._lock:
+                        self.connections_opened += 1
+                    conn.request('GET', target, headers=request_headers)
+                    raw = conn.getresponse()
+            except BaseException:
+                conn.close()
+                self._release(key, conn, False)
+                raise
+
+            response = Response(self, key, conn, raw, url, max_bytes)
+            if 200 <= response.status < 300:
+                return response
+            location = response.headers.get('Location')
+            try:
+                if response.status < 400:
+                    response.drain()  # Small bodies: keep the connection
+            except _ReadError:
+                pass
+            response.close()
+            if response.status in REDIRECT_STATUSES and location:
+                url = urljoin(url, location)
+                continue
+            raise HTTPError(url, response.status, response.reason, response.headers)
+        raise HTTPError(url, 310, 'Too many redirects')
+
+    def get(self, url: str, handler: Callable[[Response], Any],
+            headers: Optional[Dict[str, str]] = None, max_bytes: Optional[int] = None,
+            replayable: bool = True) -> Any:
+        """
+        GET url and return handler(response).
+        Connection errors, timeouts, retryable statuses (429, 5xx, ...) and
+        bodies cut short are retried per self.retry. With replayable=False
+        (the handler passes data on as it reads) a failure after the handler
+        has read part of the body is raised instead of retried. Errors the
+        handler raises itself (e.g. writing to a full disk) are never retried.
+        """
+        attempt = 0
+        while True:
+            last = attempt + 1 >= self.retry.attempts
+            retry_after = None
+            try:
+                response = self.open(url, headers, max_bytes)
+            except HTTPError as e:
+                if e.code not in self.retry.retry_statuses or last:
+                    raise
+                retry_after = e.headers.get('Retry-After') if e.headers is not None else None
+            except ResponseTooLarge:
+                raise
+            except TRANSIENT_ERRORS:
+                # Connecting or sending the request failed
+                if last:
+                    raise
+            else:
+                try:
+                    with response:
+                        return handler(response)
+                except _ReadError as e:
+                    if (response.bytes_read > 0 and not replayable) or last:
+                        raise e.error from None
+            self.sleep(self.retry.delay(attempt, self._rng, retry_after))
+            attempt += 1
+
+    def close(self) -> None:
+        """Close every idle connection"""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for conn in connections:
+                conn.close()
+
+    def __enter__(self) -> 'PooledHTTPClient':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
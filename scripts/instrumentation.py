@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Run instrumentation for the Kakao/Daum domain collector
+Records wall/CPU time, memory high-water marks and work counters (bytes fetched, lines
+parsed, candidates classified, DNS queries, ...) per pipeline stage and per
+source, and writes them as a JSON run report so slow hourly runs can be
+traced to a stage or a source.
+"""
+
+import json
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+from scripts.atomic_write import atomic_open
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; RSS is then reported as None
+    resource = None
+
+# Counter names shared by the collector and the report
+BYTES_FETCHED = 'bytes_fetched'
+LINES_PARSED = 'lines_parsed'
+CANDIDATES_CLASSIFIED = 'candidates_classified'
+DOMAINS_FOUND = 'domains_found'
+DNS_QUERIES = 'dns_queries'
+DNS_CACHE_HITS = 'dns_cache_hits'
+
+
+def peak_rss_kb(children: bool = False) -> Optional[int]:
+    """Peak resident set size of this process (or of its finished children) in KiB"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return usage.ru_maxrss // 1024 if sys.platform == 'darwin' else usage.ru_maxrss
+
+
+@dataclass
+class StageStats:
+    """
+    Measurements for one pipeline stage.
+    ru_maxrss only ever grows over the life of the process, so the RSS
+    figures are the high-water mark when the stage ended (including every
+    earlier stage) and how much this stage raised it; a stage that stayed
+    below an earlier peak shows a growth of 0.
+    """
+    name: str
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    peak_rss_so_far_kb: Optional[int] = None
+    peak_rss_growth_kb: Optional[int] = None
+    peak_rss_children_so_far_kb: Optional[int] = None
+    counters: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+
+    def to_dict(self) -> Dict:
+        return {
+            'name': self.name,
+            'wall_seconds': round(self.wall_seconds, 4),
+            'cpu_seconds': round(self.cpu_seconds, 4),
+            'peak_rss_so_far_kb': self.peak_rss_so_far_kb,
+            'peak_rss_growth_kb': self.peak_rss_growth_kb,
+            'peak_rss_children_so_far_kb': self.peak_rss_children_so_far_kb,
+            'counters': dict(self.counters),
+        }
+
+
+class RunReport:
+    """
+    Collects stage and per-source measurements for one collector run.
+    Stages run one after another; count() adds to the stage that is
+    currently running and may be called from worker threads.
+    """
+
+    def __init__(self):
+        self.started_at = datetime.utcnow()
+        self.stages: List[StageStats] = []
+        self.sources: Dict[str, Dict] = {}
+        self._current: Optional[StageStats] = None
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageStats]:
+        stats = StageStats(name)
+        self._current = stats
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        rss_before = peak_rss_kb()
+        try:
+            yield stats
+        finally:
+            stats.wall_seconds = time.perf_counter() - wall_start
+            stats.cpu_seconds = time.process_time() - cpu_start
+            stats.peak_rss_so_far_kb = peak_rss_kb()
+            if rss_before is not None:
+                stats.peak_rss_growth_kb = stats.peak_rss_so_far_kb - rss_before
+            stats.peak_rss_children_so_far_kb = peak_rss_kb(children=True)
+            self._current = None
+            self.stages.append(stats)
+
+    def count(self, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            if self._current is not None:
+                self._current.counters[counter] += amount
+
+    def record_source(self, name: str, **fields) -> None:
+        """Set measurements for one source (later calls update earlier ones)"""
+        with self._lock:
+            self.sources.setdefault(name, {'name': name}).update(fields)
+
+    def to_dict(self) -> Dict:
+        return {
+            'started_at': self.started_at.isoformat() + 'Z',
+            'total_wall_seconds': round(time.perf_counter() - self._start, 4),
+            'peak_rss_kb': peak_rss_kb(),
+            'peak_rss_children_kb': peak_rss_kb(children=True),
+            'stages': [stage.to_dict() for stage in self.stages],
+            'sources': list(self.sources.values()),
+        }
+
+    def write(self, path: str) -> None:
+        with atomic_open(path) as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+
+    def print_summary(self) -> None:
+        print("\nStage timings:")
+        for stage in self.stages:
+            counters = ', '.join(f"{k}={v:,}" for k, v in stage.counters.items() if v)
+            rss = f", peak RSS +{stage.peak_rss_growth_kb / 1024:.1f} MiB" if stage.peak_rss_growth_kb else ""
+            print(f"  {stage.name:<16} {stage.wall_seconds:8.2f}s{rss}" + (f" ({counters})" if counters else ""))
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Record/replay snapshots of collector inputs
+A recording run saves every fetched source body and every DNS answer into one
+zip archive (snapshot.json plus one file per body). A replay run serves the
+same bodies and answers from that archive instead of the network, so a build
+can be repeated offline and deterministically - for profiling, benchmarking
+or bisecting classifier changes against a fixed input.
+"""
+
+import hashlib
+import io
+import json
+import threading
+import zipfile
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from scripts.atomic_write import atomic_open
+from scripts.http_client import CHUNK_SIZE, HTTPError
+
+SNAPSHOT_VERSION = 1
+MANIFEST_NAME = 'snapshot.json'
+CREATED_AT_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+# Fixed member timestamps keep archives of equal content byte-identical
+_ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+
+class SnapshotError(Exception):
+    """The archive is missing, unreadable or of an unknown version"""
+
+
+class _TeeResponse:
+    """Passes a response through while keeping a copy of every byte read"""
+
+    def __init__(self, response):
+        self._response = response
+        self.chunks = []
+        self.url = response.url
+        self.status = response.status
+        self.headers = response.headers
+
+    @property
+    def bytes_read(self) -> int:
+        return self._response.bytes_read
+
+    def read1(self, size: int = CHUNK_SIZE) -> bytes:
+        data = self._response.read1(size)
+        self.chunks.append(data)
+        return data
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._response.read(size)
+        self.chunks.append(data)
+        return data
+
+
+class _BytesResponse:
+    """A recorded body served through the same interface as http_client.Response"""
+
+    def __init__(self, url: str, body: bytes, headers: Dict[str, str]):
+        self.url = url
+        self.status = 200
+        self.headers = headers
+        self.bytes_read = 0
+        self._stream = io.BytesIO(body)
+
+    def read1(self, size: int = CHUNK_SIZE) -> bytes:
+        data = self._stream.read(size)
+        self.bytes_read += len(data)
+        return data
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._stream.read(size)
+        self.bytes_read += len(data)
+        return data
+
+    def close(self) -> None:
+        self._stream.close()
+
+    def __enter__(self) -> '_BytesResponse':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class RecordingHTTPClient:
+    """Wraps a PooledHTTPClient and hands every completed body to a SnapshotRecorder"""
+
+    def __init__(self, client, recorder: 'SnapshotRecorder'):
+        self.client = client
+        self.recorder = recorder
+
+    def get(self, url: str, handler: Callable[[Any], Any], headers: Optional[Dict[str, str]] = None,
+            max_bytes: Optional[int] = None, replayable: bool = True) -> Any:
+        def tee(response):
+            wrapped = _TeeResponse(response)
+            value = handler(wrapped)
+            self.recorder.add_body(url, b''.join(wrapped.chunks), response.headers.get('ETag'),
+                                   response.headers.get('Last-Modified'))
+            return value
+        return self.client.get(url, tee, headers, max_bytes, replayable)
+
+    def close(self) -> None:
+        self.client.close()
+
+
+class ReplayHTTPClient:
+    """Answers GET requests from a loaded Snapshot; URLs not recorded get a 404"""
+
+    def __init__(self, snapshot: 'Snapshot'):
+        self.snapshot = snapshot
+
+    def get(self, url: str, handler: Callable[[Any], Any], headers: Optional[Dict[str, str]] = None,
+            max_bytes: Optional[int] = None, replayable: bool = True) -> Any:
+        entry = self.snapshot.sources.get(url)
+        if entry is None:
+            raise HTTPError(url, 404, 'Not in snapshot')
+        response_headers = {'ETag': entry.get('etag'), 'Last-Modified': entry.get('last_modified')}
+        with _BytesResponse(url, self.snapshot.body(url), response_headers) as response:
+            return handler(response)
+
+    def close(self) -> None:
+        pass
+
+
+class SnapshotRecorder:
+    """Collects source bodies and DNS answers during a run; thread-safe"""
+
+    def __init__(self):
+        self.sources: Dict[str, Dict] = {}
+        self.bodies: Dict[str, bytes] = {}
+        self.dns: Dict[str, Tuple[str, Optional[str]]] = {}
+        self._lock = threading.Lock()
+
+    def client(self, client) -> RecordingHTTPClient:
+        return RecordingHTTPClient(client, self)
+
+    def add_body(self, url: str, body: bytes, etag: Optional[str] = None,
+                 last_modified: Optional[str] = None) -> None:
+        sha256 = hashlib.sha256(body).hexdigest()
+        with self._lock:
+            self.bodies[sha256] = body
+            self.sources[url] = {'sha256': sha256, 'size': len(body), 'etag': etag,
+                                 'last_modified': last_modified}
+
+    def add_dns(self, domain: str, status: str, ip: Optional[str]) -> None:
+        with self._lock:
+            self.dns[domain] = (status, ip)
+
+    def save(self, path: str, created_at: Optional[datetime] = None,
+             config: Optional[Dict] = None) -> None:
+        """Write the archive atomically; config is stored for reference only"""
+        manifest = {
+            'version': SNAPSHOT_VERSION,
+            'created_at': (created_at or datetime.utcnow()).strftime(CREATED_AT_FORMAT),
+            'sources': dict(sorted(self.sources.items())),
+            'dns': {domain: list(answer) for domain, answer in sorted(self.dns.items())},
+            'config': config or {},
+        }
+        with atomic_open(path, binary=True) as f, zipfile.ZipFile(f, 'w', zipfile.ZIP_DEFLATED) as archive:
+            data = json.dumps(manifest, indent=2, sort_keys=True, ensure_ascii=False)
+            archive.writestr(zipfile.ZipInfo(MANIFEST_NAME, _ZIP_DATE_TIME), data,
+                             compress_type=zipfile.ZIP_DEFLATED)
+            for sha256 in sorted(self.bodies):
+                archive.writestr(zipfile.ZipInfo(f"bodies/{sha256}", _ZIP_DATE_TIME),
+                                 self.bodies[sha256], compress_type=zipfile.ZIP_DEFLATED)
+
+
+class Snapshot:
+    """A recorded run, loaded for replay"""
+
+    def __init__(self, path: str, manifest: Dict, bodies: Dict[str, bytes]):
+        self.path = path
+        self.sources: Dict[str, Dict] = manifest.get('sources', {})
+        self.dns: Dict[str, Tuple[str, Optional[str]]] = {
+            domain: (answer[0], answer[1]) for domain, answer in manifest.get('dns', {}).items()
+        }
+        self.config: Dict = manifest.get('config', {})
+        self.created_at = datetime.strptime(manifest['created_at'], CREATED_AT_FORMAT)
+        self._bodies = bodies
+
+    @classmethod
+    def load(cls, path: str) -> 'Snapshot':
+        try:
+            with zipfile.ZipFile(path) as archive:
+                manifest = json.loads(archive.read(MANIFEST_NAME).decode('utf-8'))
+                if manifest.get('version') != SNAPSHOT_VERSION:
+                    raise SnapshotError(f"Unsupported snapshot version {manifest.get('version')}: {path}")
+                bodies = {
+                    name[len('bodies/'):]: archive.read(name)
+                    for name in archive.namelist() if name.startswith('bodies/')
+                }
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile) as e:
+            raise SnapshotError(f"Cannot read snapshot {path}: {e}") from e
+        return cls(path, manifest, bodies)
+
+    def body(self, url: str) -> bytes:
+        return self._bodies[self.sources[url]['sha256']]
+
+    def client(self) -> ReplayHTTPClient:
+        return ReplayHTTPClient(self)
+
+    def lookup(self, domain: str) -> Tuple[str, Optional[str]]:
+        """Recorded (status, ip) for domain; names never resolved in the recording give 'error'"""
+        return self.dns.get(domain, ('error', None))
@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""
+Source fetch layer for the Kakao/Daum domain collector
+Downloads filter sources in parallel and keeps an on-disk cache of bodies
+plus ETag/Last-Modified validators, so unchanged upstream lists cost a
+single conditional request (HTTP 304) instead of a full download.
+Bodies can also be streamed: they are decoded incrementally and handed to a
+consumer line by line while the download is still in progress. Every body is
+hashed (SHA-256) so parse results can be cached by content, see ParseCache.
+Downloads go through PooledHTTPClient: keep-alive connections per host,
+retries with backoff, gzip transfer encoding and a per-source byte limit.
+"""
+
+import codecs
+import concurrent.futures
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from scripts.atomic_write import atomic_open, commit_temp, discard_temp, open_temp, write_atomic
+from scripts.http_client import (
+    CHUNK_SIZE, TRANSIENT_ERRORS, HTTPError, PooledHTTPClient, Response, ResponseTooLarge, RetryPolicy,
+)
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024  # Per-source limit on the decompressed body
+
+
+def iter_chunks(stream: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Yield raw chunks from a response or file as soon as they are available"""
+    read = getattr(stream, 'read1', stream.read)
+    while True:
+        chunk = read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_lines(chunks: Iterable[bytes], encoding: str = 'utf-8') -> Iterator[str]:
+    """
+    Incrementally decode byte chunks and yield complete lines (without '\n').
+    Only one chunk plus the trailing partial line is held in memory.
+    """
+    try:
+        decoder = codecs.getincrementaldecoder(encoding or 'utf-8')(errors='ignore')
+    except LookupError:
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+
+    pending = ''
+    for chunk in chunks:
+        text = pending + decoder.decode(chunk)
+        lines = text.split('\n')
+        pending = lines.pop()
+        yield from lines
+
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+
+def iter_blocks(chunks: Iterable[bytes], block_size: int) -> Iterator[bytes]:
+    """
+    Regroup byte chunks into blocks of roughly block_size bytes that always end
+    on a newline (except possibly the last), so each block can be parsed on its
+    own. Only valid for ASCII-compatible encodings such as UTF-8.
+    """
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        if len(buffer) < block_size:
+            continue
+        cut = buffer.rfind(b'\n')
+        if cut == -1:
+            continue
+        yield bytes(buffer[:cut + 1])
+        del buffer[:cut + 1]
+    if buffer:
+        yield bytes(buffer)
+
+
+@dataclass
+class FetchResult:
+    """Outcome of fetching one configured source"""
+    name: str
+    url: str
+    status: str = 'failed'  # 'fetched', 'not_modified' or 'failed'
+    body: bytes = b''
+    encoding: str = 'utf-8'
+    error: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    meta: Dict = field(default_factory=dict)
+    size: int = 0
+    sha256: Optional[str] = None  # Content hash of the body
+    elapsed: float = 0.0  # Seconds spent fetching (and consuming) the body
+    parsed: Any = None  # Return value of the streaming consumer, if any
+    source: Dict = field(default_factory=dict, repr=False)
+
+    @property
+    def ok(self) -> bool:
+        return self.status in ('fetched', 'not_modified')
+
+    @property
+    def text(self) -> str:
+        """Decoded body, mirroring the old fetch_content() behaviour"""
+        return self.body.decode(self.encoding or 'utf-8', errors='ignore')
+
+
+class SourceCache:
+    """
+    On-disk cache of source bodies keyed by URL.
+
+    Each source gets two files under cache_dir/sources/:
+      <key>.body  - raw response bytes
+      <key>.json  - metadata (url, etag, last_modified, size, sha256, fetched_at)
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = Path(cache_dir) / 'sources'
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()[:24]
+
+    def _meta_path(self, url: str) -> Path:
+        return self.cache_dir / f"{self._key(url)}.json"
+
+    def _body_path(self, url: str) -> Path:
+        return self.cache_dir / f"{self._key(url)}.body"
+
+    def load_meta(self, url: str) -> Optional[Dict]:
+        """Return cached metadata for url, or None if nothing usable is cached"""
+        meta_path = self._meta_path(url)
+        if not meta_path.exists() or not self._body_path(url).exists():
+            return None
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return meta if meta.get('url') == url else None
+
+    @staticmethod
+    def _new_meta(url: str, size: int, sha256: str, etag: Optional[str],
+                  last_modified: Optional[str]) -> Dict:
+        return {
+            'url': url,
+            'etag': etag,
+            'last_modified': last_modified,
+            'size': size,
+            'sha256': sha256,
+            'fetched_at': datetime.utcnow().isoformat() + 'Z',
+        }
+
+    def read_body(self, url: str) -> bytes:
+        with open(self._body_path(url), 'rb') as f:
+            return f.read()
+
+    def store(self, url: str, body: bytes, etag: Optional[str],
+              last_modified: Optional[str]) -> Dict:
+        """Store a freshly downloaded body and its metadata"""
+        meta = self._new_meta(url, len(body), hashlib.sha256(body).hexdigest(), etag, last_modified)
+        write_atomic(str(self._body_path(url)), body)
+        self._write_meta(url, meta)
+        return meta
+
+    def begin_store(self, url: str) -> Tuple[BinaryIO, str]:
+        """Open a temporary file that a streamed body can be written into"""
+        return open_temp(str(self._body_path(url)), binary=True)
+
+    def commit_store(self, url: str, tmp_path: str, size: int, sha256: str,
+                     etag: Optional[str], last_modified: Optional[str]) -> Dict:
+        """Move a completely streamed body into place and record its metadata"""
+        meta = self._new_meta(url, size, sha256, etag, last_modified)
+        commit_temp(tmp_path, str(self._body_path(url)))
+        self._write_meta(url, meta)
+        return meta
+
+    @staticmethod
+    def abort_store(tmp_path: str) -> None:
+        discard_temp(tmp_path)
+
+    def open_body(self, url: str) -> BinaryIO:
+        return open(self._body_path(url), 'rb')
+
+    def _write_meta(self, url: str, meta: Dict) -> None:
+        data = json.dumps(meta, indent=2, ensure_ascii=False).encode('utf-8')
+        write_atomic(str(self._meta_path(url)), data)
+
+
+class ParseCache:
+    """
+    Extraction results keyed by source content hash plus a parser fingerprint.
+
+    A source whose bytes are identical to an earlier download (whatever its
+    URL or HTTP validators) maps to the same entry, and any change to the
+    parser/classifier configuration changes the fingerprint, so stale
+    entries are never served. Entries live in cache_dir/parsed/.
+    """
+
+    def __init__(self, cache_dir: str, max_age_days: float = 14):
+        self.cache_dir = Path(cache_dir) / 'parsed'
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_age = max_age_days * 86400
+
+    def _path(self, content_hash: str, fingerprint: str) -> Path:
+        return self.cache_dir / f"{content_hash}-{fingerprint[:16]}.json"
+
+    def get(self, content_hash: Optional[str], fingerprint: str) -> Optional[List[str]]:
+        if not content_hash:
+            return None
+        path = self._path(content_hash, fingerprint)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get('fingerprint') != fingerprint or not isinstance(entry.get('domains'), list):
+            return None
+        os.utime(path)  # Keep entries that are still in use from being pruned
+        return entry['domains']
+
+    def put(self, content_hash: Optional[str], fingerprint: str, domains: Iterable[str]) -> None:
+        if not content_hash:
+            return
+        entry = {'sha256': content_hash, 'fingerprint': fingerprint, 'domains': sorted(domains)}
+        path = self._path(content_hash, fingerprint)
+        with atomic_open(str(path)) as f:
+            json.dump(entry, f, ensure_ascii=False)
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Delete entries unused for longer than max_age_days; returns the number removed"""
+        now = time.time() if now is None else now
+        removed = 0
+        for path in self.cache_dir.glob('*.json'):
+            try:
+                if now - path.stat().st_mtime > self.max_age:
+                    path.unlink()
+                    removed += 1
+            except OSError:
+                pass
+        return removed
+
+
+class SourceFetcher:
+    """
+    Parallel, cache-aware downloader for the sources listed in sources.json.
+    A source may set "max_bytes" to override the default body size limit.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_workers: int = 8,
+                 timeout: float = 30.0, max_bytes: Optional[int] = DEFAULT_MAX_BYTES,
+                 retry: Optional[RetryPolicy] = None, max_per_host: int = 4,
+                 client: Optional[PooledHTTPClient] = None):
+        self.cache = SourceCache(cache_dir) if cache_dir else None
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.client = client or PooledHTTPClient(timeout=timeout, max_per_host=max_per_host, retry=retry)
+
+    def close(self) -> None:
+        self.client.close()
+
+    def fetch(self, source: Dict,
+              consume: Optional[Callable[[FetchResult, Iterator], Any]] = None,
+              raw: bool = False, spool: bool = False) -> FetchResult:
+        """
+        Fetch a single source, sending If-None-Match/If-Modified-Since when a
+        cached copy exists. A 304 answer is served from the on-disk cache.
+
+        Without consume the whole body is buffered in result.body. With consume,
+        the body is streamed instead: consume(result, lines) is called with a
+        generator of decoded lines while the download is in progress, and its
+        return value is stored in result.parsed. On a 304 the lines come from
+        the cached body, so a consumer that does not need them can skip reading.
+        With raw=True the consumer gets the undecoded byte chunks instead of lines.
+
+        With spool=True (and a cache) the body is written to the cache first and
+        the consumer reads it back from disk, so result.sha256 is already known
+        when consume is called and a content-keyed parse cache can be checked
+        before any parsing happens.
+        """
+        start = time.perf_counter()
+        url = source.get('url', '')
+        result = FetchResult(
+            name=source.get('name', 'Unknown'),
+            url=url,
+            encoding=source.get('encoding', 'utf-8') or 'utf-8',
+            source=source,
+        )
+        if not url:
+            result.error = 'No URL configured'
+            return result
+
+        headers = {}
+        cached = self.cache.load_meta(url) if self.cache else None
+        if cached:
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('last_modified'):
+                headers['If-Modified-Since'] = cached['last_modified']
+
+        spooled = spool and consume is not None and self.cache is not None
+
+        def handle(response: Response) -> None:
+            # Called again for every retried attempt, so start from a clean result
+            result.status = 'fetched'
+            result.size = 0
+            result.etag = response.headers.get('ETag')
+            result.last_modified = response.headers.get('Last-Modified')
+            if consume is None:
+                result.body = response.read()
+                result.size = len(result.body)
+                result.sha256 = hashlib.sha256(result.body).hexdigest()
+                if self.cache:
+                    result.meta = self.cache.store(url, result.body, result.etag,
+                                                   result.last_modified)
+            elif spooled:
+                self._spool_response(result, response)
+            else:
+                self._stream_response(result, response, consume, raw)
+
+        try:
+            # A streaming consumer sees lines as they arrive, so a body that
+            # fails half-way through cannot be replayed to it
+            self.client.get(url, handle, headers, max_bytes=source.get('max_bytes', self.max_bytes),
+                            replayable=consume is None or spooled)
+        except HTTPError as e:
+            if e.code == 304 and cached:
+                result.status = 'not_modified'
+                result.etag = cached.get('etag')
+                result.last_modified = cached.get('last_modified')
+                result.meta = cached
+                result.size = cached.get('size', 0)
+                result.sha256 = cached.get('sha256')
+            else:
+                result.error = f"HTTP Error {e.code}: {e.reason}"
+        except ResponseTooLarge as e:
+            result.error = f"Error: {e}"
+        except TRANSIENT_ERRORS as e:
+            result.error = f"URL Error: {e}"
+        except Exception as e:
+            result.error = f"Error: {e}"
+
+        if result.error:
+            result.status = 'failed'
+        elif result.status == 'not_modified' or spooled:
+            try:
+                if consume is None:
+                    result.body = self.cache.read_body(url)
+                else:
+                    with self.cache.open_body(url) as body:
+                        result.parsed = consume(result, self._body_stream(iter_chunks(body), result, raw))
+            except Exception as e:
+                result.status = 'failed'
+                result.error = f"Error reading cached body: {e}"
+
+        if not result.ok:
+            result.parsed = None
+        result.elapsed = time.perf_counter() - start
+        return result
+
+    @staticmethod
+    def _body_stream(chunks: Iterator[bytes], result: FetchResult, raw: bool) -> Iterator:
+        return chunks if raw else iter_lines(chunks, result.encoding)
+
+    def _spool_response(self, result: FetchResult, response: BinaryIO) -> None:
+        """Write the whole response into the cache, hashing it on the way"""
+        sink, tmp_path = self.cache.begin_store(result.url)
+        digest = hashlib.sha256()
+        try:
+            with sink:
+                for chunk in iter_chunks(response):
+                    result.size += len(chunk)
+                    digest.update(chunk)
+                    sink.write(chunk)
+        except BaseException:
+            self.cache.abort_store(tmp_path)
+            raise
+        result.sha256 = digest.hexdigest()
+        result.meta = self.cache.commit_store(result.url, tmp_path, result.size, result.sha256,
+                                              result.etag, result.last_modified)
+
+    def _stream_response(self, result: FetchResult, response: BinaryIO,
+                         consume: Callable[[FetchResult, Iterator], Any], raw: bool = False) -> None:
+        """Tee response chunks into the cache while the consumer parses them"""
+        sink, tmp_path = self.cache.begin_store(result.url) if self.cache else (None, None)
+        digest = hashlib.sha256()
+
+        def chunks() -> Iterator[bytes]:
+            for chunk in iter_chunks(response):
+                result.size += len(chunk)
+                digest.update(chunk)
+                if sink:
+                    sink.write(chunk)
+                yield chunk
+
+        try:
+            stream = self._body_stream(chunks(), result, raw)
+            result.parsed = consume(result, stream)
+            # Drain whatever the consumer did not read so the cached copy is complete
+            for _ in stream:
+                pass
+        except BaseException:
+            if sink:
+                sink.close()
+                self.cache.abort_store(tmp_path)
+            raise
+
+        result.sha256 = digest.hexdigest()
+        if sink:
+            sink.close()
+            result.meta = self.cache.commit_store(result.url, tmp_path, result.size, result.sha256,
+                                                  result.etag, result.last_modified)
+
+    def fetch_all(self, sources: List[Dict],
+                  consume: Optional[Callable[[FetchResult, Iterator], Any]] = None,
+                  raw: bool = False, spool: bool = False) -> List[FetchResult]:
+        """
+        Fetch all sources concurrently; results keep the order of sources.
+        When consume is given every source is streamed through it (see fetch()).
+        """
+        if not sources:
+            return []
+
+        workers = max(1, min(self.max_workers, len(sources)))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(lambda source: self.fetch(source, consume, raw, spool), sources))
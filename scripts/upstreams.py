@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Latency-scored DNS upstream selection with hedged queries
+Keeps an exponentially weighted moving average (EWMA) of the latency and of
+the failure rate of every nameserver. A query goes to the best-scoring
+upstream first; if no good answer has arrived after a hedge delay derived
+from that upstream's latency, the same query is raced on the next-best
+upstream (once per query) and the first good answer wins; upstreams that
+mostly fail are not used as hedges. A failed answer (timeout, SERVFAIL)
+moves on to the next upstream at once. A slow or rate-limiting upstream thus
+costs one hedge delay instead of a full timeout, and sinks in the ranking.
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+# Weight of the newest sample in every EWMA
+DEFAULT_ALPHA = 0.2
+# Lower bound of the hedge delay, as a fraction of the timeout: below that,
+# jitter of a healthy upstream would already trigger hedges
+MIN_HEDGE_FRACTION = 0.1
+# Upstreams tried at once for one query: the primary plus one hedge
+MAX_IN_FLIGHT = 2
+# Upstreams failing more often than this are not worth a hedge (failover still reaches them)
+MAX_HEDGE_FAILURE_RATE = 0.5
+# Threads for the hedges of race(), kept apart from the queries they overtake
+HEDGE_POOL_SIZE = 32
+
+
+def parse_upstream(spec: str, default_port: int = 53) -> Tuple[str, int]:
+    """'8.8.8.8' or '127.0.0.1#5353' (dig/unbound notation) -> (address, port)"""
+    address, _, port = spec.partition('#')
+    return address, int(port) if port else default_port
+
+
+@dataclass
+class UpstreamStats:
+    """Running statistics of one nameserver"""
+    address: str
+    latency_ms: Optional[float] = None  # EWMA over answered queries
+    latency_dev_ms: float = 0.0  # EWMA of the deviation from latency_ms
+    failure_rate: float = 0.0  # EWMA of 1 per failed and 0 per answered query
+    queries: int = 0
+    failures: int = 0
+    wins: int = 0  # Races this upstream answered first
+    hedges: int = 0  # Queries sent here because a faster-ranked upstream was slow
+
+    def score(self, timeout_ms: float) -> float:
+        """Expected cost of a query in ms: latency plus a full timeout weighted by the failure rate"""
+        return (self.latency_ms or 0.0) + self.failure_rate * timeout_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'address': self.address,
+            'latency_ms': round(self.latency_ms, 2) if self.latency_ms is not None else None,
+            'failure_rate': round(self.failure_rate, 4),
+            'queries': self.queries,
+            'failures': self.failures,
+            'wins': self.wins,
+            'hedges': self.hedges,
+        }
+
+
+class UpstreamManager:
+    """
+    Ranks nameservers by their EWMA score and races queries across them.
+    race() serves thread-based callers, race_async() asyncio ones; both take a
+    function that runs the query on one upstream (with a timeout, for race())
+    and a predicate telling good answers (including NXDOMAIN) from failures.
+    """
+
+    def __init__(self, upstreams: Sequence[str], timeout: float, hedge: bool = True,
+                 alpha: float = DEFAULT_ALPHA):
+        if not upstreams:
+            raise ValueError("At least one upstream nameserver is required")
+        self.upstreams = list(upstreams)
+        self.timeout = timeout
+        self.hedge = hedge and len(self.upstreams) > 1
+        self.alpha = alpha
+        self.stats = {upstream: UpstreamStats(upstream) for upstream in self.upstreams}
+        self._lock = threading.Lock()
+
+    def ranked(self) -> List[str]:
+        """Upstreams from best to worst score; ties keep the configured order"""
+        timeout_ms = self.timeout * 1000
+        with self._lock:
+            return sorted(self.upstreams, key=lambda u: self.stats[u].score(timeout_ms))
+
+    def hedge_delay(self, upstream: str) -> float:
+        """
+        How long to wait for upstream before racing the next one: its smoothed
+        latency plus four deviations (as TCP sizes its retransmission timeout),
+        or a quarter of the timeout while it has no measured latency; never
+        below a tenth of the timeout.
+        """
+        with self._lock:
+            stats = self.stats[upstream]
+            if stats.latency_ms is None:
+                delay = self.timeout / 4
+            else:
+                delay = (stats.latency_ms + 4 * stats.latency_dev_ms) / 1000
+        return min(max(delay, self.timeout * MIN_HEDGE_FRACTION), self.timeout)
+
+    def record(self, upstream: str, elapsed: float, ok: bool, answered: bool = True) -> None:
+        """
+        Add one observation. answered=False marks a query abandoned after
+        elapsed seconds: a lower bound on its latency, not a failure.
+        """
+        with self._lock:
+            stats = self.stats[upstream]
+            if not answered:
+                sample = elapsed * 1000
+                if stats.latency_ms is None or sample > stats.latency_ms:
+                    self._add_latency(stats, sample)
+                return
+            stats.queries += 1
+            stats.failure_rate += self.alpha * ((0.0 if ok else 1.0) - stats.failure_rate)
+            if ok:
+                self._add_latency(stats, elapsed * 1000)
+            else:
+                stats.failures += 1
+
+    def _add_latency(self, stats: UpstreamStats, sample: float) -> None:
+        if stats.latency_ms is None:
+            stats.latency_ms = sample
+            stats.latency_dev_ms = sample / 2
+            return
+        stats.latency_dev_ms += self.alpha * (abs(sample - stats.latency_ms) - stats.latency_dev_ms)
+        stats.latency_ms += self.alpha * (sample - stats.latency_ms)
+
+    def _can_hedge(self, candidates: List[str], in_flight: int) -> bool:
+        if not self.hedge or not candidates or in_flight >= MAX_IN_FLIGHT:
+            return False
+        with self._lock:
+            return self.stats[candidates[0]].failure_rate <= MAX_HEDGE_FAILURE_RATE
+
+    def _won(self, upstream: str) -> None:
+        with self._lock:
+            self.stats[upstream].wins += 1
+
+    def _hedged(self, upstream: str) -> None:
+        with self._lock:
+            self.stats[upstream].hedges += 1
+
+    def _timed(self, call: Callable[[str, float], Any], is_good: Callable[[Any], bool], upstream: str,
+               timeout: float) -> Any:
+        start = time.perf_counter()
+        result = call(upstream, timeout)
+        self.record(upstream, time.perf_counter() - start, is_good(result))
+        return result
+
+    def _candidates(self, offset: int) -> List[str]:
+        ranked = self.ranked()
+        offset %= len(ranked)
+        return ranked[offset:] + ranked[:offset]
+
+    def race(self, call: Callable[[str, float], Any], is_good: Callable[[Any], bool],
+             pool: Optional[concurrent.futures.Executor] = None, offset: int = 0,
+             hedge_pool: Optional[concurrent.futures.Executor] = None) -> Any:
+        """
+        Run call(upstream, timeout) until one upstream gives a good answer;
+        returns that answer, or the last failure when every upstream failed.
+        offset rotates the ranking, so a retry starts on a different upstream.
+
+        Every query runs on pool with the full timeout. If the first has not
+        answered after its hedge delay, the same query is also sent to the
+        next upstream on hedge_pool (pool if not given), at most once per
+        call; a failed answer moves on to the next upstream at once. A small
+        hedge_pool of its own keeps hedges from queueing behind the slow
+        queries they are meant to overtake. Losing queries are not
+        interrupted: they keep their thread until they end, at most timeout
+        seconds after they started. Without a pool (or with hedging off)
+        upstreams are tried one after another on the calling thread.
+        """
+        candidates = self._candidates(offset)
+        result = None
+        if pool is None or not self.hedge:
+            for upstream in candidates:
+                result = self._timed(call, is_good, upstream, self.timeout)
+                if is_good(result):
+                    self._won(upstream)
+                    return result
+            return result
+
+        in_flight: Dict[concurrent.futures.Future, Tuple[str, float]] = {}
+        hedged = False
+
+        def launch(executor: concurrent.futures.Executor) -> str:
+            upstream = candidates.pop(0)
+            future = executor.submit(self._timed, call, is_good, upstream, self.timeout)
+            in_flight[future] = (upstream, time.perf_counter())
+            return upstream
+
+        primary = launch(pool)
+        while in_flight:
+            hedging = not hedged and self._can_hedge(candidates, len(in_flight))
+            done, _ = concurrent.futures.wait(in_flight, timeout=self.hedge_delay(primary) if hedging else None,
+                                              return_when=concurrent.futures.FIRST_COMPLETED)
+            if not done:
+                self._hedged(launch(hedge_pool or pool))
+                hedged = True
+                continue
+            for future in done:
+                upstream, _ = in_flight.pop(future)
+                result = future.result()
+                if is_good(result):
+                    self._won(upstream)
+                    # Losers still running are slower than this answer already:
+                    # count that now rather than only when they finish
+                    for loser, started in in_flight.values():
+                        self.record(loser, time.perf_counter() - started, True, answered=False)
+                    return result
+                if candidates:
+                    primary = launch(pool)
+        return result
+
+    async def race_async(self, call: Callable[[str], Awaitable[Any]], is_good: Callable[[Any], bool],
+                         offset: int = 0) -> Any:
+        """asyncio counterpart of race(); losing queries are cancelled"""
+        candidates = self._candidates(offset)
+        in_flight: Dict[asyncio.Task, Tuple[str, float]] = {}
+        result = None
+
+        async def timed(upstream: str) -> Any:
+            start = time.perf_counter()
+            answer = await call(upstream)
+            self.record(upstream, time.perf_counter() - start, is_good(answer))
+            return answer
+
+        def launch() -> str:
+            upstream = candidates.pop(0)
+            in_flight[asyncio.ensure_future(timed(upstream))] = (upstream, time.perf_counter())
+            return upstream
+
+        primary = launch()
+        hedged = False
+        try:
+            while in_flight:
+                hedging = not hedged and self._can_hedge(candidates, len(in_flight))
+                done, _ = await asyncio.wait(list(in_flight), timeout=self.hedge_delay(primary) if hedging else None,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self._hedged(launch())
+                    hedged = True
+                    continue
+                for task in done:
+                    upstream, _ = in_flight.pop(task)
+                    result = task.result()
+                    if is_good(result):
+                        self._won(upstream)
+                        return result
+                    if candidates:
+                        primary = launch()
+            return result
+        finally:
+            for task, (upstream, started) in in_flight.items():
+                if not task.done():
+                    task.cancel()
+                    self.record(upstream, time.perf_counter() - started, True, answered=False)
+
+    def report(self) -> List[Dict[str, Any]]:
+        """Per-upstream statistics, best first"""
+        ranked = self.ranked()
+        with self._lock:
+            return [self.stats[upstream].to_dict() for upstream in ranked]
@@ -4,41 +4,286 @@ Domain validation script for Kakao AdBlock filter
 Validates domains using DNS lookups and checks if they are actually active
 """
 
+import asyncio
+import dns.asyncresolver
+import dns.exception
 import dns.resolver
 import socket
 import sys
 import time
 import concurrent.futures
+import itertools
 from pathlib import Path
-from typing import Set, Dict, List, Tuple
+from typing import Callable, Set, Dict, Iterable, List, Optional, Sequence, Tuple
 import argparse
 import json
 from datetime import datetime
 
+# Allow running as `python scripts/validate_domains.py` as well as importing
+# as `scripts.validate_domains`
+_REPO_ROOT = str(Path(__file__).resolve().parent.parent)
+if _REPO_ROOT not in sys.path:
+    sys.path.insert(0, _REPO_ROOT)
+
+from scripts.adaptive_concurrency import (  # noqa: E402
+    DEFAULT_MAXIMUM, AIMDController, AsyncGate, ThreadGate,
+)
+from scripts.dns_cache import DNSAnswerCache, answer_ttl, negative_ttl  # noqa: E402
+from scripts.filter_rewriter import rewrite_filter, rule_domain  # noqa: E402
+from scripts.upstreams import HEDGE_POOL_SIZE, UpstreamManager, parse_upstream  # noqa: E402
+from scripts.validation_report import (  # noqa: E402
+    TRANSIENT_STATUSES, VALID_STATUSES, JSONLReportWriter, ValidationSummary,
+)
+
+
+# Record types queried by default; MX says nothing about whether an ad host serves traffic
+DEFAULT_RECORD_TYPES = ('A', 'AAAA', 'CNAME')
+SUPPORTED_RECORD_TYPES = ('A', 'AAAA', 'CNAME', 'MX')
+ENGINES = ('threads', 'async')
+DEFAULT_ANSWER_CACHE = '.cache/dns-answers.sqlite3'
+
+# Outcome of one record-type query:
+# ('positive' | 'negative' | 'nxdomain' | 'timeout' | 'error', records, error)
+QueryOutcome = Tuple[str, Optional[List[str]], Optional[str]]
+FAILED_OUTCOMES = ('timeout', 'error')
+
 
 class DomainValidator:
-    def __init__(self, max_workers: int = 10, timeout: float = 5.0):
+    def __init__(self, max_workers: int = 10, timeout: float = 5.0,
+                 record_types: Sequence[str] = DEFAULT_RECORD_TYPES,
+                 stop_on_first_positive: bool = False, concurrent_lookups: bool = True,
+                 nameservers: Optional[List[str]] = None, port: int = 53,
+                 engine: str = 'threads', concurrency: int = 500,
+                 cache: Optional[DNSAnswerCache] = None, hedge: bool = True,
+                 adaptive: bool = False, max_concurrency: int = DEFAULT_MAXIMUM,
+                 retries: int = 2, retry_backoff: float = 1.0):
+        if engine not in ENGINES:
+            raise ValueError(f"Engine must be one of {', '.join(ENGINES)}")
         self.max_workers = max_workers
         self.timeout = timeout
-        self.resolver = dns.resolver.Resolver()
-        self.resolver.timeout = timeout
-        self.resolver.lifetime = timeout
-
-        # Configure resolver with public DNS servers for reliability
-        self.resolver.nameservers = [
+        self.engine = engine
+        self.concurrency = max(1, concurrency)  # Queries in flight with the async engine
+        # adaptive: AIMD control of the lookups in flight, starting from the
+        # worker count (threads) or the concurrency (async) and bounded by
+        # max_concurrency; see scripts/adaptive_concurrency.py
+        self.adaptive = adaptive
+        self.max_concurrency = max(1, max_concurrency)
+        self.controller: Optional[AIMDController] = None
+        # Domains whose lookups timed out or failed are retried after the main
+        # pass: up to retries more passes, waiting retry_backoff * 2**n first,
+        # each starting on a different nameserver
+        self.retries = max(0, retries)
+        self.retry_backoff = retry_backoff
+        self._upstream_offset = 0
+        # Answers still within their TTL are served from cache without a query
+        self.cache = cache
+
+        # Public DNS servers for reliability; 'address#port' selects another port
+        self.nameservers = list(nameservers or [
             '8.8.8.8',     # Google DNS
             '1.1.1.1',     # Cloudflare DNS
             '208.67.222.222'  # OpenDNS
-        ]
+        ])
+        self.port = port
+        # Every query goes to the best-scoring nameserver and is raced on the
+        # next one when it is slow; see scripts/upstreams.py
+        self.upstreams = UpstreamManager(self.nameservers, timeout, hedge=hedge)
+        self._resolvers = {ns: self._make_resolver(dns.resolver.Resolver, ns) for ns in self.nameservers}
+
+        # Record-type policy: which types to query, whether the first positive
+        # answer settles the domain, and whether the types are queried at once
+        self.record_types = [t.upper() for t in record_types]
+        unknown = [t for t in self.record_types if t not in SUPPORTED_RECORD_TYPES]
+        if unknown or not self.record_types:
+            raise ValueError(f"Record types must be a non-empty subset of {', '.join(SUPPORTED_RECORD_TYPES)}")
+        self.stop_on_first_positive = stop_on_first_positive
+        self.concurrent_lookups = concurrent_lookups and len(self.record_types) > 1
+        # With adaptive control the thread pools are sized for the highest
+        # limit and the gate in _query decides how many lookups run
+        lookup_threads = self.max_concurrency if adaptive else max_workers * len(self.record_types)
+        self._lookup_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=lookup_threads
+        ) if self.concurrent_lookups and engine == 'threads' else None
+        # With hedging, each query runs on a thread of its own so the lookup
+        # can take a hedge's answer without waiting for it; hedges get a small
+        # pool of their own (see UpstreamManager.race)
+        hedging = self.upstreams.hedge and engine == 'threads'
+        self._query_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=lookup_threads
+        ) if hedging else None
+        self._hedge_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=HEDGE_POOL_SIZE
+        ) if hedging else None
+        self._thread_gate: Optional[ThreadGate] = None
 
         self.validation_results: Dict[str, Dict] = {}
 
-    def validate_single_domain(self, domain: str) -> Dict:
+    def _make_resolver(self, factory, upstream: str):
+        """A dnspython (async) resolver asking only the given nameserver"""
+        address, port = parse_upstream(upstream, self.port)
+        resolver = factory(configure=False)
+        resolver.nameservers = [address]
+        resolver.port = port
+        resolver.timeout = self.timeout
+        resolver.lifetime = self.timeout
+        return resolver
+
+    @staticmethod
+    def _is_answer(result: Tuple[QueryOutcome, object]) -> bool:
+        """Whether an upstream gave a real answer (NXDOMAIN included) rather than failing"""
+        return result[0][0] not in FAILED_OUTCOMES
+
+    @staticmethod
+    def _failed(error: Exception) -> QueryOutcome:
+        if isinstance(error, dns.resolver.NXDOMAIN):
+            return ('nxdomain', None, None)
+        if isinstance(error, dns.resolver.NoAnswer):
+            return ('negative', None, None)
+        if isinstance(error, dns.exception.Timeout):
+            return ('timeout', None, str(error))
+        return ('error', None, str(error))
+
+    def _settles(self, outcome: str) -> bool:
         """
-        Validate a single domain using multiple methods.
-        Returns detailed validation results.
+        An NXDOMAIN answer settles the domain (no other type can exist), and so
+        does the first positive answer with stop_on_first_positive.
         """
-        result = {
+        return outcome == 'nxdomain' or (outcome == 'positive' and self.stop_on_first_positive)
+
+    def _cached(self, domain: str, rdtype: str) -> Optional[QueryOutcome]:
+        cached = self.cache.get(domain, rdtype) if self.cache else None
+        if cached is None:
+            return None
+        kind, records = cached
+        return (kind, records or None, None)
+
+    def _remember(self, domain: str, rdtype: str, outcome: QueryOutcome, response) -> None:
+        """Cache a positive or negative answer for its TTL; failures are never cached"""
+        if not self.cache or response is None or outcome[0] in FAILED_OUTCOMES:
+            return
+        ttl = answer_ttl(response) if outcome[0] == 'positive' else negative_ttl(response)
+        if ttl is not None:
+            self.cache.put(domain, rdtype, outcome[0], outcome[1] or [], ttl)
+
+    @staticmethod
+    def _negative_response(error: Exception):
+        """The DNS message behind an NXDOMAIN/NoAnswer exception, if dnspython kept it"""
+        if isinstance(error, dns.resolver.NXDOMAIN):
+            return next(iter((error.kwargs.get('responses') or {}).values()), None)
+        if isinstance(error, dns.resolver.NoAnswer):
+            return error.kwargs.get('response')
+        return None
+
+    def _resolve_on(self, upstream: str, domain: str, rdtype: str,
+                    timeout: Optional[float] = None) -> Tuple[QueryOutcome, object]:
+        """Query one nameserver; returns the outcome and the DNS message behind it"""
+        try:
+            answer = self._resolvers[upstream].resolve(domain, rdtype, lifetime=timeout)
+            return ('positive', [str(record) for record in answer], None), answer.response
+        except Exception as e:
+            return self._failed(e), self._negative_response(e)
+
+    def _query(self, domain: str, rdtype: str) -> QueryOutcome:
+        """
+        Query one record type. Returns (outcome, records, error) where outcome is
+        'positive', 'negative' (NoAnswer), 'nxdomain' or 'error'.
+        """
+        cached = self._cached(domain, rdtype)
+        if cached is not None:
+            return cached
+        gate = self._thread_gate
+        token = gate.acquire() if gate else None
+        started = time.perf_counter()
+        outcome = None
+        try:
+            outcome, response = self.upstreams.race(
+                lambda upstream, timeout: self._resolve_on(upstream, domain, rdtype, timeout), self._is_answer,
+                self._query_pool, self._upstream_offset, self._hedge_pool)
+        finally:
+            if gate:
+                gate.release(token, outcome is not None and outcome[0] not in FAILED_OUTCOMES,
+                             (time.perf_counter() - started) * 1000)
+        self._remember(domain, rdtype, outcome, response)
+        return outcome
+
+    def _run_queries(self, domain: str) -> Dict[str, QueryOutcome]:
+        """
+        Run the configured queries for domain and return their outcomes by type.
+        Queries still outstanding once the domain is settled are abandoned.
+        """
+        outcomes = {}
+        if self._lookup_pool is None:
+            for rdtype in self.record_types:
+                outcomes[rdtype] = self._query(domain, rdtype)
+                if self._settles(outcomes[rdtype][0]):
+                    break
+            return outcomes
+
+        futures = {self._lookup_pool.submit(self._query, domain, rdtype): rdtype
+                   for rdtype in self.record_types}
+        for future in concurrent.futures.as_completed(futures):
+            outcomes[futures[future]] = future.result()
+            if self._settles(outcomes[futures[future]][0]):
+                for pending in futures:
+                    pending.cancel()
+                break
+        return outcomes
+
+    async def _query_async(self, resolvers: Dict[str, dns.asyncresolver.Resolver], domain: str, rdtype: str,
+                           gate: AsyncGate) -> QueryOutcome:
+        cached = self._cached(domain, rdtype)
+        if cached is not None:
+            return cached
+
+        async def resolve_on(upstream: str) -> Tuple[QueryOutcome, object]:
+            try:
+                answer = await resolvers[upstream].resolve(domain, rdtype)
+                return ('positive', [str(record) for record in answer], None), answer.response
+            except Exception as e:
+                return self._failed(e), self._negative_response(e)
+
+        # One slot per lookup, hedge included: a hedge must never queue behind
+        # the stalled queries it is meant to overtake
+        token = await gate.acquire()
+        started = time.perf_counter()
+        ok = None  # Stays None if the lookup is cancelled (domain already settled)
+        try:
+            outcome, response = await self.upstreams.race_async(resolve_on, self._is_answer, self._upstream_offset)
+            ok = outcome[0] not in FAILED_OUTCOMES
+        finally:
+            gate.release(token, ok, (time.perf_counter() - started) * 1000)
+        self._remember(domain, rdtype, outcome, response)
+        return outcome
+
+    async def _run_queries_async(self, resolvers: Dict[str, dns.asyncresolver.Resolver], domain: str,
+                                 gate: AsyncGate) -> Dict[str, QueryOutcome]:
+        """asyncio counterpart of _run_queries; outstanding queries are cancelled"""
+        outcomes = {}
+        if not self.concurrent_lookups:
+            for rdtype in self.record_types:
+                outcomes[rdtype] = await self._query_async(resolvers, domain, rdtype, gate)
+                if self._settles(outcomes[rdtype][0]):
+                    break
+            return outcomes
+
+        tasks = {asyncio.ensure_future(self._query_async(resolvers, domain, rdtype, gate)): rdtype
+                 for rdtype in self.record_types}
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    outcomes[tasks[task]] = task.result()
+                    if self._settles(outcomes[tasks[task]][0]):
+                        return outcomes
+        finally:
+            for task in pending:
+                task.cancel()
+        return outcomes
+
+    @staticmethod
+    def _empty_result(domain: str) -> Dict:
+        return {
             'domain': domain,
             'valid': False,
             'has_a_record': False,
@@ -53,118 +298,240 @@ class DomainValidator:
             'status': 'unknown'
         }
 
-        start_time = time.time()
-
-        try:
-            # Test A records (IPv4)
-            try:
-                a_records = self.resolver.resolve(domain, 'A')
+    def _apply_outcomes(self, result: Dict, outcomes: Dict[str, QueryOutcome], start_time: float) -> None:
+        """Fill result from the per-type query outcomes"""
+        # Apply answers in a fixed order so A addresses precede AAAA ones
+        for rdtype in SUPPORTED_RECORD_TYPES:
+            if rdtype not in outcomes:
+                continue
+            outcome, records, error = outcomes[rdtype]
+            if outcome in FAILED_OUTCOMES:
+                # MX records are optional for ad domains
+                if rdtype != 'MX' and not result['error']:
+                    result['error'] = f"{rdtype} record error: {error}"
+                continue
+            if outcome != 'positive':
+                continue
+
+            result['valid'] = True
+            if rdtype == 'A':
                 result['has_a_record'] = True
-                result['ip_addresses'] = [str(record) for record in a_records]
-                result['valid'] = True
-            except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
-                pass
-            except Exception as e:
-                result['error'] = f"A record error: {str(e)}"
-
-            # Test AAAA records (IPv6)
-            try:
-                aaaa_records = self.resolver.resolve(domain, 'AAAA')
+                result['ip_addresses'].extend(records)
+            elif rdtype == 'AAAA':
                 result['has_aaaa_record'] = True
-                if not result['ip_addresses']:
-                    result['ip_addresses'] = []
-                result['ip_addresses'].extend([str(record) for record in aaaa_records])
-                result['valid'] = True
-            except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
-                pass
-            except Exception as e:
-                if not result['error']:
-                    result['error'] = f"AAAA record error: {str(e)}"
-
-            # Test CNAME records
-            try:
-                cname_records = self.resolver.resolve(domain, 'CNAME')
+                result['ip_addresses'].extend(records)
+            elif rdtype == 'CNAME':
                 result['has_cname_record'] = True
-                result['cname_target'] = str(cname_records[0])
-                result['valid'] = True
-            except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
-                pass
-            except Exception as e:
-                if not result['error']:
-                    result['error'] = f"CNAME record error: {str(e)}"
-
-            # Test MX records (for completeness)
-            try:
-                mx_records = self.resolver.resolve(domain, 'MX')
+                result['cname_target'] = records[0]
+            else:
                 result['has_mx_record'] = True
-                result['mx_records'] = [str(record) for record in mx_records]
-                result['valid'] = True
-            except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
-                pass
-            except Exception:
-                pass  # MX records are optional for ad domains
-
-            # Calculate response time
-            result['response_time'] = round((time.time() - start_time) * 1000, 2)  # ms
-
-            # Determine status
-            if result['valid']:
-                if result['has_a_record'] or result['has_aaaa_record']:
-                    result['status'] = 'active'
-                elif result['has_cname_record']:
-                    result['status'] = 'redirected'
-                else:
-                    result['status'] = 'exists'
+                result['mx_records'] = records
+
+        # Calculate response time
+        result['response_time'] = round((time.time() - start_time) * 1000, 2)  # ms
+
+        # Determine status
+        if result['valid']:
+            if result['has_a_record'] or result['has_aaaa_record']:
+                result['status'] = 'active'
+            elif result['has_cname_record']:
+                result['status'] = 'redirected'
             else:
+                result['status'] = 'exists'
+        else:
+            # Only an answer proves a domain gone; failed lookups leave it open.
+            # MX only decides when nothing else was asked (e.g. --record-types MX)
+            kinds = {outcomes[rdtype][0] for rdtype in outcomes if rdtype != 'MX'}
+            if not kinds and 'MX' in outcomes:
+                kinds = {outcomes['MX'][0]}
+                if outcomes['MX'][0] in FAILED_OUTCOMES and not result['error']:
+                    result['error'] = f"MX record error: {outcomes['MX'][2]}"
+            if 'nxdomain' in kinds or not kinds & set(FAILED_OUTCOMES):
                 result['status'] = 'not_found'
+            elif 'timeout' in kinds:
+                result['status'] = 'timeout'
+            else:
+                result['status'] = 'error'
 
-        except dns.resolver.NXDOMAIN:
+    def _apply_failure(self, result: Dict, error: Exception) -> None:
+        if isinstance(error, dns.resolver.NXDOMAIN):
             result['status'] = 'not_found'
             result['error'] = 'Domain does not exist (NXDOMAIN)'
-        except dns.resolver.Timeout:
+        elif isinstance(error, dns.resolver.Timeout):
             result['status'] = 'timeout'
             result['error'] = f'DNS timeout after {self.timeout}s'
-        except Exception as e:
+        else:
             result['status'] = 'error'
-            result['error'] = str(e)
+            result['error'] = str(error)
 
+    def validate_single_domain(self, domain: str) -> Dict:
+        """
+        Validate a single domain by querying the configured record types.
+        With concurrent lookups the per-domain latency is that of the slowest
+        query rather than the sum of all of them.
+        Returns detailed validation results.
+        """
+        result = self._empty_result(domain)
+        start_time = time.time()
+        try:
+            self._apply_outcomes(result, self._run_queries(domain), start_time)
+        except Exception as e:
+            self._apply_failure(result, e)
+        return result
+
+    async def validate_single_domain_async(self, resolvers: Dict[str, dns.asyncresolver.Resolver], domain: str,
+                                           gate: AsyncGate) -> Dict:
+        """
+        Same as validate_single_domain, on asyncio resolvers (one per
+        nameserver); gate bounds the lookups in flight across all domains.
+        """
+        result = self._empty_result(domain)
+        start_time = time.time()
+        try:
+            self._apply_outcomes(result, await self._run_queries_async(resolvers, domain, gate), start_time)
+        except Exception as e:
+            self._apply_failure(result, e)
         return result
 
-    def validate_domains_batch(self, domains: List[str]) -> Dict[str, Dict]:
+    def validate_domains_batch(self, domains: List[str],
+                               on_result: Optional[Callable[[Dict], None]] = None,
+                               keep_results: bool = True) -> Dict[str, Dict]:
         """
         Validate multiple domains in parallel.
+        Domains that only got timeouts or errors are retried after the main
+        pass (see retries); every result keeps the history of its attempts in
+        'attempts' while 'status' holds the final verdict. Results are handed
+        to on_result once final, in completion order. With keep_results=False
+        final results are dropped after on_result, so memory holds only the
+        retry queue; the returned dict is then empty.
         """
-        print(f"Validating {len(domains)} domains using {self.max_workers} workers...")
+        if self.adaptive:
+            initial = self.concurrency if self.engine == 'async' else self.max_workers * len(self.record_types)
+            self.controller = AIMDController(initial=initial, maximum=self.max_concurrency)
+            print(f"Validating {len(domains)} domains with adaptive concurrency "
+                  f"({self.controller.limit} to at most {self.controller.maximum} lookups in flight)...")
+        elif self.engine == 'async':
+            print(f"Validating {len(domains)} domains with up to {self.concurrency} queries in flight...")
+        else:
+            print(f"Validating {len(domains)} domains using {self.max_workers} workers...")
 
         results = {}
-        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            # Submit all validation tasks
-            future_to_domain = {
-                executor.submit(self.validate_single_domain, domain): domain
-                for domain in domains
-            }
-
-            # Collect results as they complete
-            completed = 0
-            for future in concurrent.futures.as_completed(future_to_domain):
-                domain = future_to_domain[future]
-                try:
-                    result = future.result()
-                    results[domain] = result
-                except Exception as exc:
-                    results[domain] = {
-                        'domain': domain,
-                        'valid': False,
-                        'status': 'error',
-                        'error': f'Validation failed: {exc}'
-                    }
-
-                completed += 1
-                if completed % 10 == 0 or completed == len(domains):
-                    print(f"  Progress: {completed}/{len(domains)} domains validated")
-
+        progress = {'done': 0, 'total': len(domains)}
+
+        def collect(result: Dict) -> None:
+            previous = results.get(result['domain'])
+            result['attempts'] = (previous['attempts'] if previous else []) + [{
+                'status': result['status'],
+                'error': result.get('error'),
+                'response_time': result.get('response_time'),
+            }]
+            results[result['domain']] = result
+            # Transient failures wait in the retry queue; everything else is final
+            if not (result['status'] in TRANSIENT_STATUSES and len(result['attempts']) <= self.retries):
+                if on_result is not None:
+                    on_result(result)
+                if not keep_results:
+                    del results[result['domain']]
+            progress['done'] += 1
+            if progress['done'] % max(10, progress['total'] // 100) == 0 or progress['done'] == progress['total']:
+                print(f"  Progress: {progress['done']}/{progress['total']} domains validated")
+
+        self._run_pass(domains, collect)
+
+        for attempt in range(1, self.retries + 1):
+            queue = sorted(domain for domain, result in results.items()
+                           if result['status'] in TRANSIENT_STATUSES)
+            if not queue:
+                break
+            delay = self.retry_backoff * 2 ** (attempt - 1)
+            print(f"  Retrying {len(queue)} domains with timeouts or errors in {delay:g}s "
+                  f"(attempt {attempt + 1}, starting on another nameserver)...")
+            time.sleep(delay)
+            progress.update(done=0, total=len(queue))
+            self._upstream_offset = attempt
+            try:
+                self._run_pass(queue, collect)
+            finally:
+                self._upstream_offset = 0
+
+        if self.cache:
+            self.cache.flush()
+            print(f"  Answer cache: {self.cache.hits} hits, {self.cache.misses} misses")
+        if self.controller:
+            print(f"  Concurrency: ended at {self.controller.limit}, peak {self.controller.peak}, "
+                  f"{self.controller.backoffs} backoffs")
         return results
 
+    def _run_pass(self, domains: List[str], collect: Callable[[Dict], None]) -> None:
+        if self.engine == 'async':
+            asyncio.run(self._validate_batch_async(domains, collect))
+        else:
+            self._validate_batch_threads(domains, collect)
+
+    def _validate_batch_threads(self, domains: List[str], collect: Callable[[Dict], None]) -> None:
+        """Validate domains on a thread pool, a bounded window of domains at a time"""
+        workers = self.max_workers
+        if self.controller:
+            self._thread_gate = ThreadGate(self.controller)
+            workers = self.max_concurrency
+        try:
+            self._run_thread_pool(domains, workers, collect)
+        finally:
+            self._thread_gate = None
+
+    def _run_thread_pool(self, domains: Iterable[str], workers: int, collect: Callable[[Dict], None]) -> None:
+        """
+        Validate domains on workers threads. At most 2 * workers domains are
+        submitted at a time and each future is dropped once collected, so
+        memory stays flat however many domains there are.
+        """
+        domain_iter = iter(domains)
+        window = 2 * workers
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            future_to_domain = {}
+
+            def submit(count: int) -> None:
+                for domain in itertools.islice(domain_iter, count):
+                    future_to_domain[executor.submit(self.validate_single_domain, domain)] = domain
+
+            submit(window)
+            # Collect results as they complete, refilling the window
+            while future_to_domain:
+                done, _ = concurrent.futures.wait(future_to_domain,
+                                                  return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    domain = future_to_domain.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as exc:
+                        result = {
+                            'domain': domain,
+                            'valid': False,
+                            'status': 'error',
+                            'error': f'Validation failed: {exc}'
+                        }
+                    collect(result)
+                submit(len(done))
+
+    async def _validate_batch_async(self, domains: List[str], collect: Callable[[Dict], None]) -> None:
+        """
+        Validate domains on one event loop. A fixed set of worker coroutines
+        pulls domains from a shared iterator, so memory stays flat however many
+        domains there are; the gate caps the lookups in flight, at a fixed
+        number or under adaptive control.
+        """
+        resolvers = {ns: self._make_resolver(dns.asyncresolver.Resolver, ns) for ns in self.nameservers}
+        controller = self.controller or AIMDController(
+            initial=self.concurrency, minimum=self.concurrency, maximum=self.concurrency)
+        gate = AsyncGate(controller)
+        pending = iter(domains)
+
+        async def worker() -> None:
+            for domain in pending:
+                collect(await self.validate_single_domain_async(resolvers, domain, gate))
+
+        await asyncio.gather(*(worker() for _ in range(min(controller.maximum, len(domains)))))
+
     def load_domains_from_filter(self, filter_file: str) -> List[str]:
         """
         Load domains from AdGuard filter file.
@@ -173,16 +540,10 @@ class DomainValidator:
         try:
             with open(filter_file, 'r', encoding='utf-8') as f:
                 for line in f:
-                    line = line.strip()
-                    # Skip comments and empty lines
-                    if not line or line.startswith('!'):
-                        continue
-
                     # Extract domain from AdGuard format ||domain.com^
-                    if line.startswith('||') and line.endswith('^'):
-                        domain = line[2:-1]  # Remove || and ^
-                        if domain and '/' not in domain and ':' not in domain:
-                            domains.append(domain)
+                    domain = rule_domain(line)
+                    if domain:
+                        domains.append(domain)
         except FileNotFoundError:
             print(f"Error: Filter file {filter_file} not found")
             return []
@@ -196,40 +557,45 @@ class DomainValidator:
         """
         Generate summary report from validation results.
         """
-        total = len(results)
-        active = sum(1 for r in results.values() if r['status'] == 'active')
-        redirected = sum(1 for r in results.values() if r['status'] == 'redirected')
-        not_found = sum(1 for r in results.values() if r['status'] == 'not_found')
-        timeout = sum(1 for r in results.values() if r['status'] == 'timeout')
-        error = sum(1 for r in results.values() if r['status'] == 'error')
-
-        # Calculate average response time for successful validations
-        valid_response_times = [
-            r['response_time'] for r in results.values()
-            if r.get('response_time') is not None and r['status'] in ['active', 'redirected', 'exists']
-        ]
-        avg_response_time = sum(valid_response_times) / len(valid_response_times) if valid_response_times else 0
+        summary = ValidationSummary()
+        for result in results.values():
+            summary.add(result)
 
         return {
-            'summary': {
-                'total_domains': total,
-                'active_domains': active,
-                'redirected_domains': redirected,
-                'not_found_domains': not_found,
-                'timeout_domains': timeout,
-                'error_domains': error,
-                'valid_domains': active + redirected,
-                'invalid_domains': not_found + timeout + error,
-                'success_rate': round((active + redirected) / total * 100, 2) if total > 0 else 0,
-                'average_response_time_ms': round(avg_response_time, 2)
-            },
+            'summary': summary.to_dict(),
             'details': results,
             'timestamp': datetime.utcnow().isoformat() + 'Z',
-            'validation_settings': {
-                'max_workers': self.max_workers,
-                'timeout_seconds': self.timeout,
-                'dns_servers': self.resolver.nameservers
-            }
+            'validation_settings': self._validation_settings()
+        }
+
+    def generate_summary_report(self, summary: ValidationSummary, details_file: str) -> Dict:
+        """
+        Report of a streaming run: the summary only, per-domain results are
+        in the JSONL details_file.
+        """
+        return {
+            'summary': summary.to_dict(),
+            'details_file': details_file,
+            'timestamp': datetime.utcnow().isoformat() + 'Z',
+            'validation_settings': self._validation_settings()
+        }
+
+    def _validation_settings(self) -> Dict:
+        return {
+            'max_workers': self.max_workers,
+            'timeout_seconds': self.timeout,
+            'dns_servers': self.nameservers,
+            'record_types': self.record_types,
+            'stop_on_first_positive': self.stop_on_first_positive,
+            'concurrent_lookups': self.concurrent_lookups,
+            'engine': self.engine,
+            'concurrency': self.concurrency if self.engine == 'async' else None,
+            'answer_cache': str(self.cache.path) if self.cache else None,
+            'hedging': self.upstreams.hedge,
+            'adaptive_concurrency': self.controller.report() if self.controller else None,
+            'upstreams': self.upstreams.report(),
+            'retries': self.retries,
+            'retry_backoff_seconds': self.retry_backoff
         }
 
     def save_report(self, report: Dict, output_file: str) -> None:
@@ -256,9 +622,28 @@ class DomainValidator:
         print(f"Active domains (A/AAAA records): {summary['active_domains']}")
         print(f"Redirected domains (CNAME only): {summary['redirected_domains']}")
         print(f"Not found domains (NXDOMAIN): {summary['not_found_domains']}")
-        print(f"Timeout/Error domains: {summary['timeout_domains'] + summary['error_domains']}")
+        print(f"Timeout/Error domains: {summary['timeout_domains'] + summary['error_domains']} "
+              f"(kept in cleaned filters)")
+        if summary.get('retried_domains'):
+            print(f"Retried domains: {summary['retried_domains']} "
+                  f"({summary['recovered_domains']} resolved on a later attempt)")
         print(f"Success rate: {summary['success_rate']}%")
         print(f"Average response time: {summary['average_response_time_ms']}ms")
+        percentiles = summary.get('response_time_percentiles_ms')
+        if percentiles and percentiles.get('p50') is not None:
+            print("Response time percentiles: " + ", ".join(f"{k} {v}ms" for k, v in percentiles.items()))
+
+        upstreams = report.get('validation_settings', {}).get('upstreams', [])
+        if upstreams:
+            print("\nNameservers (best first):")
+            for stats in upstreams:
+                print(f"  {stats['address']}: {stats['latency_ms']}ms, {stats['queries']} queries, "
+                      f"{stats['failures']} failed, {stats['wins']} answered first, {stats['hedges']} hedged")
+
+        if 'details' not in report:
+            print(f"\nPer-domain results: {report.get('details_file')}")
+            print("\n" + "="*60)
+            return
 
         print("\n" + "-"*40)
         print("DOMAIN STATUS BREAKDOWN:")
@@ -294,16 +679,27 @@ class DomainValidator:
         """
         return [
             domain for domain, result in results.items()
-            if result['status'] in ['active', 'redirected', 'exists']
+            if result['status'] in VALID_STATUSES
         ]
 
     def filter_invalid_domains(self, results: Dict[str, Dict]) -> List[str]:
         """
-        Return list of domains that should be removed (no valid DNS records).
+        Return list of domains that should be removed (DNS answered that they
+        have no records). Timeouts and errors are not proof; see
+        filter_unresolved_domains.
+        """
+        return [
+            domain for domain, result in results.items()
+            if result['status'] == 'not_found'
+        ]
+
+    def filter_unresolved_domains(self, results: Dict[str, Dict]) -> List[str]:
+        """
+        Return list of domains still failing (timeout/error) after all retries.
         """
         return [
             domain for domain, result in results.items()
-            if result['status'] in ['not_found', 'timeout', 'error']
+            if result['status'] in TRANSIENT_STATUSES
         ]
 
 
@@ -316,7 +712,43 @@ def main():
                        help='Number of parallel DNS lookup workers (default: 10)')
     parser.add_argument('-t', '--timeout', type=float, default=5.0,
                        help='DNS lookup timeout in seconds (default: 5.0)')
+    parser.add_argument('--record-types', default=','.join(DEFAULT_RECORD_TYPES),
+                       help='Comma-separated record types to query per domain, from '
+                            f"{', '.join(SUPPORTED_RECORD_TYPES)} (default: {','.join(DEFAULT_RECORD_TYPES)})")
+    parser.add_argument('--stop-on-first', action='store_true',
+                       help='Stop querying a domain after its first positive answer')
+    parser.add_argument('--sequential-lookups', action='store_true',
+                       help='Query the record types of a domain one after another instead of at once')
+    parser.add_argument('--engine', choices=ENGINES, default='threads',
+                       help='Validation engine: a thread pool, or one asyncio event loop '
+                            'for large domain lists (default: threads)')
+    parser.add_argument('--concurrency', type=int, default=500,
+                       help='Maximum DNS queries in flight with --engine async (default: 500)')
+    parser.add_argument('--adaptive', action='store_true',
+                       help='Adjust the lookups in flight to the upstreams: grow while answers are fast, '
+                            'halve on timeouts and SERVFAIL (starts from -w or --concurrency)')
+    parser.add_argument('--max-concurrency', type=int, default=DEFAULT_MAXIMUM,
+                       help=f'Upper bound for --adaptive (default: {DEFAULT_MAXIMUM})')
+    parser.add_argument('--retries', type=int, default=2,
+                       help='Extra passes for domains that only got timeouts or errors (default: 2)')
+    parser.add_argument('--retry-backoff', type=float, default=1.0,
+                       help='Seconds to wait before the first retry pass, doubled for each further pass '
+                            '(default: 1.0)')
+    parser.add_argument('--answer-cache', default=DEFAULT_ANSWER_CACHE,
+                       help=f'SQLite cache of DNS answers reused within their TTL (default: {DEFAULT_ANSWER_CACHE})')
+    parser.add_argument('--no-answer-cache', action='store_true',
+                       help='Query every domain even if a cached answer is still valid')
+    parser.add_argument('--nameserver', action='append', dest='nameservers',
+                       help='DNS server to query, as address or address#port '
+                            '(repeatable, default: 8.8.8.8, 1.1.1.1, 208.67.222.222)')
+    parser.add_argument('--no-hedge', action='store_true',
+                       help='Do not race slow queries on a second nameserver')
+    parser.add_argument('--jsonl', metavar='PATH',
+                        help='Stream per-domain results to PATH as JSON lines while validating; '
+                             'the -o report then holds only the summary')
     parser.add_argument('--clean-filter', help='Output file for cleaned filter (valid domains only)')
+    parser.add_argument('--annotate-removed', action='store_true',
+                        help='Keep removed rules in the cleaned filter as "! Removed:" comments')
     parser.add_argument('--removed-domains', help='Output file for invalid domains list')
     parser.add_argument('--quiet', action='store_true', help='Suppress progress output')
 
@@ -327,7 +759,26 @@ def main():
         return 1
 
     # Initialize validator
-    validator = DomainValidator(max_workers=args.workers, timeout=args.timeout)
+    try:
+        validator = DomainValidator(
+            max_workers=args.workers,
+            timeout=args.timeout,
+            record_types=[t.strip() for t in args.record_types.split(',') if t.strip()],
+            stop_on_first_positive=args.stop_on_first,
+            concurrent_lookups=not args.sequential_lookups,
+            nameservers=args.nameservers,
+            engine=args.engine,
+            concurrency=args.concurrency,
+            cache=None if args.no_answer_cache else DNSAnswerCache(args.answer_cache),
+            hedge=not args.no_hedge,
+            adaptive=args.adaptive,
+            max_concurrency=args.max_concurrency,
+            retries=args.retries,
+            retry_backoff=args.retry_backoff,
+        )
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
 
     # Load domains from filter file
     print(f"Loading domains from: {args.filter_file}")
@@ -340,10 +791,32 @@ def main():
     print(f"Found {len(domains)} domains to validate")
 
     # Validate domains
-    results = validator.validate_domains_batch(domains)
+    if args.jsonl:
+        # Stream each final result to disk and fold it into the summary, keeping
+        # only the non-existent domains the filter outputs below need
+        summary = ValidationSummary()
+        results = {}
+
+        def on_result(result: Dict) -> None:
+            writer.write(result)
+            summary.add(result)
+            if result['status'] == 'not_found':
+                results[result['domain']] = result
+
+        with JSONLReportWriter(args.jsonl) as writer:
+            validator.validate_domains_batch(domains, on_result=on_result, keep_results=False)
+        print(f"Per-domain results streamed to: {args.jsonl} ({writer.written} lines)")
+    else:
+        results = validator.validate_domains_batch(domains)
+    if validator.cache:
+        validator.cache.purge_expired()
+        validator.cache.close()
 
     # Generate report
-    report = validator.generate_validation_report(results)
+    if args.jsonl:
+        report = validator.generate_summary_report(summary, args.jsonl)
+    else:
+        report = validator.generate_validation_report(results)
 
     # Save report
     validator.save_report(report, args.output)
@@ -354,27 +827,19 @@ def main():
 
     # Generate cleaned filter if requested
     if args.clean_filter:
-        valid_domains = validator.filter_valid_domains(results)
-        print(f"\nGenerating cleaned filter with {len(valid_domains)} valid domains...")
+        # Drop only domains DNS answered for; unresolved ones may be live
+        invalid_domains = {
+            domain: f"{results[domain]['status']}: {results[domain].get('error') or 'No DNS records'}"
+            for domain in validator.filter_invalid_domains(results)
+        }
+        print(f"\nGenerating cleaned filter without {len(invalid_domains)} non-existent domains "
+              f"({report['summary']['unresolved_domains']} unresolved domains kept)...")
 
-        # Read original filter and recreate with only valid domains
         try:
-            with open(args.filter_file, 'r', encoding='utf-8') as f:
-                original_lines = f.readlines()
-
-            with open(args.clean_filter, 'w', encoding='utf-8') as f:
-                # Copy header comments
-                for line in original_lines:
-                    if line.strip().startswith('!') or not line.strip():
-                        f.write(line)
-                    elif line.strip().startswith('||') and line.strip().endswith('^'):
-                        domain = line.strip()[2:-1]
-                        if domain in valid_domains:
-                            f.write(line)
-                    else:
-                        f.write(line)  # Other format lines
-
-            print(f"Cleaned filter saved to: {args.clean_filter}")
+            stats = rewrite_filter(args.filter_file, args.clean_filter, invalid_domains,
+                                   annotate=args.annotate_removed)
+            print(f"Cleaned filter saved to: {args.clean_filter} "
+                  f"({stats.kept} rules kept, {stats.removed} removed)")
         except Exception as e:
             print(f"Error generating cleaned filter: {e}")
 
@@ -388,7 +853,7 @@ def main():
                 f.write(f"# Total removed: {len(invalid_domains)}\n\n")
                 for domain in sorted(invalid_domains):
                     result = results[domain]
-                    f.write(f"{domain}  # {result['status']}: {result.get('error', 'No DNS records')}\n")
+                    f.write(f"{domain}  # {result['status']}: {result.get('error') or 'No DNS records'}\n")
 
             print(f"Removed domains list saved to: {args.removed_domains}")
         except Exception as e:
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Incremental summary and streaming JSONL output for validate_domains.py
+ValidationSummary folds per-domain results into counters and a latency
+histogram one at a time, so a summary (percentiles included) needs constant
+memory however many domains are validated. JSONLReportWriter appends each
+result as one JSON line the moment it is final, so an interrupted run keeps
+everything validated so far.
+"""
+
+import json
+import math
+from typing import Dict, Optional
+
+# Statuses counted in the summary, as produced by DomainValidator
+STATUSES = ('active', 'redirected', 'exists', 'not_found', 'timeout', 'error')
+VALID_STATUSES = ('active', 'redirected', 'exists')
+TRANSIENT_STATUSES = ('timeout', 'error')
+PERCENTILES = (50, 90, 99)
+
+# Latency histogram: bucket i holds samples up to HISTOGRAM_BASE_MS * HISTOGRAM_GROWTH**i,
+# so a reported percentile is at most 5% above the true value
+HISTOGRAM_BASE_MS = 0.1
+HISTOGRAM_GROWTH = 1.05
+
+
+class ValidationSummary:
+    """Running counts and response-time statistics of validation results"""
+
+    def __init__(self):
+        self.total = 0
+        self.counts: Dict[str, int] = {status: 0 for status in STATUSES}
+        self.retried = 0
+        self.recovered = 0
+        self._valid_time_sum = 0.0
+        self._valid_time_count = 0
+        self._histogram: Dict[int, int] = {}
+
+    @staticmethod
+    def _bucket(ms: float) -> int:
+        if ms <= HISTOGRAM_BASE_MS:
+            return 0
+        return math.ceil(math.log(ms / HISTOGRAM_BASE_MS, HISTOGRAM_GROWTH))
+
+    def add(self, result: Dict) -> None:
+        """Count one final result"""
+        self.total += 1
+        status = result['status']
+        self.counts[status] = self.counts.get(status, 0) + 1
+        if len(result.get('attempts', [])) > 1:
+            self.retried += 1
+            if status not in TRANSIENT_STATUSES:
+                self.recovered += 1
+        response_time = result.get('response_time')
+        if response_time is not None and status in VALID_STATUSES:
+            self._valid_time_sum += response_time
+            self._valid_time_count += 1
+            bucket = self._bucket(response_time)
+            self._histogram[bucket] = self._histogram.get(bucket, 0) + 1
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Upper bound of the histogram bucket holding the p-th percentile response time"""
+        if not self._valid_time_count:
+            return None
+        rank = math.ceil(p / 100 * self._valid_time_count)
+        seen = 0
+        for bucket in sorted(self._histogram):
+            seen += self._histogram[bucket]
+            if seen >= rank:
+                return round(HISTOGRAM_BASE_MS * HISTOGRAM_GROWTH ** bucket, 2)
+        return None
+
+    def to_dict(self) -> Dict:
+        """The 'summary' section of the validation report"""
+        active = self.counts['active']
+        redirected = self.counts['redirected']
+        average = self._valid_time_sum / self._valid_time_count if self._valid_time_count else 0
+        return {
+            'total_domains': self.total,
+            'active_domains': active,
+            'redirected_domains': redirected,
+            'not_found_domains': self.counts['not_found'],
+            'timeout_domains': self.counts['timeout'],
+            'error_domains': self.counts['error'],
+            'valid_domains': active + redirected,
+            # Only NXDOMAIN/NODATA answers make a domain invalid; domains that
+            # still failed after every retry are unresolved and stay listed
+            'invalid_domains': self.counts['not_found'],
+            'unresolved_domains': self.counts['timeout'] + self.counts['error'],
+            'retried_domains': self.retried,
+            'recovered_domains': self.recovered,
+            'success_rate': round((active + redirected) / self.total * 100, 2) if self.total > 0 else 0,
+            'average_response_time_ms': round(average, 2),
+            'response_time_percentiles_ms': {f'p{p}': self.percentile(p) for p in PERCENTILES},
+        }
+
+
+class JSONLReportWriter:
+    """Appends one JSON object per line; each line reaches the file as it is written"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.written = 0
+        # Line buffering: a crash loses at most the line being written
+        self._file = open(path, 'w', encoding='utf-8', buffering=1)
+
+    def write(self, result: Dict) -> None:
+        self._file.write(json.dumps(result, ensure_ascii=False) + '\n')
+        self.written += 1
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> 'JSONLReportWriter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
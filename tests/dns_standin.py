@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Local stand-in DNS server for tests
+Answers A/AAAA/CNAME/MX queries over UDP from an in-memory zone so resolver
+code can be exercised without network access. Names can be configured to
+return NXDOMAIN (absent), NODATA (present without the requested type),
+SERVFAIL, or no answer at all (to trigger timeouts). With negative_ttl set,
+NXDOMAIN and NODATA answers carry an SOA record whose minimum is that value.
+max_in_flight imitates a rate-limiting upstream: queries arriving while that
+many are already being answered get no answer.
+"""
+
+import socket
+import threading
+import time
+from typing import Dict, List, Optional
+
+import dns.flags
+import dns.message
+import dns.rcode
+import dns.rdatatype
+import dns.rrset
+
+
+class StandInDNSServer:
+    """Threaded UDP DNS server answering from self.zone"""
+
+    def __init__(self, zone: Optional[Dict[str, Dict[str, List[str]]]] = None, ttl: int = 300,
+                 negative_ttl: Optional[int] = None):
+        # zone: {'ad.daum.net': {'A': ['10.0.0.1'], 'AAAA': [...], 'CNAME': [...], 'MX': [...]}}
+        self.zone = {self._norm(name): records for name, records in (zone or {}).items()}
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.drop = set()       # Names that never get an answer
+        self.flaky: Dict[str, int] = {}  # Names whose next N queries get no answer
+        self.servfail = set()   # Names answered with SERVFAIL
+        self.delays: Dict[str, float] = {}  # Seconds to wait before answering
+        self.max_in_flight: Optional[int] = None
+        self.in_flight = 0
+        self.rate_limited = 0
+        self.queries: List[tuple] = []
+        self.lock = threading.Lock()
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        # Large receive buffer so bursts of concurrent queries aren't dropped
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.settimeout(0.1)
+        self.port = self.sock.getsockname()[1]
+        self.running = False
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+
+    @staticmethod
+    def _norm(name: str) -> str:
+        return name.lower().rstrip('.')
+
+    def query_count(self, name: Optional[str] = None) -> int:
+        with self.lock:
+            if name is None:
+                return len(self.queries)
+            return sum(1 for qname, _ in self.queries if qname == self._norm(name))
+
+    def _serve(self) -> None:
+        while self.running:
+            try:
+                data, addr = self.sock.recvfrom(4096)
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            threading.Thread(target=self._answer, args=(data, addr), daemon=True).start()
+
+    def _answer(self, data: bytes, addr) -> None:
+        try:
+            query = dns.message.from_wire(data)
+        except Exception:
+            return
+        question = query.question[0]
+        name = self._norm(question.name.to_text())
+        rdtype = dns.rdatatype.to_text(question.rdtype)
+        with self.lock:
+            self.queries.append((name, rdtype))
+
+        if name in self.drop:
+            return
+        with self.lock:
+            if self.flaky.get(name):
+                self.flaky[name] -= 1
+                return
+            if self.max_in_flight is not None and self.in_flight >= self.max_in_flight:
+                self.rate_limited += 1
+                return
+            self.in_flight += 1
+        try:
+            self._respond(query, question, name, rdtype, addr)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def _respond(self, query, question, name: str, rdtype: str, addr) -> None:
+        if name in self.delays:
+            time.sleep(self.delays[name])
+
+        response = dns.message.make_response(query)
+        response.flags |= dns.flags.RA
+        if name in self.servfail:
+            response.set_rcode(dns.rcode.SERVFAIL)
+        elif name not in self.zone:
+            response.set_rcode(dns.rcode.NXDOMAIN)
+        else:
+            records = self.zone[name]
+            if records.get(rdtype):
+                response.answer.append(dns.rrset.from_text_list(
+                    question.name, self.ttl, 'IN', rdtype, records[rdtype]))
+        if not response.answer and self.negative_ttl is not None and name not in self.servfail:
+            apex = '.'.join(name.split('.')[-2:]) + '.'
+            response.authority.append(dns.rrset.from_text(
+                apex, self.ttl, 'IN', 'SOA',
+                f'ns.{apex} hostmaster.{apex} 1 3600 600 86400 {self.negative_ttl}'))
+        try:
+            self.sock.sendto(response.to_wire(), addr)
+        except OSError:
+            pass
+
+    def start(self) -> 'StandInDNSServer':
+        self.running = True
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.running = False
+        self.thread.join(timeout=2)
+        self.sock.close()
+
+    def __enter__(self) -> 'StandInDNSServer':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
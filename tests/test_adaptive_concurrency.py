@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Tests for the AIMD concurrency control of validation runs
+"""
+
+import os
+import sys
+import unittest
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class TestAdaptiveConcurrency(unittest.TestCase):
+    """AIMD control of the lookups in flight"""
+
+    def test_controller_grows_and_backs_off_once_per_burst(self):
+        from scripts.adaptive_concurrency import AIMDController
+
+        controller = AIMDController(initial=4, maximum=20, increase=2, clock=lambda: 0.0)
+
+        def run_round(latency_ms=5.0):
+            tokens = [controller.try_enter() for _ in range(controller.limit)]
+            self.assertIsNone(controller.try_enter())
+            for token in tokens:
+                controller.exit(token, True, latency_ms)
+
+        run_round()
+        self.assertEqual(controller.limit, 8)  # Slow start doubles
+        run_round()
+        run_round()
+        self.assertEqual(controller.limit, 20)  # Capped at the maximum
+
+        tokens = [controller.try_enter() for _ in range(20)]
+        for token in tokens[:10]:
+            controller.exit(token, False, 1000.0)
+        self.assertEqual(controller.limit, 10)  # One cut for the whole burst
+        self.assertEqual(controller.backoffs, 1)
+        for token in tokens[10:]:
+            controller.exit(token, True, 5.0)  # Started before the cut: ignored
+
+        run_round()
+        self.assertEqual(controller.limit, 12)  # Additive once slow start ended
+        run_round(latency_ms=500.0)
+        self.assertEqual(controller.limit, 12)  # Latency far above the baseline: hold
+        self.assertEqual([entry['event'] for entry in controller.report()['trace']],
+                         ['start', 'increase', 'increase', 'increase', 'backoff', 'increase'])
+
+    def test_adaptive_run_against_rate_limited_upstream(self):
+        from dns_standin import StandInDNSServer
+        from scripts.validate_domains import DomainValidator
+
+        domains = [f'ad{i}.daum.net' for i in range(400)]
+        with StandInDNSServer({d: {'A': ['10.0.0.1']} for d in domains}) as server:
+            for domain in domains:
+                server.delays[domain] = 0.05
+            server.max_in_flight = 30
+            validator = DomainValidator(timeout=0.3, nameservers=['127.0.0.1'], port=server.port,
+                                        record_types=['A'], engine='async', concurrency=8,
+                                        adaptive=True, max_concurrency=400, retry_backoff=0.01)
+            results = validator.validate_domains_batch(domains)
+
+        control = validator.generate_validation_report(results)['validation_settings']['adaptive_concurrency']
+        events = [entry['event'] for entry in control['trace']]
+        self.assertIn('increase', events)
+        self.assertIn('backoff', events)
+        self.assertGreater(control['peak'], 8)
+        self.assertLess(control['final'], control['peak'])
+        self.assertGreater(sum(r['status'] == 'active' for r in results.values()), len(domains) * 0.8)
+
+
+if __name__ == '__main__':
+    unittest.main()
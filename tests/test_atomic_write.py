@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared atomic file replacement
+"""
+
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import unittest
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def file_mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+class TestAtomicWrite(unittest.TestCase):
+    """Files replaced through a temporary sibling keep sensible permissions"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        umask = os.umask(0)
+        os.umask(umask)
+        self.new_file_mode = 0o666 & ~umask
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_new_files_get_the_mode_open_would_give(self):
+        from scripts.atomic_write import write_atomic
+
+        path = os.path.join(self.tmpdir, 'sub', 'filter.txt')
+        write_atomic(path, '||ad.kakao.com^\n')
+
+        with open(path, encoding='utf-8') as f:
+            self.assertEqual(f.read(), '||ad.kakao.com^\n')
+        # mkstemp alone would leave 0600, unreadable for a web server
+        self.assertEqual(file_mode(path), self.new_file_mode)
+
+    def test_replaced_files_keep_their_mode(self):
+        from scripts.atomic_write import write_atomic
+
+        path = os.path.join(self.tmpdir, 'filter.txt')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('old\n')
+        os.chmod(path, 0o664)
+
+        write_atomic(path, b'new\n')
+
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), b'new\n')
+        self.assertEqual(file_mode(path), 0o664)
+
+    def test_failed_writes_leave_the_file_and_no_temporary_file(self):
+        from scripts.atomic_write import atomic_open
+
+        path = os.path.join(self.tmpdir, 'filter.txt')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('old\n')
+
+        with self.assertRaises(RuntimeError):
+            with atomic_open(path) as f:
+                f.write('half')
+                raise RuntimeError('disk full')
+
+        with open(path, encoding='utf-8') as f:
+            self.assertEqual(f.read(), 'old\n')
+        self.assertEqual(os.listdir(self.tmpdir), ['filter.txt'])
+
+    def test_published_outputs_do_not_keep_the_temporary_mode(self):
+        from datetime import datetime
+        from scripts.filter_emitters import build_model, emit_files
+        from scripts.filter_rewriter import rewrite_filter
+
+        adguard = os.path.join(self.tmpdir, 'filter.txt')
+        hosts = os.path.join(self.tmpdir, 'formats', 'hosts.txt')
+        model = build_model(['ad.kakao.com', 'ads.daum.net'], datetime(2024, 1, 1))
+        emit_files(model, [('adguard_dns', adguard), ('hosts', hosts)])
+        self.assertEqual(file_mode(adguard), self.new_file_mode)
+        self.assertEqual(file_mode(hosts), self.new_file_mode)
+
+        os.chmod(adguard, 0o644)
+        rewrite_filter(adguard, adguard, {'ads.daum.net'})
+        self.assertEqual(file_mode(adguard), 0o644)
+
+
+if __name__ == '__main__':
+    unittest.main()
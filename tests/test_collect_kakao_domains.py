@@ -0,0 +1,1492 @@
+#!/usr/bin/env python3
+"""
+Tests for the Kakao/Daum domain collector
+Sources are served from a local HTTP stand-in, so no network access is needed
+"""
+
+import unittest
+import gzip
+import json
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest.mock import patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SAMPLE_LIST = """! Title: Sample list
+! Homepage: https://example.org
+||ad.daum.net^
+||ads.kakao.com^$third-party
+||example.com^
+@@||accounts.kakao.com^
+||track.kakaotalk.com^
+"""
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """
+    Serves self.server.routes, honouring If-None-Match and gzip like a real
+    CDN. Connections are kept alive, and queued failures are injected first.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append((self.path, dict(self.headers)))
+            server.clients.add(self.client_address)
+            failures = server.failures.get(self.path)
+            failure = failures.pop(0) if failures else None
+        if failure == 'reset':
+            # Drop the connection without answering
+            self.close_connection = True
+            return
+        if isinstance(failure, int):
+            self.send_error(failure)
+            return
+        route = server.routes.get(self.path)
+        if route is None:
+            self.send_error(404)
+            return
+
+        body, etag = route
+        if etag and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        full_length = len(body)
+        if failure == 'truncate':
+            body = body[:len(body) // 2]
+            self.close_connection = True
+        elif self.path in server.gzipped and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body)
+            full_length = len(body)
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(full_length))
+        if self.path in server.gzipped and failure != 'truncate':
+            self.send_header('Content-Encoding', 'gzip')
+        if etag:
+            self.send_header('ETag', etag)
+        self.end_headers()
+
+        gate = server.gates.get(self.path)
+        if gate:
+            # Send the head of the body, then hold the rest until the client
+            # signals that it has already started parsing
+            split_at, event = gate
+            self.wfile.write(body[:split_at])
+            self.wfile.flush()
+            server.gate_released[self.path] = event.wait(timeout=5)
+            body = body[split_at:]
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandInServer:
+    """Local HTTP server standing in for raw.githubusercontent.com"""
+
+    def __init__(self):
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+        self.httpd.routes = {}
+        self.httpd.requests = []
+        self.httpd.gates = {}
+        self.httpd.gate_released = {}
+        self.httpd.failures = {}
+        self.httpd.gzipped = set()
+        self.httpd.clients = set()
+        self.httpd.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def requests(self):
+        return self.httpd.requests
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}{path}"
+
+    @property
+    def connections(self):
+        """Number of distinct client connections seen"""
+        return len(self.httpd.clients)
+
+    def serve(self, path, body, etag=None, gzipped=False):
+        self.httpd.routes[path] = (body.encode('utf-8') if isinstance(body, str) else body, etag)
+        if gzipped:
+            self.httpd.gzipped.add(path)
+
+    def fail(self, path, *failures):
+        """Answer the next requests for path with these failures: a status code, 'reset' or 'truncate'"""
+        self.httpd.failures.setdefault(path, []).extend(failures)
+
+    def hold(self, path, split_at):
+        """Pause the response for path after split_at bytes until release() is called"""
+        event = threading.Event()
+        self.httpd.gates[path] = (split_at, event)
+        return event
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class CollectorTestCase(unittest.TestCase):
+    """Base class providing a temp dir and a sources.json writer"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.tmpdir, 'cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def write_sources(self, sources):
+        with open('scripts/sources.json', 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        config['sources'] = sources
+        path = os.path.join(self.tmpdir, 'sources.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(config, f)
+        return path
+
+
+class TestSourceFetching(CollectorTestCase):
+    """Parallel fetching and the conditional-request cache"""
+
+    def test_fetch_all_preserves_source_order(self):
+        from scripts.source_fetcher import SourceFetcher
+
+        with StandInServer() as server:
+            sources = []
+            for i in range(5):
+                server.serve(f'/list{i}.txt', f'||ad{i}.daum.net^\n')
+                sources.append({'name': f'L{i}', 'url': server.url(f'/list{i}.txt')})
+            sources.append({'name': 'Missing', 'url': server.url('/missing.txt')})
+
+            results = SourceFetcher(max_workers=4).fetch_all(sources)
+
+        self.assertEqual([r.name for r in results], [s['name'] for s in sources])
+        for i in range(5):
+            self.assertEqual(results[i].status, 'fetched')
+            self.assertEqual(results[i].text, f'||ad{i}.daum.net^\n')
+        self.assertEqual(results[-1].status, 'failed')
+        self.assertIn('404', results[-1].error)
+
+    def test_conditional_request_uses_cached_body(self):
+        from scripts.source_fetcher import SourceFetcher
+
+        with StandInServer() as server:
+            server.serve('/list.txt', SAMPLE_LIST, etag='"v1"')
+            source = {'name': 'Sample', 'url': server.url('/list.txt')}
+            fetcher = SourceFetcher(cache_dir=self.cache_dir)
+
+            first = fetcher.fetch(source)
+            second = fetcher.fetch(source)
+
+            self.assertEqual(first.status, 'fetched')
+            self.assertEqual(second.status, 'not_modified')
+            self.assertEqual(second.text, SAMPLE_LIST)
+            self.assertNotIn('If-None-Match', server.requests[0][1])
+            self.assertEqual(server.requests[1][1].get('If-None-Match'), '"v1"')
+
+            # Upstream changed: full download again
+            server.serve('/list.txt', SAMPLE_LIST + '||pixel.daum.net^\n', etag='"v2"')
+            third = fetcher.fetch(source)
+            self.assertEqual(third.status, 'fetched')
+            self.assertIn('pixel.daum.net', third.text)
+
+    def test_not_modified_source_skips_parsing(self):
+        from scripts.collect_kakao_domains import KakaoDomainCollector
+
+        with StandInServer() as server:
+            server.serve('/list.txt', SAMPLE_LIST, etag='"v1"')
+            sources_file = self.write_sources([{'name': 'Sample', 'url': server.url('/list.txt')}])
+
+            first = KakaoDomainCollector(sources_file, cache_dir=self.cache_dir)
+            first.collect_from_sources()
+            self.assertIn('ad.daum.net', first.collected_domains)
+            self.assertIn('ads.kakao.com', first.collected_domains)
+            self.assertNotIn('accounts.kakao.com', first.collected_domains)
+
+            second = KakaoDomainCollector(sources_file, cache_dir=self.cache_dir)
+            with patch.object(second, 'extract_domains_from_adblock') as extract:
+                second.collect_from_sources()
+                extract.assert_not_called()
+
+        self.assertEqual(second.collected_domains, first.collected_domains)
+
+    def test_identical_redownload_reuses_parse_by_content_hash(self):
+        from scripts.collect_kakao_domains import KakaoDomainCollector
+
+        with StandInServer() as server:
+            # No ETag: every run is a full download of the same bytes
+            server.serve('/list.txt', SAMPLE_LIST)
+            server.serve('/mirror.txt', SAMPLE_LIST)
+            sources_file = self.write_sources([{'name': 'Sample', 'url': server.url('/list.txt')}])
+
+            first = KakaoDomainCollector(sources_file, cache_dir=self.cache_dir)
+            first.collect_from_sources()
+
+            second = KakaoDomainCollector(sources_file, cache_dir=self.cache_dir)
+            with patch.object(second, 'is_kakao_related') as classify:
+                second.collect_from_sources()
+                classify.assert_not_called()
+            self.assertEqual(second.collected_domains, first.collected_domains)
+
+            # Same bytes under another URL hit the same entry
+            mirror_file = self.write_sources([{'name': 'Mirror', 'url': server.url('/mirror.txt')}])
+            mirror = KakaoDomainCollector(mirror_file, cache_dir=self.cache_dir)
+            with patch.object(mirror, 'extract_domains_from_adblock') as extract:
+                mirror.collect_from_sources()
+                extract.assert_not_called()
+            self.assertEqual(mirror.collected_domains, first.collected_domains)
+
+            # Changed bytes are parsed again
+            server.serve('/mirror.txt', SAMPLE_LIST + '||pixel.daum.net^\n')
+            third = KakaoDomainCollector(mirror_file, cache_dir=self.cache_dir)
+            third.collect_from_sources()
+            self.assertIn('pixel.daum.net', third.collected_domains)
+
+    def test_classifier_config_change_invalidates_parse_cache(self):
+        from scripts.collect_kakao_domains import KakaoDomainCollector
+
+        with StandInServer() as server:
+            server.serve('/list.txt', SAMPLE_LIST, etag='"v1"')
+            sources_file = self.write_sources([{'name': 'Sample', 'url': server.url('/list.txt')}])
+
+            first = KakaoDomainCollector(sources_file, cache_dir=self.cache_dir)
+            first.collect_from_sources()
+            self.assertIn('ad.daum.net', first.collected_domains)
+
+            with open(sources_file, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+            # Stop treating Daum domains as Kakao properties
+            config['kakao_patterns'] = [p for p in config['kakao_patterns'] if 'daum' not in p]
+            with open(sources_file, 'w', encoding='utf-8') as f:
+                json.dump(config, f)
+
+            second = KakaoDomainCollector(sources_file, cache_dir=self.cache_dir)
+            second.collect_from_sources()
+
+        self.assertEqual(server.requests[-1][1].get('If-None-Match'), '"v1"')
+        self.assertNotIn('ad.daum.net', second.collected_domains)
+        self.assertIn('ads.kakao.com', second.collected_domains)
+
+    def test_failed_source_is_skipped(self):
+        from scripts.collect_kakao_domains import KakaoDomainCollector
+
+        with StandInServer() as server:
+            server.serve('/list.txt', SAMPLE_LIST)
+            sources_file = self.write_sources([
+                {'name': 'Missing', 'url': server.url('/missing.txt')},
+                {'name': 'Sample', 'url': server.url('/list.txt')},
+            ])
+            collector = KakaoDomainCollector(sources_file)
+            collector.collect_from_sources()
+
+        self.assertIn('track.kakaotalk.com', collector.collected_domains)
+
+
+class TestPooledHTTPClient(CollectorTestCase):
+    """Keep-alive reuse, retries with backoff, gzip and the byte limit"""
+
+    def make_fetcher(self, delays, **kwargs):
+        from scripts.http_client import PooledHTTPClient, RetryPolicy
+        from scripts.source_fetcher import SourceFetcher
+
+        client = PooledHTTPClient(retry=RetryPolicy(attempts=4, base_delay=0.5, max_delay=2.0),
+                                  sleep=delays.append, seed=1)
+        return SourceFetcher(client=client, **kwargs)
+
+    def test_sources_on_one_host_share_a_connection(self):
+        with StandInServer() as server:
+            sources = []
+            for i in range(5):
+                server.serve(f'/list{i}.txt', f'||ad{i}.daum.net^\n')
+                sources.append({'name': f'L{i}', 'url': server.url(f'/list{i}.txt')})
+            fetcher = self.make_fetcher([], max_workers=1)
+            results = fetcher.fetch_all(sources)
+            fetcher.close()
+
+        self.assertTrue(all(r.status == 'fetched' for r in results))
+        self.assertEqual(fetcher.client.connections_opened, 1)
+        self.assertEqual(server.connections, 1)
+
+    def test_transient_failures_are_retried_with_capped_backoff(self):
+        delays = []
+        with StandInServer() as server:
+            server.serve('/list.txt', SAMPLE_LIST)
+            server.fail('/list.txt', 503, 'reset', 'truncate')
+            result = self.make_fetcher(delays).fetch({'name': 'Sample', 'url': server.url('/list.txt')})
+
+        self.assertEqual(result.status, 'fetched')
+        self.assertEqual(result.text, SAMPLE_LIST)
+        self.assertEqual(len(server.requests), 4)
+        self.assertEqual(len(delays), 3)
+        for attempt, delay in enumerate(delays):
+            self.assertLessEqual(delay, min(2.0, 0.5 * 2 ** attempt))
+
+    def test_retries_give_up_and_client_errors_are_not_retried(self):
+        delays = []
+        with StandInServer() as server:
+            server.serve('/list.txt', SAMPLE_LIST)
+            server.fail('/list.txt', 503, 503, 503, 503)
+            fetcher = self.make_fetcher(delays)
+            failed = fetcher.fetch({'name': 'Sample', 'url': server.url('/list.txt')})
+            missing = fetcher.fetch({'name': 'Missing', 'url': server.url('/missing.txt')})
+
+        self.assertEqual(failed.status, 'failed')
+        self.assertIn('503', failed.error)
+        self.assertEqual(missing.status, 'failed')
+        self.assertIn('404', missing.error)
+        self.assertEqual(len(server.requests), 5)
+        self.assertEqual(len(delays), 3)
+
+    def test_partially_streamed_body_is_not_replayed(self):
+        with StandInServer() as server:
+            server.serve('/list.txt', SAMPLE_LIST)
+            server.fail('/list.txt', 'truncate')
+            seen = []
+            result = self.make_fetcher([]).fetch({'name': 'Sample', 'url': server.url('/list.txt')},
+                                                 consume=lambda result, lines: seen.extend(lines))
+
+        self.assertEqual(result.status, 'failed')
+        self.assertEqual(len(server.requests), 1)
+        self.assertTrue(seen)
+
+    def test_handler_errors_are_not_retried(self):
+        import errno
+        from scripts.http_client import PooledHTTPClient
+
+        delays = []
+        calls = []
+
+        def handler(response):
+            calls.append(response.read())
+            raise OSError(errno.ENOSPC, 'No space left on device')
+
+        with StandInServer() as server:
+            server.serve('/list.txt', SAMPLE_LIST)
+            server.fail('/list.txt', 'truncate')
+            client = PooledHTTPClient(sleep=delays.append, seed=1)
+            with self.assertRaises(OSError) as raised:
+                client.get(server.url('/list.txt'), handler)
+            client.close()
+
+        # The truncated body was retried, the failing handler was not
+        self.assertEqual(raised.exception.errno, errno.ENOSPC)
+        self.assertEqual(len(server.requests), 2)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(delays), 1)
+
+    def test_gzip_body_is_decompressed_while_streaming(self):
+        from scripts.collect_kakao_domains import KakaoDomainCollector
+
+        with StandInServer() as server:
+            server.serve('/list.txt', SAMPLE_LIST, gzipped=True)
+            sources_file = self.write_sources([{'name': 'Sample', 'url': server.url('/list.txt')}])
+            collector = KakaoDomainCollector(sources_file)
+            collector.collect_from_sources()
+            result = self.make_fetcher([]).fetch({'name': 'Sample', 'url': server.url('/list.txt')})
+
+        self.assertEqual(server.requests[0][1].get('Accept-Encoding'), 'gzip')
+        self.assertEqual(result.text, SAMPLE_LIST)
+        self.assertEqual(result.size, len(SAMPLE_LIST))
+        self.assertIn('track.kakaotalk.com', collector.collected_domains)
+
+    def test_byte_limit_applies_to_decompressed_body(self):
+        bomb = '! padding\n' * 100_000
+        with StandInServer() as server:
+            server.serve('/list.txt', SAMPLE_LIST)
+            server.serve('/bomb.txt', bomb, gzipped=True)
+            fetcher = self.make_fetcher([], max_bytes=64 * 1024)
+            small = fetcher.fetch({'name': 'Small', 'url': server.url('/list.txt'), 'max_bytes': 16})
+            large = fetcher.fetch({'name': 'Bomb', 'url': server.url('/bomb.txt')})
+            fine = fetcher.fetch({'name': 'Sample', 'url': server.url('/list.txt')})
+
+        self.assertEqual(small.status, 'failed')
+        self.assertIn('exceeds 16 bytes', small.error)
+        self.assertEqual(large.status, 'failed')
+        self.assertIn('exceeds', large.error)
+        self.assertEqual(fine.status, 'fetched')
+
+
+class TestStreamingParse(CollectorTestCase):
+    """Incremental decoding and line-by-line extraction"""
+
+    def test_iter_lines_handles_split_multibyte_characters(self):
+        from scripts.source_fetcher import iter_lines
+
+        text = "! 카카오 광고\n||ad.daum.net^\r\n마지막 줄"
+        data = text.encode('utf-8')
+        chunks = [data[i:i + 3] for i in range(0, len(data), 3)]
+
+        self.assertEqual(list(iter_lines(chunks)), text.split('\n'))
+        self.assertEqual(list(iter_lines([b'a\n', b'\n', b'b\n'])), ['a', '', 'b'])
+
+    def test_extract_accepts_string_or_lines(self):
+        from scripts.collect_kakao_domains import KakaoDomainCollector
+
+        collector = KakaoDomainCollector(self.write_sources([]))
+        from_string = collector.extract_domains_from_adblock(SAMPLE_LIST)
+        from_lines = collector.extract_domains_from_adblock(iter(SAMPLE_LIST.splitlines()))
+
+        self.assertEqual(from_string, from_lines)
+        self.assertEqual(from_string, {'ad.daum.net', 'ads.kakao.com', 'track.kakaotalk.com'})
+
+    def test_parsing_starts_before_download_finishes(self):
+        from scripts.source_fetcher import SourceFetcher
+
+        body = SAMPLE_LIST.encode('utf-8')
+        with StandInServer() as server:
+            server.serve('/list.txt', body, etag='"v1"')
+            split_at = body.index(b'||ads.kakao.com')
+            release = server.hold('/list.txt', split_at)
+
+            def consume(result, lines):
+                seen = []
+                for line in lines:
+                    if line.startswith('||ad.daum.net'):
+                        release.set()  # Only reachable if the head was parsed early
+                    seen.append(line)
+                return seen
+
+            fetcher = SourceFetcher(cache_dir=self.cache_dir)
+            result = fetcher.fetch({'name': 'Sample', 'url': server.url('/list.txt')}, consume)
+
+            self.assertTrue(server.httpd.gate_released['/list.txt'])
+            self.assertEqual(result.parsed, SAMPLE_LIST.split('\n')[:-1])
+            self.assertEqual(result.size, len(body))
+
+            # The streamed copy was written to the cache intact
+            cached = fetcher.fetch({'name': 'Sample', 'url': server.url('/list.txt')})
+            self.assertEqual(cached.status, 'not_modified')
+            self.assertEqual(cached.body, body)
+
+
+class TestAdblockExtractor(CollectorTestCase):
+    """Single-pass compiled extractor"""
+
+    def test_rule_shapes(self):
+        from scripts.collect_kakao_domains import AdblockExtractor
+
+        lines = [
+            '||ad.daum.net^',
+            '||ads.kakao.com^$third-party,script',
+            '@@||pixel.kakao.com^',
+            '|track.daum.net^',
+            'foo|banner.ad.daum.net^',
+            '! ||comment.kakao.com^',
+            '##.kakao_ad',
+            '||unrelated.example^',
+        ]
+        found = AdblockExtractor().extract(lines, lambda domain: True)
+
+        self.assertEqual(found, {
+            'ad.daum.net', 'ads.kakao.com', 'pixel.kakao.com',
+            'track.daum.net', 'banner.ad.daum.net',
+        })
+
+    def test_each_candidate_classified_once(self):
+        from scripts.collect_kakao_domains import AdblockExtractor
+
+        calls = []
+        lines = ['||ad.daum.net^', '||ad.daum.net^$image', '@@||ad.daum.net^', '|ad.daum.net^']
+        AdblockExtractor().extract(lines, lambda domain: calls.append(domain) or True)
+
+        self.assertEqual(calls, ['ad.daum.net'])
+
+    def test_matches_legacy_extractor_on_synthetic_corpus(self):
+        from scripts.benchmark import generate_adblock_corpus, legacy_extract_domains
+        from scripts.collect_kakao_domains import KakaoDomainCollector
+
+        collector = KakaoDomainCollector(self.write_sources([]))
+        corpus = generate_adblock_corpus(20_000, seed=7, kakao_ratio=0.05)
+
+        self.assertEqual(collector.extract_domains_from_adblock(corpus),
+                         legacy_extract_domains(collector, corpus))
+
+
+class TestParallelParse(CollectorTestCase):
+    """Process-pool parsing of large sources"""
+
+    def test_iter_blocks_are_newline_aligned(self):
+        from scripts.source_fetcher import iter_blocks
+
+        data = b''.join(b'||line%d.daum.net^\n' % i for i in range(1000))
+        chunks = [data[i:i + 333] for i in range(0, len(data), 333)]
+        blocks = list(iter_blocks(chunks, 1024))
+
+        self.assertGreater(len(blocks), 10)
+        self.assertEqual(b''.join(blocks), data)
+        self.assertTrue(all(block.endswith(b'\n') for block in blocks))
+
+    def test_process_pool_matches_in_process_parse(self):
+        from scripts.benchmark import generate_adblock_corpus
+        from scripts.collect_kakao_domains import KakaoDomainCollector
+
+        with StandInServer() as server:
+            server.serve('/big.txt', generate_adblock_corpus(30_000, seed=11, kakao_ratio=0.05))
+            server.serve('/small.txt', SAMPLE_LIST)
+            sources_file = self.write_sources([
+                {'name': 'Big', 'url': server.url('/big.txt')},
+                {'name': 'Small', 'url': server.url('/small.txt')},
+            ])
+
+            serial = KakaoDomainCollector(sources_file)
+            serial.collect_from_sources()
+            parallel = KakaoDomainCollector(sources_file, cache_dir=self.cache_dir,
+                                            parse_workers=2, parse_block_size=16 * 1024)
+            parallel.collect_from_sources()
+
+        self.assertGreater(len(serial.collected_domains), 50)
+        self.assertEqual(parallel.collected_domains, serial.collected_domains)
+
+
+class TestDomainClassifier(CollectorTestCase):
+    """Precompiled, memoized classifier"""
+
+    def make_classifier(self, **kwargs):
+        from scripts.collect_kakao_domains import KakaoDomainCollector
+        from scripts.domain_classifier import DomainClassifier
+
+        collector = KakaoDomainCollector('scripts/sources.json')
+        return DomainClassifier.from_config(collector.sources, collector.whitelist_domains, **kwargs)
+
+    def test_verdicts_and_reasons(self):
+        from scripts import domain_classifier as dc
+
+        classifier = self.make_classifier()
+        cases = {
+            'ad.daum.net': (True, dc.AD_KEYWORD),
+            'display.ad.daum.net': (True, dc.AD_KEYWORD),
+            'ADS.Kakao.com': (True, dc.AD_KEYWORD),
+            'accounts.kakao.com': (False, dc.WHITELISTED),
+            'map.kakao.com': (False, dc.WHITELISTED),
+            'photo.kakao.com': (False, dc.NO_AD_INDICATOR),
+            'ad.example.com': (False, dc.NOT_KAKAO),
+            'ad.kakao.com.evil.net': (False, dc.NOT_KAKAO),
+            'ad.notdaum.net': (False, dc.NOT_KAKAO),
+            '.ad.daum.net': (False, dc.INVALID),
+            'ad_daum.net': (False, dc.INVALID),
+            '': (False, dc.INVALID),
+        }
+        for domain, (is_ad, reason) in cases.items():
+            verdict = classifier.classify(domain)
+            self.assertEqual((verdict.is_ad, verdict.reason), (is_ad, reason), domain)
+
+        verdict = classifier.classify('display.ad.daum.net')
+        self.assertEqual(verdict.base_domain, 'daum.net')
+        self.assertIn('display\\.ad\\.', verdict.matched)
+        self.assertIn('ad\\.', verdict.matched)
+
+    def test_regex_patterns_and_fallback(self):
+        from scripts import domain_classifier as dc
+        from scripts.domain_classifier import DomainClassifier
+
+        classifier = DomainClassifier([r'daum\.net', r'kakao[0-9]+\.com'], [r'^banner\.'], whitelist=[])
+
+        self.assertEqual(classifier.classify('banner.kakao2.com').reason, dc.AD_KEYWORD)
+        verdict = classifier.classify('x.dmp.daum.net')
+        self.assertEqual((verdict.is_ad, verdict.reason, verdict.matched),
+                         (True, dc.SIMPLE_PATTERN, ('dmp.',)))
+
+    def test_verdicts_are_memoized_and_bounded(self):
+        classifier = self.make_classifier(memo_size=2)
+
+        for domain in ['ad.daum.net', 'ad.daum.net', 'ads.kakao.com', 'track.daum.net']:
+            classifier.classify(domain)
+
+        info = classifier.cache_info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (1, 3, 2))
+
+    def test_matches_legacy_classifier(self):
+        from scripts.benchmark import generate_candidate_domains, legacy_is_kakao_related
+        from scripts.collect_kakao_domains import KakaoDomainCollector
+
+        collector = KakaoDomainCollector('scripts/sources.json')
+        candidates = generate_candidate_domains(5_000, seed=3) + sorted(collector.whitelist_domains)
+        with patch('builtins.print'):
+            expected = [legacy_is_kakao_related(collector.sources, collector.whitelist_domains, d)
+                        for d in candidates]
+
+        self.assertEqual([collector.is_kakao_related(d) for d in candidates], expected)
+
+
+class TestDNSLivenessCache(CollectorTestCase):
+    """Persistent liveness cache used by validate_domains()"""
+
+    LIVE = {'ad.daum.net': '10.0.0.1', 'ads.kakao.com': '10.0.0.2'}
+
+    def fake_gethostbyname(self, domain):
+        self.lookups.append(domain)
+        if domain in self.LIVE:
+            return self.LIVE[domain]
+        if domain == 'flaky.kakao.com':
+            raise socket.gaierror(socket.EAI_AGAIN, 'Temporary failure in name resolution')
+        raise socket.gaierror(socket.EAI_NONAME, 'Name or service not known')
+
+    def run_validation(self, domains, **kwargs):
+        from scripts.collect_kakao_domains import KakaoDomainCollector
+
+        collector = KakaoDomainCollector(self.write_sources([]), cache_dir=self.cache_dir, **kwargs)
+        collector.collected_domains = set(domains)
+        with patch('socket.gethostbyname', side_effect=self.fake_gethostbyname):
+            collector.validate_domains()
+        collector.dns_cache.close()
+        return collector
+
+    def setUp(self):
+        super().setUp()
+        self.lookups = []
+
+    def test_second_run_only_resolves_new_domains(self):
+        domains = {'ad.daum.net', 'ads.kakao.com', 'gone.ad.daum.net'}
+        first = self.run_validation(domains)
+        self.assertEqual(sorted(self.lookups), sorted(domains))
+        self.assertEqual(first.validated_domains, {'ad.daum.net', 'ads.kakao.com'})
+        self.assertEqual(first.nxdomain_domains, {'gone.ad.daum.net'})
+
+        self.lookups.clear()
+        second = self.run_validation(domains | {'track.daum.net'})
+        self.assertEqual(self.lookups, ['track.daum.net'])
+        self.assertEqual(second.validated_domains, first.validated_domains)
+        self.assertEqual(second.nxdomain_domains, {'gone.ad.daum.net', 'track.daum.net'})
+
+    def test_separate_positive_and_negative_ttls(self):
+        domains = {'ad.daum.net', 'gone.ad.daum.net'}
+        self.run_validation(domains, dns_positive_ttl=3600, dns_negative_ttl=0)
+
+        self.lookups.clear()
+        self.run_validation(domains, dns_positive_ttl=3600, dns_negative_ttl=0)
+        self.assertEqual(self.lookups, ['gone.ad.daum.net'])
+
+    def test_transient_failures_are_not_cached(self):
+        first = self.run_validation({'flaky.kakao.com'})
+        self.assertIn('flaky.kakao.com', first.nxdomain_domains)
+
+        self.lookups.clear()
+        self.run_validation({'flaky.kakao.com'})
+        self.assertEqual(self.lookups, ['flaky.kakao.com'])
+
+    def test_expiry(self):
+        from scripts.dns_cache import DNSLivenessCache
+
+        cache = DNSLivenessCache(os.path.join(self.cache_dir, 'dns.sqlite3'),
+                                 positive_ttl=100, negative_ttl=10)
+        now = time.time()
+        cache.put_many([('a.daum.net', True, '10.0.0.1'), ('b.daum.net', False, None)], checked_at=now)
+
+        self.assertEqual(cache.get_many(['a.daum.net', 'b.daum.net', 'c.daum.net'], now=now + 5),
+                         {'a.daum.net': (True, '10.0.0.1'), 'b.daum.net': (False, None)})
+        self.assertEqual(cache.get_many(['a.daum.net', 'b.daum.net'], now=now + 50),
+                         {'a.daum.net': (True, '10.0.0.1')})
+        self.assertEqual(cache.purge_expired(now=now + 200), 2)
+        cache.close()
+
+
+class TestAsyncDNSResolver(CollectorTestCase):
+    """asyncio resolution engine against a local stand-in DNS server"""
+
+    ZONE = {
+        'ad.daum.net': {'A': ['10.0.0.1']},
+        'v6.ad.daum.net': {'AAAA': ['2001:db8::1']},
+        'nodata.kakao.com': {'MX': ['10 mail.kakao.com.']},
+        'ads.kakao.com': {'A': ['10.0.0.2'], 'AAAA': ['2001:db8::2']},
+    }
+
+    def make_resolver(self, server, **kwargs):
+        from scripts.async_resolver import AsyncDNSResolver
+
+        kwargs.setdefault('timeout', 0.3)
+        return AsyncDNSResolver(nameservers=['127.0.0.1'], port=server.port, **kwargs)
+
+    def test_status_split(self):
+        from scripts import async_resolver as ar
+        from dns_standin import StandInDNSServer
+
+        with StandInDNSServer(self.ZONE) as server:
+            server.drop.add('slow.kakao.com')
+            server.servfail.add('broken.kakao.com')
+            results = self.make_resolver(server, attempts=2).resolve_all([
+                'ad.daum.net', 'v6.ad.daum.net', 'ads.kakao.com', 'gone.daum.net',
+                'nodata.kakao.com', 'slow.kakao.com', 'broken.kakao.com',
+            ])
+
+        self.assertEqual({d: r.status for d, r in results.items()}, {
+            'ad.daum.net': ar.ACTIVE,
+            'v6.ad.daum.net': ar.ACTIVE,
+            'ads.kakao.com': ar.ACTIVE,
+            'gone.daum.net': ar.NXDOMAIN,
+            'nodata.kakao.com': ar.NODATA,
+            'slow.kakao.com': ar.TIMEOUT,
+            'broken.kakao.com': ar.ERROR,
+        })
+        self.assertEqual(sorted(results['ads.kakao.com'].addresses), ['10.0.0.2', '2001:db8::2'])
+        self.assertEqual(results['v6.ad.daum.net'].addresses, ['2001:db8::1'])
+        self.assertEqual(results['slow.kakao.com'].attempts, 2)
+        self.assertEqual(results['ad.daum.net'].attempts, 1)
+        self.assertFalse(results['slow.kakao.com'].definitive)
+        self.assertTrue(results['nodata.kakao.com'].definitive)
+
+    def test_failures_without_a_message_keep_the_batch_going(self):
+        from scripts import async_resolver as ar
+        from dns_standin import StandInDNSServer
+
+        async def failing_query(domain, rdtype, nameserver, semaphore):
+            return ar.ERROR, [], ''
+
+        with StandInDNSServer(self.ZONE) as server:
+            resolver = self.make_resolver(server)
+            resolver._query = failing_query
+            results = resolver.resolve_all(['ad.daum.net', 'ads.kakao.com'])
+
+        self.assertEqual({r.status for r in results.values()}, {ar.ERROR})
+        self.assertEqual(results['ad.daum.net'].error, 'lookup failed')
+
+    def test_many_queries_in_flight(self):
+        from dns_standin import StandInDNSServer
+
+        domains = [f'ad{i}.daum.net' for i in range(200)]
+        with StandInDNSServer({d: {'A': ['10.0.0.1']} for d in domains}) as server:
+            for domain in domains:
+                server.delays[domain] = 0.2
+            resolver = self.make_resolver(server, concurrency=400, timeout=2.0)
+            start = time.perf_counter()
+            results = resolver.resolve_all(domains)
+            elapsed = time.perf_counter() - start
+
+        self.assertTrue(all(r.exists for r in results.values()))
+        self.assertGreaterEqual(resolver.queries_sent, 400)
+        # 400 queries at 200ms each would take 80s one at a time
+        self.assertLess(elapsed, 5)
+
+    def test_collector_async_engine(self):
+        from scripts.collect_kakao_domains import KakaoDomainCollector
+        from dns_standin import StandInDNSServer
+
+        with StandInDNSServer(self.ZONE) as server:
+            server.drop.add('slow.kakao.com')
+            collector = KakaoDomainCollector(
+                self.write_sources([]), cache_dir=self.cache_dir, dns_engine='async',
+                nameservers=['127.0.0.1'], dns_port=server.port, dns_timeout=0.3)
+            collector.collected_domains = {
+                'ad.daum.net', 'v6.ad.daum.net', 'gone.daum.net', 'nodata.kakao.com', 'slow.kakao.com'
+            }
+            collector.validate_domains()
+
+            self.assertEqual(collector.validated_domains, {'ad.daum.net', 'v6.ad.daum.net'})
+            self.assertEqual(collector.nxdomain_domains,
+                             {'gone.daum.net', 'nodata.kakao.com', 'slow.kakao.com'})
+            # Definitive answers are cached; the timeout is not
+            cached = collector.dns_cache.get_many(sorted(collector.collected_domains))
+            self.assertEqual(set(cached), collector.collected_domains - {'slow.kakao.com'})
+            collector.dns_cache.close()
+
+
+class TestDNSAnswerCache(CollectorTestCase):
+    """TTL-aware per-record answer cache shared by the validator and the collector"""
+
+    ZONE = {
+        'ads.kakao.com': {'A': ['10.0.0.2']},
+        'alias.daum.net': {'CNAME': ['ads.kakao.com.']},
+    }
+
+    def test_entries_expire_with_their_ttl(self):
+        from scripts.dns_cache import DNSAnswerCache
+
+        path = os.path.join(self.cache_dir, 'answers.sqlite3')
+        cache = DNSAnswerCache(path, max_ttl=3600)
+        cache.put('Ads.Kakao.com.', 'a', 'positive', ['10.0.0.2'], 300, now=1000)
+        cache.put('gone.daum.net', 'A', 'nxdomain', [], 60, now=1000)
+        cache.put('long.daum.net', 'A', 'positive', ['10.0.0.3'], 10 ** 6, now=1000)
+        cache.put('zero.daum.net', 'A', 'positive', ['10.0.0.4'], 0, now=1000)
+        cache.close()
+
+        cache = DNSAnswerCache(path, max_ttl=3600)
+        self.assertEqual(cache.get('ads.kakao.com', 'A', now=1299), ('positive', ['10.0.0.2']))
+        self.assertIsNone(cache.get('ads.kakao.com', 'A', now=1300))
+        self.assertEqual(cache.get('gone.daum.net', 'A', now=1059), ('nxdomain', []))
+        self.assertIsNone(cache.get('gone.daum.net', 'A', now=1060))
+        self.assertIsNone(cache.get('long.daum.net', 'A', now=1000 + 3600))
+        self.assertIsNone(cache.get('zero.daum.net', 'A', now=1000))
+        self.assertEqual(cache.purge_expired(now=1300), 2)
+        cache.close()
+
+    def test_validator_repeat_run_sends_no_queries(self):
+        from dns_standin import StandInDNSServer
+        from scripts.dns_cache import DNSAnswerCache
+        from scripts.validate_domains import DomainValidator
+
+        path = os.path.join(self.cache_dir, 'answers.sqlite3')
+        domains = ['ads.kakao.com', 'alias.daum.net', 'gone.daum.net']
+
+        def run(server, engine):
+            cache = DNSAnswerCache(path)
+            validator = DomainValidator(timeout=1.0, nameservers=['127.0.0.1'], port=server.port,
+                                        engine=engine, cache=cache)
+            results = validator.validate_domains_batch(domains)
+            cache.close()
+            return {d: r['status'] for d, r in results.items()}
+
+        with StandInDNSServer(self.ZONE, negative_ttl=60) as server:
+            first = run(server, 'threads')
+            # Lookups abandoned once NXDOMAIN settled a name may still be arriving
+            time.sleep(0.3)
+            sent = server.query_count()
+            self.assertEqual(run(server, 'threads'), first)
+            self.assertEqual(run(server, 'async'), first)
+            self.assertEqual(server.query_count(), sent)
+
+        self.assertEqual(first, {'ads.kakao.com': 'active', 'alias.daum.net': 'redirected',
+                                 'gone.daum.net': 'not_found'})
+        # Negative answers live for the SOA minimum, not the record TTL
+        cache = DNSAnswerCache(path)
+        self.assertIsNotNone(cache.get('gone.daum.net', 'A', now=time.time() + 50))
+        self.assertIsNone(cache.get('gone.daum.net', 'A', now=time.time() + 61))
+        self.assertIsNotNone(cache.get('ads.kakao.com', 'A', now=time.time() + 250))
+        cache.close()
+
+    def test_negative_answer_without_soa_is_not_cached(self):
+        from dns_standin import StandInDNSServer
+        from scripts.dns_cache import DNSAnswerCache
+        from scripts.validate_domains import DomainValidator
+
+        cache = DNSAnswerCache(os.path.join(self.cache_dir, 'answers.sqlite3'))
+        with StandInDNSServer(self.ZONE) as server:
+            validator = DomainValidator(timeout=1.0, nameservers=['127.0.0.1'], port=server.port,
+                                        record_types=['A'], cache=cache)
+            validator.validate_single_domain('gone.daum.net')
+            validator.validate_single_domain('gone.daum.net')
+            self.assertEqual(server.query_count('gone.daum.net'), 2)
+        cache.close()
+
+    def test_collector_async_engine_uses_answer_cache(self):
+        from scripts.collect_kakao_domains import KakaoDomainCollector
+        from dns_standin import StandInDNSServer
+
+        def run(server):
+            # Zero liveness TTLs: every run goes past the liveness cache to the resolver
+            collector = KakaoDomainCollector(
+                self.write_sources([]), cache_dir=self.cache_dir, dns_engine='async',
+                nameservers=['127.0.0.1'], dns_port=server.port, dns_timeout=0.5,
+                dns_positive_ttl=0, dns_negative_ttl=0)
+            collector.collected_domains = {'ads.kakao.com', 'gone.daum.net'}
+            collector.validate_domains()
+            collector.dns_cache.close()
+            collector.answer_cache.close()
+            return collector
+
+        with StandInDNSServer(self.ZONE, negative_ttl=60) as server:
+            first = run(server)
+            sent = server.query_count()
+            second = run(server)
+            self.assertEqual(server.query_count(), sent)
+
+        self.assertEqual(first.validated_domains, {'ads.kakao.com'})
+        self.assertEqual(second.validated_domains, {'ads.kakao.com'})
+        self.assertEqual(second.nxdomain_domains, {'gone.daum.net'})
+
+
+class TestDiffUpdates(CollectorTestCase):
+    """AdGuard Diff-Path patches for the published filter"""
+
+    def filter_version(self, domains, stamp):
+        header = ['! Title: Test filter', f'! Last modified: {stamp}', '! Expires: 6 hours', '!']
+        return '\n'.join(header + [f'||{d}^' for d in domains] + ['! === End of Filter ==='])
+
+    def test_rcs_diff_round_trip(self):
+        import random
+        from scripts.diff_updates import apply_rcs_patch, rcs_diff
+
+        rng = random.Random(7)
+        old = [f'||ad{i}.daum.net^' for i in range(200)]
+        for _ in range(50):
+            new = list(old)
+            for _ in range(rng.randrange(1, 10)):
+                op = rng.randrange(3)
+                index = rng.randrange(len(new) + 1)
+                if op == 0:
+                    new.insert(index, f'||new{rng.randrange(10**6)}.kakao.com^')
+                elif new and op == 1:
+                    del new[min(index, len(new) - 1)]
+                elif new:
+                    new[min(index, len(new) - 1)] = ''
+            patch = rcs_diff(old, new)
+            self.assertEqual(apply_rcs_patch(old, patch), new)
+            old = new
+
+        self.assertEqual(rcs_diff(['a', 'b', 'c'], ['a', 'x', 'c', 'd']),
+                         ['d2 1', 'a2 1', 'x', 'a3 1', 'd'])
+
+    def test_publish_writes_patch_chain(self):
+        from scripts.diff_updates import DiffUpdatePublisher, read_diff_path, verify_patch_chain
+
+        filter_path = os.path.join(self.tmpdir, 'kakao-adblock-filter.txt')
+        publisher = DiffUpdatePublisher(filter_path, os.path.join(self.tmpdir, 'patches'))
+        now = time.time()
+        versions = [
+            self.filter_version(['ad.daum.net', 'ads.kakao.com'], 'v1'),
+            self.filter_version(['ad.daum.net', 'ads.kakao.com', 'pixel.daum.net'], 'v2'),
+            self.filter_version(['ads.kakao.com', 'pixel.daum.net'], 'v3'),
+        ]
+
+        first = publisher.publish(versions[0], now)
+        self.assertTrue(first.changed)
+        self.assertIsNone(first.patch_path)
+        with open(filter_path, 'rb') as f:
+            published = f.read().decode('utf-8')
+        self.assertEqual(read_diff_path(published), first.diff_path)
+        self.assertTrue(first.diff_path.startswith('patches/kakao-adblock-filter/kakao-adblock-filter-m-'))
+        self.assertIn('! Expires: 6 hours\n! Diff-Path: ', published)
+
+        # Same minute: the next patch still gets its own name
+        second = publisher.publish(versions[1], now)
+        third = publisher.publish(versions[2], now + 3600)
+        self.assertNotEqual(second.diff_path, first.diff_path)
+        self.assertEqual(second.patch_path, Path(self.tmpdir) / first.diff_path)
+        self.assertEqual(third.patch_path, Path(self.tmpdir) / second.diff_path)
+        self.assertFalse((Path(self.tmpdir) / third.diff_path).exists())
+
+        # Every retained version reaches the published file byte for byte
+        snapshots = publisher.snapshots()
+        self.assertEqual(len(snapshots), 3)
+        for snapshot, expected_patches in zip(snapshots, (2, 1, 0)):
+            ok, applied, message = verify_patch_chain(filter_path, snapshot.read_bytes().decode('utf-8'))
+            self.assertTrue(ok, message)
+            self.assertEqual(applied, expected_patches)
+
+        # A version whose content did not change is not republished
+        unchanged = publisher.publish(versions[2], now + 7200)
+        self.assertFalse(unchanged.changed)
+        self.assertEqual(unchanged.diff_path, third.diff_path)
+
+    def test_prune_ages_files_by_their_name_not_their_mtime(self):
+        from scripts.diff_updates import DiffUpdatePublisher
+
+        filter_path = os.path.join(self.tmpdir, 'filter.txt')
+        publisher = DiffUpdatePublisher(filter_path, os.path.join(self.tmpdir, 'patches'), expiration=60)
+        now = time.time()
+        publisher.publish(self.filter_version(['ad.daum.net'], 'v1'), now - 7200)
+        publisher.publish(self.filter_version(['ad.daum.net', 'ads.kakao.com'], 'v2'), now - 7140)
+        old_files = [path for path in publisher.patches_dir.rglob('*') if path.is_file()]
+        self.assertEqual(len(old_files), 3)  # Two versions and the patch between them
+        for path in old_files:
+            os.utime(path)  # As after a fresh checkout
+
+        result = publisher.publish(self.filter_version(['ads.kakao.com'], 'v3'), now)
+
+        # The patch from v2 to v3 is named after v2, so it expires with v2
+        self.assertEqual(result.pruned, 4)
+        self.assertEqual(len(publisher.snapshots()), 1)
+        self.assertEqual(list(publisher.patches_dir.glob('*.patch')), [])
+
+    def test_verifier_detects_corrupted_patch(self):
+        from scripts.diff_updates import DiffUpdatePublisher, verify_patch_chain
+
+        filter_path = os.path.join(self.tmpdir, 'filter.txt')
+        publisher = DiffUpdatePublisher(filter_path, os.path.join(self.tmpdir, 'patches'))
+        now = time.time()
+        publisher.publish(self.filter_version(['ad.daum.net'], 'v1'), now)
+        second = publisher.publish(self.filter_version(['ad.daum.net', 'ads.kakao.com'], 'v2'), now + 60)
+
+        with open(second.patch_path, 'a', encoding='utf-8') as f:
+            f.write('a1 1\n||extra.daum.net^\n')
+        base = publisher.snapshots()[0].read_bytes().decode('utf-8')
+        ok, _, message = verify_patch_chain(filter_path, base)
+        self.assertFalse(ok, message)
+
+    def test_collector_publishes_diff_updates(self):
+        from scripts.collect_kakao_domains import KakaoDomainCollector
+        from scripts.diff_updates import read_diff_path
+
+        collector = KakaoDomainCollector(self.write_sources([]))
+        collector.validated_domains = {'ad.daum.net', 'ads.kakao.com'}
+        output_file = os.path.join(self.tmpdir, 'kakao-adblock-filter.txt')
+        patches_dir = os.path.join(self.tmpdir, 'patches')
+
+        self.assertTrue(collector.save_filter(output_file, patches_dir=patches_dir))
+        with open(output_file, 'r', encoding='utf-8') as f:
+            content = f.read()
+        self.assertIsNotNone(read_diff_path(content))
+        self.assertIn('||ads.kakao.com^', content)
+
+
+class TestFilterEmitters(CollectorTestCase):
+    """One-pass output of the validated domains in every configured format"""
+
+    DOMAINS = {'ad.daum.net', 'ads.kakao.com', 'kakao.ad.daum.net', 'ad.melon.com'}
+
+    def model(self):
+        from datetime import datetime
+        from scripts.filter_emitters import build_model
+
+        return build_model(self.DOMAINS, datetime(2026, 1, 2, 3, 4, 5))
+
+    def rules(self, text, comment):
+        return [line for line in text.split('\n') if line and not line.startswith(comment)]
+
+    def test_rule_syntax_per_format(self):
+        from scripts.filter_emitters import render
+
+        model = self.model()
+        # Every domain is listed once, Kakao section first
+        self.assertEqual([d for _, domains in model.sections for d in domains],
+                         ['ads.kakao.com', 'kakao.ad.daum.net', 'ad.daum.net', 'ad.melon.com'])
+
+        hosts = render(model, 'hosts')
+        self.assertEqual(self.rules(hosts, '#'), [
+            '0.0.0.0 ads.kakao.com', '0.0.0.0 kakao.ad.daum.net', '0.0.0.0 ad.daum.net', '0.0.0.0 ad.melon.com'])
+        self.assertTrue(hosts.endswith('0.0.0.0 ad.melon.com\n'))
+        self.assertIn('address=/ad.daum.net/', self.rules(render(model, 'dnsmasq'), '#'))
+        self.assertEqual(self.rules(render(model, 'unbound'), '#')[:2],
+                         ['server:', '    local-zone: "ads.kakao.com." always_nxdomain'])
+        self.assertEqual(self.rules(render(model, 'plain'), '#'),
+                         ['ads.kakao.com', 'kakao.ad.daum.net', 'ad.daum.net', 'ad.melon.com'])
+
+        rpz = self.rules(render(model, 'rpz'), ';')
+        self.assertEqual(rpz[:3], ['$TTL 300', '@ IN SOA localhost. root.localhost. 1767323045 3600 600 86400 300',
+                                   '  IN NS localhost.'])
+        self.assertIn('ad.daum.net CNAME .', rpz)
+        self.assertIn('*.ad.daum.net CNAME .', rpz)
+
+        adguard = render(model, 'adguard_dns')
+        self.assertTrue(adguard.startswith('! Title: Kakao AdBlock Filter (Auto-Generated)\n'))
+        self.assertTrue(adguard.endswith('!\n! === End of Filter ==='))
+        self.assertEqual(self.rules(adguard, '!'),
+                         ['||ads.kakao.com^', '||kakao.ad.daum.net^', '||ad.daum.net^', '||ad.melon.com^'])
+
+        with self.assertRaises(ValueError):
+            render(model, 'squid')
+
+    def test_collector_writes_configured_outputs(self):
+        from scripts.collect_kakao_domains import KakaoDomainCollector
+
+        collector = KakaoDomainCollector(self.write_sources([]))
+        collector.validated_domains = set(self.DOMAINS)
+        output_file = os.path.join(self.tmpdir, 'kakao-adblock-filter.txt')
+
+        self.assertTrue(collector.save_filter(output_file))
+
+        with open(output_file, 'r', encoding='utf-8') as f:
+            content = f.read()
+        self.assertEqual(content, collector.generate_adguard_filter())
+        # The published filter lists every validated rule unless minimize_subdomains is set
+        self.assertIn('||kakao.ad.daum.net^', content)
+        for output in collector.sources['output_format']['outputs']:
+            path = os.path.join(self.tmpdir, output['path'])
+            self.assertTrue(os.path.exists(path), path)
+        with open(os.path.join(self.tmpdir, 'formats', 'kakao-adblock-hosts.txt'), 'r', encoding='utf-8') as f:
+            hosts = f.read()
+        self.assertIn('0.0.0.0 ads.kakao.com\n', hosts)
+        self.assertIn('0.0.0.0 kakao.ad.daum.net\n', hosts)
+        self.assertEqual([name for name in os.listdir(os.path.join(self.tmpdir, 'formats'))
+                          if name.startswith('.tmp-')], [])
+
+    def test_rules_covered_by_a_blocked_parent_are_dropped(self):
+        from datetime import datetime
+        from scripts.filter_emitters import build_model, render
+
+        model = build_model(self.DOMAINS, datetime(2026, 1, 2, 3, 4, 5), minimize=True)
+
+        self.assertEqual(model.covered, {'kakao.ad.daum.net': 'ad.daum.net'})
+        self.assertEqual(model.rule_count, 3)
+        self.assertNotIn('||kakao.ad.daum.net^', render(model, 'adguard_dns'))
+        self.assertNotIn('address=/kakao.ad.daum.net/', render(model, 'dnsmasq'))
+        self.assertNotIn('kakao.ad.daum.net CNAME .', render(model, 'rpz'))
+        # Exact-match formats still need the name itself
+        self.assertIn('0.0.0.0 kakao.ad.daum.net', render(model, 'hosts'))
+        self.assertIn('kakao.ad.daum.net', render(model, 'plain'))
+
+    def test_parent_with_protected_child_is_not_collapsed(self):
+        from scripts.domain_trie import DomainTrie
+
+        trie = DomainTrie(
+            ['ad.daum.net', 'banner.ad.daum.net', 'x.banner.ad.daum.net', 'ads.kakao.com'],
+            protected=['help.ad.daum.net', 'kakao.com'],
+        )
+        # ad.daum.net has a protected child, so its descendants keep their rules;
+        # banner.ad.daum.net has none and still covers its own subtree
+        self.assertEqual(trie.covered(), {'x.banner.ad.daum.net': 'banner.ad.daum.net'})
+        self.assertEqual(trie.minimal(), ['ad.daum.net', 'ads.kakao.com', 'banner.ad.daum.net'])
+
+    def test_failed_emit_keeps_previous_outputs(self):
+        from scripts.filter_emitters import HostsEmitter, emit_files
+
+        hosts_path = os.path.join(self.tmpdir, 'hosts.txt')
+        plain_path = os.path.join(self.tmpdir, 'plain.txt')
+        for path in (hosts_path, plain_path):
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write('previous\n')
+
+        with patch.object(HostsEmitter, 'rule', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                emit_files(self.model(), [('plain', plain_path), ('hosts', hosts_path)])
+
+        for path in (hosts_path, plain_path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.assertEqual(f.read(), 'previous\n')
+        self.assertEqual(sorted(os.listdir(self.tmpdir)), ['hosts.txt', 'plain.txt'])
+
+
+class TestBuildProfiles(CollectorTestCase):
+    """Several filter variants written from one collection run"""
+
+    PROFILES = [
+        {'name': 'daum-hosts', 'path': 'variants/daum.hosts', 'type': 'hosts', 'services': ['daum.net']},
+        {'name': 'unvalidated', 'path': 'variants/unvalidated.txt', 'domains': 'collected',
+         'title': 'Unvalidated Variant', 'group_by_service': False},
+        {'name': 'strict', 'path': 'variants/strict.txt', 'reasons': ['ad_keyword'],
+         'exclude': ['ad.daum.net'], 'outputs': [{'type': 'plain', 'path': 'variants/strict-domains.txt'}]},
+    ]
+
+    def make_collector(self, profiles):
+        from scripts.collect_kakao_domains import KakaoDomainCollector
+
+        sources_file = self.write_sources([])
+        with open(sources_file, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        config['profiles'] = profiles
+        with open(sources_file, 'w', encoding='utf-8') as f:
+            json.dump(config, f)
+        return KakaoDomainCollector(sources_file)
+
+    def read(self, relative):
+        with open(os.path.join(self.tmpdir, relative), 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def test_profiles_are_written_from_shared_results(self):
+        collector = self.make_collector(self.PROFILES)
+        collector.collected_domains = {'ad.daum.net', 'kakao.ad.daum.net', 'ads.kakao.com',
+                                       'ad.melon.com', 'gone.kakao.com'}
+        collector.validated_domains = collector.collected_domains - {'gone.kakao.com'}
+        output_file = os.path.join(self.tmpdir, 'kakao-adblock-filter.txt')
+
+        with patch.object(collector.fetcher, 'fetch_all') as fetch_all, \
+                patch.object(collector, 'validate_domains') as validate:
+            written = collector.save_profiles(output_file)
+            fetch_all.assert_not_called()
+            validate.assert_not_called()
+
+        self.assertEqual(len(written), 4)
+        daum = self.read('variants/daum.hosts')
+        self.assertIn('0.0.0.0 ad.daum.net', daum)
+        self.assertIn('0.0.0.0 kakao.ad.daum.net', daum)
+        self.assertNotIn('kakao.com', daum.replace('kakao.ad.daum.net', ''))
+
+        unvalidated = self.read('variants/unvalidated.txt')
+        self.assertTrue(unvalidated.startswith('! Title: Unvalidated Variant\n'))
+        self.assertIn('||gone.kakao.com^', unvalidated)
+        self.assertIn('=== Kakao/Daum Ad Domains ===', unvalidated)
+
+        strict = self.read('variants/strict-domains.txt').split()
+        self.assertIn('ads.kakao.com', strict)
+        self.assertNotIn('ad.melon.com', strict)  # Not classified by an ad keyword
+        self.assertNotIn('kakao.ad.daum.net', strict)  # Excluded with its parent
+        self.assertNotIn('||ad.daum.net^', self.read('variants/strict.txt'))
+
+    def test_unchanged_rules_keep_every_output_byte_identical(self):
+        from datetime import datetime
+
+        output_file = os.path.join(self.tmpdir, 'kakao-adblock-filter.txt')
+
+        def run(domains, nxdomains, now):
+            collector = self.make_collector(self.PROFILES)
+            collector.sources['output_format'] = {'outputs': [{'type': 'rpz', 'path': 'formats/kakao.rpz'}]}
+            collector.collected_domains = set(domains)
+            collector.validated_domains = set(domains)
+            collector.nxdomain_domains = set(nxdomains)
+            with patch('scripts.collect_kakao_domains.datetime') as clock:
+                clock.utcnow.return_value = now
+                self.assertTrue(collector.save_filter(output_file))
+                written = collector.save_profiles(output_file) + [output_file,
+                                                                  os.path.join(self.tmpdir, 'formats/kakao.rpz')]
+            return {path: Path(path).read_bytes() for path in written}
+
+        domains = {'ad.daum.net', 'ads.kakao.com', 'ad.melon.com'}
+        first = run(domains, set(), datetime(2025, 1, 1, 0, 0, 0))
+        # Same rules an hour later, with other run statistics: nothing changes
+        self.assertEqual(run(domains, {'gone.daum.net'}, datetime(2025, 1, 1, 1, 0, 0)), first)
+
+        changed = run(domains | {'pixel.daum.net'}, {'gone.daum.net'}, datetime(2025, 1, 1, 2, 0, 0))
+        self.assertIn(b'Last modified: 2025-01-01 02:00:00 UTC', changed[output_file])
+        self.assertIn(b'! Domains removed as NXDOMAIN: 1', changed[output_file])
+
+    def test_invalid_profiles_are_rejected_up_front(self):
+        with self.assertRaises(ValueError):
+            self.make_collector([{'name': 'broken', 'path': 'x.txt', 'domains': 'everything'}])
+        with self.assertRaises(ValueError):
+            self.make_collector([{'name': 'squid', 'path': 'x.txt', 'type': 'squid'}])
+        with self.assertRaises(ValueError):
+            self.make_collector([{'name': 'twice', 'path': 'a.txt'}, {'name': 'twice', 'path': 'b.txt'}])
+
+
+class TestInstrumentation(CollectorTestCase):
+    """Per-stage/per-source run report and the parse profile"""
+
+    def test_run_report_counts_work_per_stage_and_source(self):
+        from scripts.collect_kakao_domains import KakaoDomainCollector
+
+        with StandInServer() as server:
+            server.serve('/list.txt', SAMPLE_LIST)
+            sources_file = self.write_sources([
+                {'name': 'Sample', 'url': server.url('/list.txt')},
+                {'name': 'Missing', 'url': server.url('/missing.txt')},
+            ])
+            collector = KakaoDomainCollector(sources_file)
+            report = collector.report
+            with report.stage('collect_sources'):
+                collector.collect_from_sources()
+            with patch('socket.gethostbyname', return_value='10.0.0.1'):
+                with report.stage('dns_validation'):
+                    collector.validate_domains()
+
+        report_path = os.path.join(self.tmpdir, 'run-report.json')
+        report.write(report_path)
+        with open(report_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        collect, dns = data['stages']
+        self.assertEqual(collect['name'], 'collect_sources')
+        self.assertEqual(collect['counters']['bytes_fetched'], len(SAMPLE_LIST))
+        self.assertEqual(collect['counters']['lines_parsed'], SAMPLE_LIST.count('\n'))
+        self.assertEqual(collect['counters']['candidates_classified'], 4)
+        self.assertEqual(collect['counters']['domains_found'], 3)
+        self.assertEqual(dns['counters']['dns_queries'], 3)
+        self.assertGreater(collect['wall_seconds'], 0)
+        if data['peak_rss_kb'] is not None:
+            # Cumulative high-water marks: never lower in a later stage
+            self.assertGreater(collect['peak_rss_so_far_kb'], 0)
+            self.assertGreaterEqual(dns['peak_rss_so_far_kb'], collect['peak_rss_so_far_kb'])
+            self.assertGreaterEqual(dns['peak_rss_so_far_kb'] - dns['peak_rss_growth_kb'],
+                                    collect['peak_rss_so_far_kb'])
+            self.assertGreaterEqual(dns['peak_rss_growth_kb'], 0)
+
+        sources = {source['name']: source for source in data['sources']}
+        self.assertEqual(sources['Sample']['status'], 'fetched')
+        self.assertEqual(sources['Sample']['lines_parsed'], SAMPLE_LIST.count('\n'))
+        self.assertEqual(sources['Sample']['domains_found'], 3)
+        self.assertEqual(sources['Missing']['status'], 'failed')
+        self.assertIn('404', sources['Missing']['error'])
+
+    def test_profile_dump_covers_parse_and_classify(self):
+        import pstats
+        from scripts.collect_kakao_domains import KakaoDomainCollector
+
+        profile_path = os.path.join(self.tmpdir, 'parse.prof')
+        with StandInServer() as server:
+            server.serve('/list.txt', SAMPLE_LIST)
+            sources_file = self.write_sources([{'name': 'Sample', 'url': server.url('/list.txt')}])
+            # Profiling forces in-process parsing even when parse workers are requested
+            collector = KakaoDomainCollector(sources_file, parse_workers=4, profile_path=profile_path)
+            collector.collect_from_sources()
+
+        self.assertIn('ad.daum.net', collector.collected_domains)
+        functions = {name for _, _, name in pstats.Stats(profile_path).stats}
+        self.assertIn('extract', functions)
+        self.assertIn('_classify', functions)
+
+
+class TestSnapshotReplay(CollectorTestCase):
+    """Recording fetched bodies and DNS answers, and rebuilding from them offline"""
+
+    def fake_gethostbyname(self, domain):
+        if domain == 'ad.daum.net':
+            return '10.0.0.1'
+        raise socket.gaierror(socket.EAI_NONAME, 'Name or service not known')
+
+    def record(self, sources_file, path):
+        from scripts.collect_kakao_domains import KakaoDomainCollector
+
+        collector = KakaoDomainCollector(sources_file, cache_dir=self.cache_dir, record=True)
+        collector.collect_from_sources()
+        with patch('socket.gethostbyname', side_effect=self.fake_gethostbyname):
+            collector.validate_domains()
+        collector.save_snapshot(path)
+        return collector
+
+    def replay(self, sources_file, path):
+        from scripts.collect_kakao_domains import KakaoDomainCollector
+
+        collector = KakaoDomainCollector(sources_file, cache_dir=self.cache_dir, replay_path=path)
+        with patch('socket.gethostbyname', side_effect=AssertionError('DNS used')):
+            collector.collect_from_sources()
+            collector.validate_domains()
+        return collector
+
+    def test_replay_rebuilds_identical_filter_offline(self):
+        from scripts.snapshot import Snapshot
+
+        first_path = os.path.join(self.tmpdir, 'first.zip')
+        second_path = os.path.join(self.tmpdir, 'second.zip')
+        with StandInServer() as server:
+            server.serve('/list.txt', SAMPLE_LIST, etag='"v1"')
+            sources_file = self.write_sources([{'name': 'Sample', 'url': server.url('/list.txt')}])
+            recorded = self.record(sources_file, first_path)
+            # Second run: 304 for the body and cached DNS answers are recorded too
+            self.record(sources_file, second_path)
+
+        first, second = Snapshot.load(first_path), Snapshot.load(second_path)
+        self.assertEqual(second.sources[server.url('/list.txt')]['sha256'],
+                         first.sources[server.url('/list.txt')]['sha256'])
+        self.assertEqual(second.dns, first.dns)
+        self.assertEqual(first.dns['ad.daum.net'], ('active', '10.0.0.1'))
+
+        replayed = self.replay(sources_file, first_path)
+        self.assertEqual(replayed.collected_domains, recorded.collected_domains)
+        self.assertEqual(replayed.validated_domains, {'ad.daum.net'})
+        self.assertEqual(replayed.nxdomain_domains, recorded.nxdomain_domains)
+        self.assertEqual(replayed.generate_adguard_filter(),
+                         self.replay(sources_file, first_path).generate_adguard_filter())
+
+    def test_replay_uses_current_classifier_config(self):
+        path = os.path.join(self.tmpdir, 'snapshot.zip')
+        with StandInServer() as server:
+            server.serve('/list.txt', SAMPLE_LIST)
+            sources_file = self.write_sources([{'name': 'Sample', 'url': server.url('/list.txt')}])
+            self.record(sources_file, path)
+
+        with open(sources_file, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        config['kakao_patterns'] = [p for p in config['kakao_patterns'] if 'daum' not in p]
+        with open(sources_file, 'w', encoding='utf-8') as f:
+            json.dump(config, f)
+
+        replayed = self.replay(sources_file, path)
+        self.assertNotIn('ad.daum.net', replayed.collected_domains)
+        self.assertIn('ads.kakao.com', replayed.collected_domains)
+
+
+class TestArtifacts(CollectorTestCase):
+    """Byte-stable, precompressed artifacts and their manifest"""
+
+    def test_gzip_is_deterministic(self):
+        import gzip
+        from scripts.artifacts import gzip_bytes
+
+        data = SAMPLE_LIST.encode('utf-8') * 100
+        first = gzip_bytes(data)
+        time.sleep(1.1)  # gzip normally stores the current time in its header
+        self.assertEqual(gzip_bytes(data), first)
+        self.assertEqual(gzip.decompress(first), data)
+
+    def test_unchanged_rules_keep_artifacts_byte_identical(self):
+        import gzip
+        import hashlib
+        from scripts.artifacts import brotli
+        from scripts.collect_kakao_domains import KakaoDomainCollector
+
+        output_file = os.path.join(self.tmpdir, 'kakao-adblock-filter.txt')
+        artifacts_dir = os.path.join(self.tmpdir, 'docs', 'filters')
+        collector = KakaoDomainCollector(self.write_sources([]))
+        collector.validated_domains = {'ad.daum.net', 'ads.kakao.com'}
+        self.assertTrue(collector.save_filter(output_file, artifacts_dir=artifacts_dir))
+
+        with open(os.path.join(artifacts_dir, 'artifacts.json'), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        entry = manifest['files']['kakao-adblock-filter.txt']
+        with open(output_file, 'rb') as f:
+            published = f.read()
+        self.assertEqual(entry['sha256'], hashlib.sha256(published).hexdigest())
+        self.assertEqual(entry['size'], len(published))
+        with open(os.path.join(artifacts_dir, 'kakao-adblock-filter.txt.gz'), 'rb') as f:
+            compressed = f.read()
+        self.assertEqual(gzip.decompress(compressed), published)
+        self.assertEqual(entry['encodings']['gzip']['size'], len(compressed))
+        self.assertEqual('br' in entry['encodings'], brotli is not None)
+        self.assertIn('kakao-adblock-hosts.txt.gz', os.listdir(artifacts_dir))
+        snapshot = {name: Path(artifacts_dir, name).read_bytes()
+                    for name in os.listdir(artifacts_dir) if name != 'formats'}
+
+        # Same rules, different run statistics: nothing is rewritten
+        rerun = KakaoDomainCollector(self.write_sources([]))
+        rerun.validated_domains = {'ad.daum.net', 'ads.kakao.com'}
+        rerun.nxdomain_domains = {'gone.daum.net'}
+        with patch('builtins.print') as printed:
+            self.assertTrue(rerun.save_filter(output_file, artifacts_dir=artifacts_dir))
+        self.assertIn(f"Artifacts in {artifacts_dir}: 0 file(s) changed",
+                      [call.args[0] for call in printed.call_args_list if call.args])
+        with open(output_file, 'rb') as f:
+            self.assertEqual(f.read(), published)
+        for name, data in snapshot.items():
+            self.assertEqual(Path(artifacts_dir, name).read_bytes(), data, name)
+
+        # A rule change regenerates the header
+        rerun.validated_domains.add('pixel.daum.net')
+        self.assertTrue(rerun.save_filter(output_file, artifacts_dir=artifacts_dir))
+        with open(output_file, 'r', encoding='utf-8') as f:
+            content = f.read()
+        self.assertIn('! Domains removed as NXDOMAIN: 1', content)
+        self.assertIn('||pixel.daum.net^', content)
+
+
+class TestBenchmarkSuite(CollectorTestCase):
+    """Offline regression suite: corpora, result shape and the regression gate"""
+
+    def test_suite_runs_offline_at_small_size(self):
+        from scripts.benchmark_suite import compare, run_suite
+
+        with patch('urllib.request.urlopen', side_effect=AssertionError('network used')):
+            current = run_suite([1000], repeat=1)
+
+        self.assertEqual(set(current['benchmarks']), {
+            'extract_domains_from_adblock/1k', 'is_kakao_related/1k',
+            'generate_adguard_filter/1k', 'DNSValidator.is_blocked/1k',
+        })
+        for result in current['benchmarks'].values():
+            self.assertGreater(result['normalized'], 0)
+        # A run never regresses against itself
+        self.assertFalse(any(row['regressed'] for row in compare(current, current)))
+
+    def test_compare_flags_only_regressions_past_threshold(self):
+        from scripts.benchmark_suite import compare
+
+        baseline = {'benchmarks': {'a/1k': {'normalized': 1.0}, 'b/1k': {'normalized': 1.0}}}
+        current = {'benchmarks': {
+            'a/1k': {'normalized': 1.2},  # Within +25%
+            'b/1k': {'normalized': 1.5},
+            'c/1k': {'normalized': 9.0},  # Not in the baseline yet
+        }}
+        rows = {row['name']: row for row in compare(current, baseline, threshold=0.25)}
+        self.assertEqual(set(rows), {'a/1k', 'b/1k'})
+        self.assertFalse(rows['a/1k']['regressed'])
+        self.assertTrue(rows['b/1k']['regressed'])
+
+    def test_query_stream_is_deterministic_and_mixed(self):
+        from scripts.benchmark_corpus import generate_blocked_domains, generate_query_stream
+        from scripts.benchmark_suite import parse_size
+        from scripts.dns_validator import DNSValidator
+
+        self.assertEqual(parse_size('5m'), 5_000_000)
+        blocked = generate_blocked_domains(100)
+        queries = generate_query_stream(blocked, 300)
+        self.assertEqual(queries, generate_query_stream(blocked, 300))
+
+        filter_path = os.path.join(self.tmpdir, 'filter.txt')
+        with open(filter_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(f"||{d}^" for d in blocked))
+        validator = DNSValidator(filter_path)
+        hits = sum(validator.is_blocked(q) for q in queries)
+        self.assertTrue(0 < hits < len(queries))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Tests for the streaming --clean-filter rewriter
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class TestFilterRewriter(unittest.TestCase):
+    """Streaming --clean-filter rewrite in scripts/filter_rewriter.py"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    FILTER = ('! Title: test\r\n'
+              '!\r\n'
+              '! === Ads ===\r\n'
+              '||ads.kakao.com^\r\n'
+              '||gone.daum.net^\r\n'
+              '||gone.daum.net^$important\r\n'
+              '\r\n'
+              '! === Tracking ===\r\n'
+              '||old.kakao.com^\r\n'
+              '@@||gone.daum.net^\r\n'
+              '||track.daum.net^')
+
+    def write_filter(self):
+        path = os.path.join(self.tmpdir, 'filter.txt')
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            f.write(self.FILTER)
+        return path
+
+    def read(self, path):
+        with open(path, encoding='utf-8', newline='') as f:
+            return f.read()
+
+    def test_only_plain_rules_of_removed_domains_go(self):
+        from scripts.filter_rewriter import rewrite_filter
+
+        src = self.write_filter()
+        dest = os.path.join(self.tmpdir, 'clean.txt')
+        stats = rewrite_filter(src, dest, {'gone.daum.net', 'old.kakao.com', 'absent.kakao.com'})
+
+        lines = self.FILTER.split('\r\n')
+        del lines[8], lines[4]
+        self.assertEqual(self.read(dest), '\r\n'.join(lines))
+        self.assertEqual((stats.lines, stats.rules, stats.kept, stats.removed), (11, 4, 2, 2))
+        self.assertFalse([name for name in os.listdir(self.tmpdir) if name.startswith('.tmp-')])
+
+    def test_annotate_keeps_removed_rules_as_comments_in_place(self):
+        from scripts.filter_rewriter import rewrite_filter
+
+        src = self.write_filter()
+        rewrite_filter(src, src, {'gone.daum.net': 'not_found: NXDOMAIN', 'track.daum.net': ''},
+                       annotate=True)
+
+        lines = self.read(src).split('\r\n')
+        self.assertEqual(lines[4], '! Removed: ||gone.daum.net^  # not_found: NXDOMAIN')
+        self.assertEqual(lines[5], '||gone.daum.net^$important')
+        self.assertEqual(lines[-2:], ['@@||gone.daum.net^', '! Removed: ||track.daum.net^'])
+        self.assertEqual(len(lines), 11)
+
+    def test_clean_filter_cli_annotates_removed_rules(self):
+        from unittest.mock import patch
+        from dns_standin import StandInDNSServer
+        from scripts import validate_domains
+
+        src = self.write_filter()
+        clean_path = os.path.join(self.tmpdir, 'clean.txt')
+        zone = {'ads.kakao.com': {'A': ['10.0.0.2']}, 'track.daum.net': {'A': ['10.0.0.3']},
+                'old.kakao.com': {'A': ['10.0.0.4']}}
+        with StandInDNSServer(zone) as server:
+            argv = ['validate_domains.py', src, '-o', os.path.join(self.tmpdir, 'report.json'),
+                    '-t', '0.5', '--nameserver', f'127.0.0.1#{server.port}', '--record-types', 'A',
+                    '--no-answer-cache', '--quiet', '--clean-filter', clean_path, '--annotate-removed']
+            with patch('sys.argv', argv):
+                validate_domains.main()
+
+        lines = self.FILTER.split('\r\n')
+        lines[4] = '! Removed: ||gone.daum.net^  # not_found: No DNS records'
+        self.assertEqual(self.read(clean_path), '\r\n'.join(lines))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Tests for upstream racing and latency-scored nameserver selection
+"""
+
+import os
+import sys
+import unittest
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class TestUpstreamRacing(unittest.TestCase):
+    """Latency-scored nameserver selection and hedged queries in DomainValidator"""
+
+    DOMAINS = [f'ad{i}.daum.net' for i in range(20)]
+
+    def zone(self):
+        return {d: {'A': ['10.0.0.1']} for d in self.DOMAINS}
+
+    def test_slow_upstream_is_hedged_and_demoted(self):
+        from dns_standin import StandInDNSServer
+        from scripts.validate_domains import DomainValidator
+
+        with StandInDNSServer(self.zone()) as slow, StandInDNSServer(self.zone()) as fast:
+            for domain in self.DOMAINS:
+                slow.delays[domain] = 0.6
+            upstreams = [f'127.0.0.1#{slow.port}', f'127.0.0.1#{fast.port}']
+            validator = DomainValidator(max_workers=5, timeout=2.0, nameservers=upstreams, record_types=['A'])
+            results = validator.validate_domains_batch(self.DOMAINS)
+
+        self.assertTrue(all(r['status'] == 'active' for r in results.values()))
+        report = validator.generate_validation_report(results)['validation_settings']['upstreams']
+        self.assertEqual(report[0]['address'], upstreams[1])
+        stats = {entry['address']: entry for entry in report}
+        self.assertGreater(stats[upstreams[1]]['wins'], stats[upstreams[0]]['wins'])
+        self.assertGreater(stats[upstreams[1]]['hedges'], 0)
+
+    def test_dead_upstream_costs_a_hedge_delay_not_a_timeout(self):
+        from dns_standin import StandInDNSServer
+        from scripts.validate_domains import DomainValidator
+
+        with StandInDNSServer(self.zone()) as dead, StandInDNSServer(self.zone()) as live:
+            dead.drop.update(self.DOMAINS)
+            upstreams = [f'127.0.0.1#{dead.port}', f'127.0.0.1#{live.port}']
+            validator = DomainValidator(timeout=2.0, nameservers=upstreams, engine='async', concurrency=10)
+            results = validator.validate_domains_batch(self.DOMAINS)
+
+        self.assertTrue(all(r['status'] == 'active' for r in results.values()))
+        self.assertTrue(all(r['response_time'] < 1500 for r in results.values()))
+        self.assertEqual(validator.upstreams.ranked()[0], upstreams[1])
+
+    def test_threads_engine_sends_each_lookup_at_most_once_per_upstream(self):
+        from dns_standin import StandInDNSServer
+        from scripts.upstreams import HEDGE_POOL_SIZE
+        from scripts.validate_domains import DomainValidator
+
+        with StandInDNSServer(self.zone()) as dead, StandInDNSServer(self.zone()) as live:
+            dead.drop.update(self.DOMAINS[:10])
+            upstreams = [f'127.0.0.1#{dead.port}', f'127.0.0.1#{live.port}']
+            validator = DomainValidator(max_workers=10, timeout=2.0, nameservers=upstreams, record_types=['A'],
+                                        adaptive=True, max_concurrency=1000)
+            results = validator.validate_domains_batch(self.DOMAINS)
+            sent = {domain: dead.query_count(domain) + live.query_count(domain) for domain in self.DOMAINS}
+            resent = [domain for domain in self.DOMAINS
+                      if dead.query_count(domain) > 1 or live.query_count(domain) > 1]
+
+        self.assertEqual(validator._hedge_pool._max_workers, HEDGE_POOL_SIZE)
+        self.assertTrue(all(r['status'] == 'active' for r in results.values()))
+        self.assertTrue(all(r['response_time'] < 1500 for r in results.values()))
+        # The primary query runs for the whole timeout: never resent, at most one hedge
+        self.assertEqual(resent, [])
+        self.assertTrue(all(1 <= count <= 2 for count in sent.values()))
+        hedges = sum(entry['hedges'] for entry in validator.upstreams.report())
+        self.assertLessEqual(hedges, len(self.DOMAINS))
+
+    def test_race_hedges_at_most_once(self):
+        import concurrent.futures
+        import threading
+        from scripts.upstreams import UpstreamManager
+
+        manager = UpstreamManager(['a', 'b', 'c'], timeout=0.5)
+        calls = []
+        release = threading.Event()
+
+        def call(upstream, timeout):
+            calls.append(upstream)
+            if upstream == 'c':
+                return upstream
+            release.wait(timeout)  # a and b never answer in time
+            return None
+
+        with concurrent.futures.ThreadPoolExecutor(4) as pool:
+            result = manager.race(call, lambda answer: answer is not None, pool)
+            release.set()
+
+        # a is hedged by b once; c is reached by failover when a fails, not as a second hedge
+        self.assertEqual(result, 'c')
+        self.assertEqual(calls, ['a', 'b', 'c'])
+        self.assertEqual(manager.stats['b'].hedges, 1)
+        self.assertEqual(manager.stats['c'].hedges, 0)
+
+    def test_without_hedging_failures_fall_through(self):
+        from dns_standin import StandInDNSServer
+        from scripts.validate_domains import DomainValidator
+
+        with StandInDNSServer(self.zone()) as broken, StandInDNSServer(self.zone()) as live:
+            broken.servfail.update(self.DOMAINS)
+            upstreams = [f'127.0.0.1#{broken.port}', f'127.0.0.1#{live.port}']
+            validator = DomainValidator(timeout=1.0, nameservers=upstreams, record_types=['A'], hedge=False)
+            result = validator.validate_single_domain('ad0.daum.net')
+
+        self.assertEqual(result['status'], 'active')
+        self.assertEqual(validator.upstreams.stats[upstreams[0]].failures, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Tests for DomainValidator in scripts/validate_domains.py
+Queries go to a local stand-in DNS server, so no network access is needed
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class TestDomainValidatorPolicy(unittest.TestCase):
+    """Record-type policy of validate_domains.DomainValidator"""
+
+    ZONE = {
+        'ads.kakao.com': {'A': ['10.0.0.2'], 'AAAA': ['2001:db8::2'], 'MX': ['10 mail.kakao.com.']},
+        'alias.daum.net': {'CNAME': ['ads.kakao.com.']},
+        'mail.kakao.com': {'MX': ['10 mx.kakao.com.']},
+    }
+
+    def make_validator(self, server, **kwargs):
+        from scripts.validate_domains import DomainValidator
+
+        kwargs.setdefault('timeout', 2.0)
+        kwargs.setdefault('retry_backoff', 0.01)
+        return DomainValidator(nameservers=['127.0.0.1'], port=server.port, **kwargs)
+
+    def test_result_schema_and_status(self):
+        from dns_standin import StandInDNSServer
+
+        with StandInDNSServer(self.ZONE) as server:
+            validator = self.make_validator(server)
+            ads = validator.validate_single_domain('ads.kakao.com')
+            alias = validator.validate_single_domain('alias.daum.net')
+            mail = validator.validate_single_domain('mail.kakao.com')
+            gone = validator.validate_single_domain('gone.daum.net')
+            # MX is not part of the default policy
+            self.assertEqual(server.query_count('ads.kakao.com'), 3)
+            # NXDOMAIN settles the name; at most the queries already in flight are sent
+            self.assertLessEqual(server.query_count('gone.daum.net'), 3)
+
+        self.assertEqual(ads['status'], 'active')
+        self.assertEqual(ads['ip_addresses'], ['10.0.0.2', '2001:db8::2'])
+        self.assertFalse(ads['has_mx_record'])
+        self.assertEqual(alias['status'], 'redirected')
+        self.assertEqual(alias['cname_target'], 'ads.kakao.com.')
+        self.assertEqual(mail['status'], 'not_found')
+        self.assertEqual(gone['status'], 'not_found')
+        self.assertIsNotNone(gone['response_time'])
+
+    def test_failed_mx_only_lookup_is_not_treated_as_gone(self):
+        from dns_standin import StandInDNSServer
+
+        with StandInDNSServer(self.ZONE) as server:
+            server.drop.add('mail.kakao.com')
+            server.servfail.add('ads.kakao.com')
+            validator = self.make_validator(server, timeout=0.3, record_types=['MX'], retries=0)
+            results = validator.validate_domains_batch(['mail.kakao.com', 'ads.kakao.com', 'gone.daum.net'])
+
+        self.assertEqual(results['mail.kakao.com']['status'], 'timeout')
+        self.assertEqual(results['ads.kakao.com']['status'], 'error')
+        self.assertIn('MX record error', results['mail.kakao.com']['error'])
+        self.assertEqual(results['gone.daum.net']['status'], 'not_found')
+        # Only the real NXDOMAIN may be removed from the filter
+        self.assertEqual(validator.filter_invalid_domains(results), ['gone.daum.net'])
+
+    def test_latency_is_slowest_query(self):
+        from dns_standin import StandInDNSServer
+
+        with StandInDNSServer(self.ZONE) as server:
+            server.delays['ads.kakao.com'] = 0.3
+            concurrent_result = self.make_validator(server).validate_single_domain('ads.kakao.com')
+            sequential_result = self.make_validator(
+                server, concurrent_lookups=False).validate_single_domain('ads.kakao.com')
+
+        self.assertEqual(concurrent_result['status'], sequential_result['status'])
+        self.assertEqual(concurrent_result['ip_addresses'], sequential_result['ip_addresses'])
+        # Three 300ms queries: about 300ms at once, about 900ms one after another
+        self.assertLess(concurrent_result['response_time'], 700)
+        self.assertGreaterEqual(sequential_result['response_time'], 850)
+
+    def test_stop_on_first_positive_and_mx(self):
+        from dns_standin import StandInDNSServer
+
+        with StandInDNSServer(self.ZONE) as server:
+            first = self.make_validator(server, concurrent_lookups=False, stop_on_first_positive=True)
+            result = first.validate_single_domain('ads.kakao.com')
+            self.assertEqual(server.query_count('ads.kakao.com'), 1)
+            with_mx = self.make_validator(server, record_types=['A', 'MX'])
+            mail = with_mx.validate_single_domain('mail.kakao.com')
+
+        self.assertEqual(result['status'], 'active')
+        self.assertFalse(result['has_aaaa_record'])
+        self.assertEqual(mail['status'], 'exists')
+        self.assertEqual(mail['mx_records'], ['10 mx.kakao.com.'])
+        report = with_mx.generate_validation_report({'mail.kakao.com': mail})
+        self.assertEqual(report['validation_settings']['record_types'], ['A', 'MX'])
+
+        from scripts.validate_domains import DomainValidator
+        with self.assertRaises(ValueError):
+            DomainValidator(record_types=['TXT'])
+
+    def test_async_engine_matches_threads(self):
+        from dns_standin import StandInDNSServer
+
+        domains = ['ads.kakao.com', 'alias.daum.net', 'mail.kakao.com', 'gone.daum.net', 'broken.kakao.com']
+        with StandInDNSServer(self.ZONE) as server:
+            server.servfail.add('broken.kakao.com')
+            threaded = self.make_validator(server, timeout=0.5).validate_domains_batch(domains)
+            streamed = []
+            async_validator = self.make_validator(server, timeout=0.5, engine='async', concurrency=8)
+            asynchronous = async_validator.validate_domains_batch(domains, on_result=streamed.append)
+
+        def comparable(results):
+            return {d: {k: v for k, v in r.items() if k not in ('response_time', 'error', 'attempts')}
+                    for d, r in results.items()}
+
+        self.assertEqual(comparable(asynchronous), comparable(threaded))
+        self.assertEqual(sorted(r['domain'] for r in streamed), sorted(domains))
+        report = async_validator.generate_validation_report(asynchronous)
+        self.assertEqual(report['summary']['total_domains'], len(domains))
+        self.assertEqual(report['validation_settings']['engine'], 'async')
+
+    def test_async_engine_many_domains(self):
+        from dns_standin import StandInDNSServer
+
+        domains = [f'ad{i}.daum.net' for i in range(300)]
+        with StandInDNSServer({d: {'A': ['10.0.0.1']} for d in domains}) as server:
+            for domain in domains:
+                server.delays[domain] = 0.2
+            validator = self.make_validator(server, engine='async', concurrency=1000, record_types=['A', 'AAAA'])
+            start = time.perf_counter()
+            results = validator.validate_domains_batch(domains)
+            elapsed = time.perf_counter() - start
+
+        self.assertTrue(all(r['status'] == 'active' for r in results.values()))
+        # 600 queries at 200ms each would take two minutes one at a time
+        self.assertLess(elapsed, 5)
+
+
+class TestRetryQueue(unittest.TestCase):
+    """Second-pass retries of transient failures in validate_domains.py"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    ZONE = {
+        'ads.kakao.com': {'A': ['10.0.0.2']},
+        'flaky.kakao.com': {'A': ['10.0.0.3']},
+        'slow.kakao.com': {'A': ['10.0.0.4']},
+    }
+
+    def test_transient_failures_are_retried_not_removed(self):
+        from dns_standin import StandInDNSServer
+        from scripts.validate_domains import DomainValidator
+
+        domains = ['ads.kakao.com', 'flaky.kakao.com', 'slow.kakao.com', 'gone.daum.net']
+        streamed = []
+        with StandInDNSServer(self.ZONE) as server:
+            server.flaky['flaky.kakao.com'] = 1
+            server.drop.add('slow.kakao.com')
+            validator = DomainValidator(timeout=0.3, nameservers=['127.0.0.1'], port=server.port,
+                                        record_types=['A'], retries=2, retry_backoff=0.01)
+            results = validator.validate_domains_batch(domains, on_result=streamed.append)
+
+        self.assertEqual({d: r['status'] for d, r in results.items()}, {
+            'ads.kakao.com': 'active', 'flaky.kakao.com': 'active',
+            'slow.kakao.com': 'timeout', 'gone.daum.net': 'not_found',
+        })
+        self.assertEqual([a['status'] for a in results['flaky.kakao.com']['attempts']], ['timeout', 'active'])
+        self.assertEqual(len(results['slow.kakao.com']['attempts']), 3)
+        self.assertEqual(len(results['gone.daum.net']['attempts']), 1)
+        # Each domain is streamed once, with its final status
+        self.assertEqual(sorted(r['domain'] for r in streamed), sorted(domains))
+        self.assertEqual(validator.filter_invalid_domains(results), ['gone.daum.net'])
+        self.assertEqual(validator.filter_unresolved_domains(results), ['slow.kakao.com'])
+
+        summary = validator.generate_validation_report(results)['summary']
+        self.assertEqual((summary['retried_domains'], summary['recovered_domains']), (2, 1))
+        self.assertEqual((summary['invalid_domains'], summary['unresolved_domains']), (1, 1))
+
+    def test_retry_starts_on_another_upstream(self):
+        from scripts.upstreams import UpstreamManager
+
+        manager = UpstreamManager(['ns1', 'ns2', 'ns3'], timeout=1.0, hedge=False)
+        called = []
+        manager.race(lambda upstream, timeout: called.append(upstream) or upstream, lambda answer: True,
+                     offset=1)
+        self.assertEqual(called, ['ns2'])
+
+    def test_clean_filter_keeps_unresolved_domains(self):
+        from unittest.mock import patch
+        from dns_standin import StandInDNSServer
+        from scripts import validate_domains
+
+        filter_path = os.path.join(self.tmpdir, 'filter.txt')
+        clean_path = os.path.join(self.tmpdir, 'clean.txt')
+        removed_path = os.path.join(self.tmpdir, 'removed.txt')
+        with open(filter_path, 'w', encoding='utf-8') as f:
+            f.write('! Title: test\n||ads.kakao.com^\n||slow.kakao.com^\n||gone.daum.net^\n')
+
+        with StandInDNSServer(self.ZONE) as server:
+            server.drop.add('slow.kakao.com')
+            argv = ['validate_domains.py', filter_path, '-o', os.path.join(self.tmpdir, 'report.json'),
+                    '-t', '0.3', '--nameserver', f'127.0.0.1#{server.port}', '--record-types', 'A',
+                    '--retries', '1', '--retry-backoff', '0.01', '--no-answer-cache', '--quiet',
+                    '--clean-filter', clean_path, '--removed-domains', removed_path]
+            with patch('sys.argv', argv):
+                validate_domains.main()
+
+        with open(clean_path, encoding='utf-8') as f:
+            self.assertEqual(f.read(), '! Title: test\n||ads.kakao.com^\n||slow.kakao.com^\n')
+        with open(removed_path, encoding='utf-8') as f:
+            self.assertIn('gone.daum.net  # not_found', f.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Tests for the streaming JSONL report and the incremental validation summary
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class TestStreamingReport(unittest.TestCase):
+    """JSONL result streaming and the incremental validation summary"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    ZONE = {
+        'ads.kakao.com': {'A': ['10.0.0.2']},
+        'track.daum.net': {'A': ['10.0.0.3']},
+        'pixel.kakao.com': {'CNAME': ['ads.kakao.com.']},
+    }
+
+    def test_summary_percentiles_bound_true_values(self):
+        from scripts.validation_report import ValidationSummary
+
+        summary = ValidationSummary()
+        for ms in range(1, 101):
+            summary.add({'status': 'active', 'response_time': float(ms), 'attempts': [{}]})
+        summary.add({'status': 'not_found', 'response_time': 5000.0, 'attempts': [{}, {}]})
+
+        percentiles = summary.to_dict()['response_time_percentiles_ms']
+        for key, exact in (('p50', 50), ('p90', 90), ('p99', 99)):
+            self.assertGreaterEqual(percentiles[key], exact)
+            self.assertLessEqual(percentiles[key], exact * 1.05)
+        self.assertEqual(summary.to_dict()['invalid_domains'], 1)
+        self.assertEqual(summary.to_dict()['recovered_domains'], 1)
+        self.assertIsNone(ValidationSummary().to_dict()['response_time_percentiles_ms']['p50'])
+
+    def test_jsonl_run_matches_full_report(self):
+        import json
+        from unittest.mock import patch
+        from dns_standin import StandInDNSServer
+        from scripts import validate_domains
+
+        filter_path = os.path.join(self.tmpdir, 'filter.txt')
+        with open(filter_path, 'w', encoding='utf-8') as f:
+            f.write('! Title: test\n||ads.kakao.com^\n||track.daum.net^\n'
+                    '||pixel.kakao.com^\n||gone.daum.net^\n')
+
+        def run(*extra):
+            report_path = os.path.join(self.tmpdir, f'report{len(extra)}.json')
+            argv = ['validate_domains.py', filter_path, '-o', report_path, '-t', '0.5',
+                    '--nameserver', f'127.0.0.1#{server.port}', '--record-types', 'A,CNAME',
+                    '--no-answer-cache', '--quiet', *extra]
+            with patch('sys.argv', argv):
+                validate_domains.main()
+            with open(report_path, encoding='utf-8') as f:
+                return json.load(f)
+
+        jsonl_path = os.path.join(self.tmpdir, 'results.jsonl')
+        with StandInDNSServer(self.ZONE) as server:
+            full = run()
+            streamed = run('--jsonl', jsonl_path)
+
+        with open(jsonl_path, encoding='utf-8') as f:
+            lines = [json.loads(line) for line in f]
+        self.assertEqual(sorted(r['domain'] for r in lines), sorted(full['details']))
+        self.assertEqual({r['domain']: r['status'] for r in lines},
+                         {d: r['status'] for d, r in full['details'].items()})
+
+        # The streamed report is the summary alone, pointing at the JSONL file
+        self.assertNotIn('details', streamed)
+        self.assertEqual(streamed['details_file'], jsonl_path)
+        ignored = ('average_response_time_ms', 'response_time_percentiles_ms')
+        self.assertEqual({k: v for k, v in streamed['summary'].items() if k not in ignored},
+                         {k: v for k, v in full['summary'].items() if k not in ignored})
+        self.assertEqual(streamed['summary']['invalid_domains'], 1)
+
+    def test_batch_without_keep_results_holds_nothing(self):
+        from dns_standin import StandInDNSServer
+        from scripts.validate_domains import DomainValidator
+
+        streamed = []
+        with StandInDNSServer(self.ZONE) as server:
+            validator = DomainValidator(timeout=0.5, nameservers=['127.0.0.1'], port=server.port,
+                                        record_types=['A'], retry_backoff=0.01)
+            results = validator.validate_domains_batch(['ads.kakao.com', 'gone.daum.net'],
+                                                       on_result=streamed.append, keep_results=False)
+        self.assertEqual(results, {})
+        self.assertEqual(sorted(r['status'] for r in streamed), ['active', 'not_found'])
+
+    def test_threads_engine_submits_a_bounded_window(self):
+        import threading
+        import time
+        from scripts.validate_domains import DomainValidator
+
+        validator = DomainValidator(max_workers=4, record_types=['A'])
+        counts = {'started': 0, 'collected': 0, 'outstanding': 0}
+        lock = threading.Lock()
+
+        def fake_validate(domain):
+            with lock:
+                counts['started'] += 1
+                counts['outstanding'] = max(counts['outstanding'], counts['started'] - counts['collected'])
+            time.sleep(0.001)
+            return {'domain': domain, 'valid': False, 'status': 'not_found', 'error': None,
+                    'response_time': 1.0}
+
+        def on_result(result):
+            with lock:
+                counts['collected'] += 1
+
+        validator.validate_single_domain = fake_validate
+        validator.validate_domains_batch([f'ad{i}.daum.net' for i in range(500)],
+                                         on_result=on_result, keep_results=False)
+        self.assertEqual(counts['collected'], 500)
+        self.assertLessEqual(counts['outstanding'], 2 * validator.max_workers)
+
+
+if __name__ == '__main__':
+    unittest.main()